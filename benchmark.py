@@ -0,0 +1,314 @@
+"""
+Benchmarks for the rendering pipeline.
+
+Each benchmark builds a synthetic sequence, renders it with the
+strategies to compare, and prints frame times along with the number
+of compute dispatches and draw calls issued per frame.
+
+Usage: python benchmark.py <benchmark name> [frame count]
+"""
+
+import sys
+import time
+from configparser import ConfigParser
+from typing import Callable
+
+import moderngl
+import numpy as np
+
+from utils.config import Config
+from core.entities.gl_context import GLContext
+from core.entities.keyframe import Keyframe, KeyframeType
+from core.entities.sequence import Sequence
+from core.entities.solid_layer import SolidLayer
+from core.services.animation_service import AnimationService
+from core.services.animation_table_service import AnimationTableService
+from core.services.cpu_render_service import CPURenderService
+from core.services.layer_service import LayerService
+from core.services.modifier_service import ModifierService
+from core.services.memory_service import MemoryService
+from core.services.profiler_service import ProfilerService
+from core.services.render_service import RenderService
+from data_types.boolean import Boolean
+from data_types.color import Color
+from data_types.integer import Integer
+from data_types.number import Number
+from data_types.vector2 import Vector2
+
+
+class CallCounter:
+    """Count compute dispatches and draw calls issued to moderngl."""
+
+    dispatch_count: int
+    draw_count: int
+
+    def __init__(self):
+        self.dispatch_count = 0
+        self.draw_count = 0
+        self._run = moderngl.ComputeShader.run
+        self._render = moderngl.VertexArray.render
+
+    def __enter__(self):
+        _counter = self
+
+        def _counted_run(shader, *args, **kwargs):
+            _counter.dispatch_count += 1
+            return _counter._run(shader, *args, **kwargs)
+
+        def _counted_render(vao, *args, **kwargs):
+            _counter.draw_count += 1
+            return _counter._render(vao, *args, **kwargs)
+
+        moderngl.ComputeShader.run = _counted_run
+        moderngl.VertexArray.render = _counted_render
+        return self
+
+    def __exit__(self, *exception_info):
+        moderngl.ComputeShader.run = self._run
+        moderngl.VertexArray.render = self._render
+
+
+def measure(render_frame: Callable[[int], moderngl.Texture],
+            frame_count: int) -> tuple[float, float, float]:
+    """Return milliseconds, dispatches and draw calls per frame."""
+    _gl_context = GLContext.get_context()
+    # Warm up shader compilation and render targets.
+    MemoryService.release_texture(render_frame(0))
+    _gl_context.finish()
+    with CallCounter() as _counter:
+        _start = time.perf_counter()
+        for _frame in range(frame_count):
+            MemoryService.release_texture(render_frame(_frame))
+        _gl_context.finish()
+        _elapsed = time.perf_counter() - _start
+    return (1000 * _elapsed / frame_count,
+            _counter.dispatch_count / frame_count,
+            _counter.draw_count / frame_count)
+
+
+def print_row(label: str, result: tuple[float, float, float]):
+    """Print one line of benchmark results."""
+    _milliseconds, _dispatches, _draws = result
+    print(f"{label:<24}{_milliseconds:>10.2f} ms"
+          f"{_dispatches:>12.1f} dispatches{_draws:>8.1f} draws")
+
+
+def benchmark_compositing(frame_count: int):
+    """Compare compute compositing with hardware blending."""
+    _width = 1920
+    _height = 1080
+    _sequence = Sequence("Compositing", _width, _height,
+                         frame_count, 60)
+    for _index in range(8):
+        _layer = SolidLayer(f"Layer {_index}", 0, frame_count,
+                            Integer(640), Integer(360),
+                            Color(.2, .4, .8, .5))
+        _layer.set_property("rotation", Number(.1 * (_index+1)))
+        _layer.set_property("position",
+                            Vector2([.2 + .08*_index, .3 + .05*_index]))
+        LayerService.add_layer_to_sequence(_layer, _sequence)
+
+    print(f"Compositing 8 rotated layers at {_width}x{_height}")
+    for _anti_aliasing in ["none", "analytic"]:
+        Config.render.anti_aliasing = _anti_aliasing
+        for _blend in [False, True]:
+            Config.render.blend_compositing = _blend
+            _result = measure(
+                lambda _frame: RenderService.render_sequence_frame(
+                    _sequence, _frame), frame_count)
+            _path = "blend" if _blend else "compute"
+            print_row(f"{_anti_aliasing}, {_path}", _result)
+
+
+def benchmark_fusion(frame_count: int):
+    """Compare fused and separate pointwise modifiers."""
+    _width = 1920
+    _height = 1080
+    _sequence = Sequence("Fusion", _width, _height, frame_count, 60)
+    _layer = SolidLayer("Layer", 0, frame_count, Integer(_width),
+                        Integer(_height), Color(.8, .5, .2, 1))
+    for _name_id in ["exposure", "unmultiply", "simple_noise"]:
+        ModifierService.add_modifier_to_layer(
+            ModifierService.modifier_from_template(_name_id), _layer)
+    LayerService.add_layer_to_sequence(_layer, _sequence)
+
+    print(f"Exposure, unmultiply and noise at {_width}x{_height}")
+    for _fusion in [False, True]:
+        Config.render.pointwise_fusion = _fusion
+        _result = measure(
+            lambda _frame: RenderService.render_sequence_frame(
+                _sequence, _frame), frame_count)
+        print_row("fused" if _fusion else "separate", _result)
+
+
+def benchmark_cpu(frame_count: int):
+    """Compare the GPU backend with the CPU backend."""
+    _width = 960
+    _height = 540
+    _sequence = Sequence("CPU", _width, _height, frame_count, 60)
+    _background = SolidLayer("Background", 0, frame_count, Integer(_width),
+                             Integer(_height), Color(.8, .5, .2, 1))
+    for _name_id in ["linear_gradient", "exposure", "simple_noise",
+                     "box_blur"]:
+        ModifierService.add_modifier_to_layer(
+            ModifierService.modifier_from_template(_name_id), _background)
+    LayerService.add_layer_to_sequence(_background, _sequence)
+    _layer = SolidLayer("Layer", 0, frame_count, Integer(480),
+                        Integer(270), Color(1, 1, 1, 1))
+    ModifierService.add_modifier_to_layer(
+        ModifierService.modifier_from_template("checkerboard"), _layer)
+    _layer.set_property("rotation", Number(.3))
+    LayerService.add_layer_to_sequence(_layer, _sequence)
+
+    print(f"Gradient, exposure, noise, blur and a rotated checkerboard "
+          f"at {_width}x{_height}, {CPURenderService.get_process_count()} "
+          f"CPU processes")
+    _result = measure(
+        lambda _frame: RenderService.render_sequence_frame(
+            _sequence, _frame), frame_count)
+    print_row("gpu", _result)
+    # Warm up the worker processes.
+    CPURenderService.render_sequence_frame(_sequence, 0)
+    _start = time.perf_counter()
+    for _frame in range(frame_count):
+        CPURenderService.render_sequence_frame(_sequence, _frame)
+    _elapsed = time.perf_counter() - _start
+    print_row("cpu", (1000 * _elapsed / frame_count, 0, 0))
+    CPURenderService.shutdown()
+
+
+def benchmark_profile(frame_count: int):
+    """Print the GPU time of each pass, from the timer queries."""
+    _width = 1920
+    _height = 1080
+    _sequence = Sequence("Profile", _width, _height, frame_count, 60)
+    _background = SolidLayer("Background", 0, frame_count, Integer(_width),
+                             Integer(_height), Color(.8, .5, .2, 1))
+    for _name_id in ["linear_gradient", "exposure", "simple_noise",
+                     "box_blur"]:
+        ModifierService.add_modifier_to_layer(
+            ModifierService.modifier_from_template(_name_id), _background)
+    LayerService.add_layer_to_sequence(_background, _sequence)
+    _layer = SolidLayer("Layer", 0, frame_count, Integer(640),
+                        Integer(360), Color(1, 1, 1, 1))
+    ModifierService.add_modifier_to_layer(
+        ModifierService.modifier_from_template("checkerboard"), _layer)
+    _layer.set_property("rotation", Number(.3))
+    LayerService.add_layer_to_sequence(_layer, _sequence)
+
+    print(f"GPU time by pass at {_width}x{_height}, "
+          f"averaged over {frame_count} frames")
+    ProfilerService.set_enabled(True)
+    ProfilerService.clear()
+    for _frame in range(frame_count):
+        MemoryService.release_texture(
+            RenderService.render_sequence_frame(_sequence, _frame))
+    ProfilerService.collect(wait=True)
+    ProfilerService.set_enabled(False)
+    _profile_list = ProfilerService.get_profiles()
+    _sum_dict = dict()
+    for _profile in _profile_list:
+        for _scope, _pass_dict in _profile.get_scope_dict().items():
+            for _name, _milliseconds in _pass_dict.items():
+                _key = f"{_scope}: {_name}"
+                _sum_dict[_key] = _sum_dict.get(_key, 0.) + _milliseconds
+    for _key, _milliseconds in _sum_dict.items():
+        print(f"{_key:<40}{_milliseconds / len(_profile_list):>10.3f} ms")
+
+
+def benchmark_black_hole(frame_count: int):
+    """Compare fixed and adaptive steps of the black hole geodesics."""
+    _width = 960
+    _height = 540
+    _sequence = Sequence("Black hole", _width, _height, frame_count, 60)
+    _layer = SolidLayer("Black hole", 0, frame_count, Integer(_width),
+                        Integer(_height), Color(1, 1, 1, 1))
+    ModifierService.add_modifier_to_layer(
+        ModifierService.modifier_from_template("checkerboard"), _layer)
+    _modifier = ModifierService.modifier_from_template("black_hole")
+    ModifierService.add_modifier_to_layer(_modifier, _layer)
+    LayerService.add_layer_to_sequence(_layer, _sequence)
+    # Every frame has another tilt, so that its geodesics are traced.
+    _parameter_list = _modifier.get_parameter_list()
+    _tilt = _parameter_list[0]
+    AnimationService.add_keyframe(_tilt, Keyframe(0, Number(.1)))
+    AnimationService.add_keyframe(_tilt, Keyframe(frame_count, Number(.3)))
+    # Steps are counted by the CPU version of the same integrator.
+    _trace_rays = ModifierService.load_numpy_function(
+        ModifierService.get_modifier_path("black_hole")
+    ).__globals__["_trace_rays"]
+    _y, _x = np.mgrid[0:_height:10, 0:_width:10].astype(np.float64)
+    _uv = np.stack([(2*_x - _width)/_width, (2*_y - _height)/_width],
+                   axis=-1).reshape(-1, 2)
+
+    print(f"Black hole traced every frame at {_width}x{_height}")
+    for _adaptive in [False, True]:
+        _parameter_list[6].set_current_value(Boolean(_adaptive))
+        _result = measure(
+            lambda _frame: RenderService.render_sequence_frame(
+                _sequence, _frame), frame_count)
+        _values = [
+            AnimationService.get_value_at_frame(_parameter, 0).get_value()
+            for _parameter in _parameter_list]
+        _steps = _trace_rays(_uv, *_values)[3]
+        _label = "adaptive" if _adaptive else "fixed"
+        print_row(f"{_label}, {_steps.mean():.0f} steps/px", _result)
+
+
+def benchmark_animation(frame_count: int):
+    """Compare evaluating keyframes every frame with baked tables."""
+    # Small layers, so that evaluating parameters isn't hidden.
+    _width = 128
+    _height = 128
+    _sequence = Sequence("Animation", _width, _height, frame_count, 60)
+    _random = np.random.default_rng(0)
+    for _index in range(32):
+        _layer = SolidLayer(f"Layer {_index}", 0, frame_count,
+                            Integer(16), Integer(16), Color(.8, .5, .2, 1))
+        for _name_id in ["exposure", "simple_noise"]:
+            ModifierService.add_modifier_to_layer(
+                ModifierService.modifier_from_template(_name_id), _layer)
+        LayerService.add_layer_to_sequence(_layer, _sequence)
+        # Data-driven animation, with a keyframe every other frame.
+        _parameter_list = [_layer.get_property_parameter(_name_id)
+                           for _name_id in ["position", "rotation"]]
+        _parameter_list += _layer.get_modifier_list()[0].get_parameter_list()
+        for _parameter in _parameter_list:
+            _value = _parameter.get_current_value()
+            for _frame in range(0, frame_count + 2, 2):
+                _offset = _random.uniform(0, .1, np.shape(_value.get_array()))
+                AnimationService.add_keyframe(_parameter, Keyframe(
+                    _frame, type(_value)(_value.get_array() + _offset),
+                    KeyframeType.BEZIER))
+
+    print(f"32 layers animated with bezier keyframes at {_width}x{_height}")
+    for _baked in [False, True]:
+        AnimationTableService.clear()
+        if _baked:
+            AnimationTableService.bake_sequence(_sequence)
+        _result = measure(
+            lambda _frame: RenderService.render_sequence_frame(
+                _sequence, _frame), frame_count)
+        print_row("baked" if _baked else "evaluated", _result)
+
+
+BENCHMARKS = {
+    "compositing": benchmark_compositing,
+    "fusion": benchmark_fusion,
+    "cpu": benchmark_cpu,
+    "profile": benchmark_profile,
+    "black_hole": benchmark_black_hole,
+    "animation": benchmark_animation
+}
+
+
+if __name__ == "__main__":
+    _config = ConfigParser()
+    _config.read("config.cfg")
+    Config.load(_config)
+    ModifierService.load_modifiers_from_directory()
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Available benchmarks: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+    _frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    BENCHMARKS[sys.argv[1]](_frame_count)
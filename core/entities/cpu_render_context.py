@@ -0,0 +1,75 @@
+"""
+Provides useful information about the CPU rendering context.
+
+A CPURenderContext plays the role of a RenderContext on the CPU
+backend. It provides the Layer dimensions and the sequence context,
+and holds the source and destination images as numpy arrays in
+shared memory, so that worker processes can render them in tiles.
+"""
+
+from core.entities.sequence_context import SequenceContext
+from utils.shared_array import SharedArray
+
+
+class CPURenderContext:
+    """Provides useful information about the CPU rendering context."""
+
+    _width: int
+    _height: int
+    _src_array: SharedArray
+    _dest_array: SharedArray
+    _sequence_context: SequenceContext
+    _premultiplied: bool
+
+    def __init__(self,
+                 width: int,
+                 height: int,
+                 sequence_context: SequenceContext):
+        self._width = width
+        self._height = height
+        self._sequence_context = sequence_context
+        self._src_array = SharedArray((height, width, 4))
+        self._dest_array = SharedArray((height, width, 4))
+        self._premultiplied = True
+
+    def get_sequence_context(self) -> SequenceContext:
+        """Return the sequence context."""
+        return self._sequence_context
+
+    def get_width(self) -> int:
+        """Return the width of the Layer."""
+        return self._width
+
+    def get_height(self) -> int:
+        """Return the height of the Layer."""
+        return self._height
+
+    def get_src_array(self) -> SharedArray:
+        """Return the source shared array."""
+        return self._src_array
+
+    def get_dest_array(self) -> SharedArray:
+        """Return the destination shared array."""
+        return self._dest_array
+
+    def roll_arrays(self):
+        """Swap the src and dest arrays."""
+        self._src_array, self._dest_array = (self._dest_array,
+                                             self._src_array)
+
+    def release_dest_array(self):
+        """Free the shared memory of the dest array."""
+        self._dest_array.release()
+
+    def release(self):
+        """Free the shared memory of both arrays."""
+        self._src_array.release()
+        self._dest_array.release()
+
+    def is_premultiplied(self) -> bool:
+        """Tell if the src array holds premultiplied colors."""
+        return self._premultiplied
+
+    def set_premultiplied(self, premultiplied: bool):
+        """Set whether the src array holds premultiplied colors."""
+        self._premultiplied = premultiplied
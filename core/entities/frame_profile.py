@@ -0,0 +1,41 @@
+"""
+Represents the GPU timings of a rendered frame.
+
+A FrameProfile holds how long each pass of a frame took on the GPU,
+as measured by timer queries. Each entry names the scope it belongs
+to, usually a layer, the pass itself, such as a modifier or the
+compositing, and its duration in milliseconds.
+"""
+
+
+class FrameProfile:
+    """Represents the GPU timings of a rendered frame."""
+
+    _frame: int
+    _entry_list: list[tuple[str, str, float]]
+
+    def __init__(self,
+                 frame: int,
+                 entry_list: list[tuple[str, str, float]]):
+        self._frame = frame
+        self._entry_list = entry_list
+
+    def get_frame(self) -> int:
+        """Return the frame that was rendered."""
+        return self._frame
+
+    def get_entry_list(self) -> list[tuple[str, str, float]]:
+        """Return the scope, pass and milliseconds of each entry."""
+        return self._entry_list
+
+    def get_scope_dict(self) -> dict[str, dict[str, float]]:
+        """Return the milliseconds of each pass by scope, summing repeats."""
+        _scope_dict = dict()
+        for _scope, _name, _milliseconds in self._entry_list:
+            _pass_dict = _scope_dict.setdefault(_scope, dict())
+            _pass_dict[_name] = _pass_dict.get(_name, 0.) + _milliseconds
+        return _scope_dict
+
+    def get_total(self) -> float:
+        """Return the milliseconds of all the entries."""
+        return sum(_entry[2] for _entry in self._entry_list)
@@ -2,7 +2,8 @@
 ModernGL context.
 
 The GLContext class provides the app
-with a centralised moderngl context.
+with a centralised moderngl context,
+and a cache of compiled compute shaders.
 """
 
 import moderngl
@@ -12,6 +13,9 @@ class GLContext:
     """ModernGL context."""
 
     _context: moderngl.Context = None
+    # Compute shaders by owner name ids, then by GLSL code.
+    _compute_shaders: dict[tuple[str, ...],
+                           dict[str, moderngl.ComputeShader]] = dict()
 
     @classmethod
     def get_context(cls) -> moderngl.Context:
@@ -19,3 +23,27 @@ class GLContext:
         if cls._context is None:
             cls._context = moderngl.create_context(standalone=True)
         return cls._context
+
+    @classmethod
+    def compute_shader_once(cls,
+                            owner_name_ids: tuple[str, ...],
+                            glsl_code: str) -> moderngl.ComputeShader:
+        """Return a compute shader, compiling it only the first time.
+
+        A shader can have several owners, for instance when it fuses
+        several modifiers, and is released along with any of them.
+        """
+        _shaders = cls._compute_shaders.setdefault(owner_name_ids, dict())
+        if glsl_code not in _shaders:
+            _shaders[glsl_code] = cls.get_context().compute_shader(glsl_code)
+        return _shaders[glsl_code]
+
+    @classmethod
+    def release_compute_shaders(cls, owner_name_id: str):
+        """Release the compute shaders compiled for an owner."""
+        for _owner_name_ids in list(cls._compute_shaders):
+            if owner_name_id not in _owner_name_ids:
+                continue
+            for _shader in cls._compute_shaders.pop(
+                    _owner_name_ids).values():
+                _shader.release()
@@ -58,6 +58,18 @@ class Keyframe:
         """Return the value."""
         return self._value
 
+    def get_keyframe_type(self) -> KeyframeType:
+        """Return the interpolation type."""
+        return self._keyframe_type
+
+    def get_left_handle(self) -> tuple[float, DataType]:
+        """Return the influence and negated offset of the left handle."""
+        return self._left_handle
+
+    def get_right_handle(self) -> tuple[float, DataType]:
+        """Return the influence and offset of the right handle."""
+        return self._right_handle
+
     def interpolate_to(self, keyframe_b: Self, t: float) -> DataType:
         """Interpolate from this keyframe to another with factor t."""
         _value_a = self._value
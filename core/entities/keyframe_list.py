@@ -0,0 +1,102 @@
+"""
+Represents the keyframes of a Parameter, sorted by frame.
+
+A KeyframeList holds at most one Keyframe per frame, in the order of
+their frames, along with the frames themselves so that inserting,
+removing and finding keyframes bisects them rather than scanning the
+whole list. It also remembers the segment, the pair of keyframes
+surrounding a frame, that was found last: as playback evaluates
+consecutive frames, the segment found next is almost always the same
+one or the one following it, and is then found without bisecting.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Optional, Union
+
+from core.entities.keyframe import Keyframe
+
+
+class KeyframeList:
+    """Represents the keyframes of a Parameter, sorted by frame."""
+
+    _keyframe_list: list[Keyframe]
+    _frame_list: list[Union[int, float]]
+    _cursor: int
+    _revision: int
+
+    def __init__(self):
+        self._keyframe_list = []
+        self._frame_list = []
+        self._cursor = 0
+        self._revision = 0
+
+    def __len__(self) -> int:
+        return len(self._keyframe_list)
+
+    def __iter__(self) -> Iterator[Keyframe]:
+        return iter(self._keyframe_list)
+
+    def __getitem__(self, index: int) -> Keyframe:
+        return self._keyframe_list[index]
+
+    def insert(self, keyframe: Keyframe):
+        """Insert a keyframe, replacing any at the same frame."""
+        _frame = keyframe.get_frame()
+        _index = bisect_left(self._frame_list, _frame)
+        self._revision += 1
+        if (_index < len(self._frame_list)
+                and self._frame_list[_index] == _frame):
+            self._keyframe_list[_index] = keyframe
+            return
+        self._keyframe_list.insert(_index, keyframe)
+        self._frame_list.insert(_index, _frame)
+
+    def remove_at_frame(self, frame: Union[int, float]) -> Optional[Keyframe]:
+        """Remove the keyframe at a frame, returning it if there was one."""
+        _index = bisect_left(self._frame_list, frame)
+        if (_index == len(self._frame_list)
+                or self._frame_list[_index] != frame):
+            return None
+        self._revision += 1
+        self._frame_list.pop(_index)
+        return self._keyframe_list.pop(_index)
+
+    def get_keyframe_at_frame(self,
+                              frame: Union[int, float]) -> Optional[Keyframe]:
+        """Return the keyframe at a frame, if any."""
+        _index = bisect_left(self._frame_list, frame)
+        if (_index == len(self._frame_list)
+                or self._frame_list[_index] != frame):
+            return None
+        return self._keyframe_list[_index]
+
+    def clear(self):
+        """Remove every keyframe."""
+        self._keyframe_list.clear()
+        self._frame_list.clear()
+        self._cursor = 0
+        self._revision += 1
+
+    def get_revision(self) -> int:
+        """Return the number of changes made to the keyframes."""
+        return self._revision
+
+    def find_segment(self, frame: Union[int, float]) -> int:
+        """Return the number of keyframes at or before a frame.
+
+        The keyframes surrounding the frame are those just before and
+        at that index. The segment found last, then the one following
+        it, are tried before bisecting.
+        """
+        _frame_list = self._frame_list
+        _count = len(_frame_list)
+        _cursor = self._cursor
+        for _index in (_cursor, _cursor + 1):
+            if (_index <= _count
+                    and (_index == 0 or _frame_list[_index - 1] <= frame)
+                    and (_index == _count or frame < _frame_list[_index])):
+                self._cursor = _index
+                return _index
+        _index = bisect_right(_frame_list, frame)
+        self._cursor = _index
+        return _index
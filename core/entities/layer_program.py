@@ -0,0 +1,83 @@
+"""
+Represents the precompiled rendering of a Layer.
+
+A LayerProgram is compiled by the RenderService from the structure of
+a Layer: its modifier list and the templates they inherit from. It
+holds the dispatches to execute for each frame as bound callables,
+along with bound evaluators for the parameters they read and for the
+padding of their input, so that rendering a frame doesn't need to
+look up templates or flags again. Evaluators of every parameter each
+dispatch reads tell when its output changes.
+"""
+
+from typing import Callable
+
+
+class LayerProgram:
+    """Represents the precompiled rendering of a Layer."""
+
+    _signature: tuple
+    _start_index: int
+    _source_ignored: bool
+    _step_list: list[Callable]
+    _label_list: list[str]
+    _padding_list: list[Callable]
+    _parameter_entries: list[tuple]
+    _state_evaluators: list[list[Callable]]
+    _transform_evaluators: list[Callable]
+
+    def __init__(self,
+                 signature: tuple,
+                 start_index: int,
+                 source_ignored: bool,
+                 step_list: list[Callable],
+                 label_list: list[str],
+                 padding_list: list[Callable],
+                 parameter_entries: list[tuple],
+                 state_evaluators: list[list[Callable]],
+                 transform_evaluators: list[Callable]):
+        self._signature = signature
+        self._start_index = start_index
+        self._source_ignored = source_ignored
+        self._step_list = step_list
+        self._label_list = label_list
+        self._padding_list = padding_list
+        self._parameter_entries = parameter_entries
+        self._state_evaluators = state_evaluators
+        self._transform_evaluators = transform_evaluators
+
+    def get_signature(self) -> tuple:
+        """Return the structure the program was compiled from."""
+        return self._signature
+
+    def get_start_index(self) -> int:
+        """Return the index of the first modifier to apply."""
+        return self._start_index
+
+    def is_source_ignored(self) -> bool:
+        """Tell if the first modifier applied ignores its source."""
+        return self._source_ignored
+
+    def get_step_list(self) -> list[Callable]:
+        """Return the dispatches, each taking a RenderContext."""
+        return self._step_list
+
+    def get_label_list(self) -> list[str]:
+        """Return the name of each dispatch, as shown when profiling."""
+        return self._label_list
+
+    def get_padding_list(self) -> list[Callable]:
+        """Return the input padding of each dispatch, by frame."""
+        return self._padding_list
+
+    def get_parameter_entries(self) -> list[tuple]:
+        """Return the parameter blocks of the dispatches."""
+        return self._parameter_entries
+
+    def get_state_evaluators(self) -> list[list[Callable]]:
+        """Return the evaluators of the parameters of each dispatch."""
+        return self._state_evaluators
+
+    def get_transform_evaluators(self) -> list[Callable]:
+        """Return the evaluators of the transform properties by frame."""
+        return self._transform_evaluators
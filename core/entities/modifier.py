@@ -4,7 +4,8 @@ Represents a Modifier applied to a Layer.
 A Modifier represents an instance of a ModifierTemplate
 which the user has applied to a Layer in a Sequence.
 It holds a list of Parameter values, which are based
-on the template it inherits from.
+on the template it inherits from. A disabled Modifier
+is bypassed when rendering its Layer.
 """
 
 from core.entities.parameter import Parameter
@@ -15,12 +16,15 @@ class Modifier:
 
     _template_id: str  # template's name id in the repository
     _parameter_list: list[Parameter]
+    _enabled: bool
 
     def __init__(self,
                  template_id: str,
-                 parameter_list: list[Parameter] = []):
+                 parameter_list: list[Parameter] = [],
+                 enabled: bool = True):
         self._template_id = template_id
         self._parameter_list = parameter_list
+        self._enabled = enabled
 
     def get_template_id(self) -> str:
         """Return the parent ModifierTemplate name id."""
@@ -29,6 +33,14 @@ class Modifier:
     def get_parameter_list(self) -> list[Parameter]:
         """Return the list of parameters."""
         return self._parameter_list
+
+    def is_enabled(self) -> bool:
+        """Tell if the modifier is applied when rendering."""
+        return self._enabled
+
+    def set_enabled(self, enabled: bool):
+        """Enable the modifier, or bypass it when rendering."""
+        self._enabled = enabled
     
     def get_parameter(self, param_id: str) -> Parameter:
         """Get a parameter by its ID (index in the parameter list)."""
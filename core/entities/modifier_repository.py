@@ -14,6 +14,8 @@ class ModifierRepository:
 
     _repository: dict[str, ModifierTemplate] = dict()
     _structure: dict[str, dict] = dict()
+    # Incremented whenever templates are added or replaced.
+    _revision: int = 0
 
     @classmethod
     def get_repository(cls):
@@ -32,3 +34,13 @@ class ModifierRepository:
             raise KeyError(f"Modifier '{name_id}' does not "
                            f"exist in the repository.")
         return cls._repository[name_id]
+
+    @classmethod
+    def get_revision(cls) -> int:
+        """Return the revision of the repository."""
+        return cls._revision
+
+    @classmethod
+    def increment_revision(cls):
+        """Mark the templates of the repository as changed."""
+        cls._revision += 1
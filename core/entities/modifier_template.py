@@ -4,11 +4,18 @@ Represents a template for instanciating Modifier objects.
 The ModifierTemplate class contains a reference to a Modifier that the
 rendering pipeline can apply to a layer, and a list of ParameterTemplate
 that lay out a model for which Parameter objects to create when
-instanciating the interface, for the user to adjust.
+instanciating the interface, for the user to adjust. The apply
+function can be loaded lazily, the first time it is needed. Instead
+of an apply function, a template can hold GLSL code that the engine
+compiles and dispatches itself, with a mapping from parameters to
+uniforms, or the GLSL code of a pointwise function that the engine
+can fuse with the neighbouring pointwise modifiers. A template also
+tells how far the input region a modifier reads extends beyond the
+region it writes, so that only part of a layer can be rendered.
 """
 
 from enum import Enum
-from typing import Callable
+from typing import Callable, Optional
 
 from core.entities.parameter_template import ParameterTemplate
 
@@ -17,6 +24,8 @@ class ModifierFlag(Enum):
     """Enumerate all the flags a Modifier can exhibit."""
 
     WRITEONLY = 0
+    STRAIGHT_ALPHA = 1
+    EXPENSIVE = 2
 
 
 class ModifierTemplate:
@@ -25,17 +34,40 @@ class ModifierTemplate:
     _title: str
     _flags: set[ModifierFlag]
     _parameter_template_list: list[ParameterTemplate]
-    _apply_function: Callable
+    _apply_function: Optional[Callable]
+    _apply_loader: Optional[Callable[[], Callable]]
+    _glsl_code: Optional[str]
+    _pointwise_code: Optional[str]
+    _uniform_map: dict[str, str]
+    _local_size: tuple[int, int]
+    _padding: Optional[tuple[int, int]]
+    _padding_function: Optional[Callable]
+    _padding_loader: Optional[Callable[[], Callable]]
 
     def __init__(self,
-                 apply_function: Callable,
+                 apply_function: Optional[Callable],
                  title: str = "",
                  flags: set[ModifierFlag] = set(),
-                 parameter_template_list: list[ParameterTemplate] = []):
+                 parameter_template_list: list[ParameterTemplate] = [],
+                 apply_loader: Optional[Callable[[], Callable]] = None,
+                 glsl_code: Optional[str] = None,
+                 pointwise_code: Optional[str] = None,
+                 uniform_map: dict[str, str] = dict(),
+                 local_size: tuple[int, int] = (1, 1),
+                 padding: Optional[tuple[int, int]] = None,
+                 padding_loader: Optional[Callable[[], Callable]] = None):
         self._title = title
         self._parameter_template_list = parameter_template_list
         self._apply_function = apply_function
+        self._apply_loader = apply_loader
         self._flags = flags
+        self._glsl_code = glsl_code
+        self._pointwise_code = pointwise_code
+        self._uniform_map = uniform_map
+        self._local_size = local_size
+        self._padding = padding
+        self._padding_function = None
+        self._padding_loader = padding_loader
 
     def get_parameter_template_list(self) -> list[ParameterTemplate]:
         """Retrieve the list of parameter templates."""
@@ -46,9 +78,43 @@ class ModifierTemplate:
         return self._title
 
     def get_apply_function(self) -> Callable:
-        """Retrieve the modifier apply function."""
+        """Retrieve the modifier apply function, loading it if needed."""
+        if self._apply_function is None:
+            self._apply_function = self._apply_loader()
         return self._apply_function
 
     def get_flags(self) -> set[ModifierFlag]:
         """Retrieve modifier flags."""
         return self._flags
+
+    def get_glsl_code(self) -> Optional[str]:
+        """Retrieve the GLSL code, if the modifier is declarative."""
+        return self._glsl_code
+
+    def get_pointwise_code(self) -> Optional[str]:
+        """Retrieve the GLSL code, if the modifier is pointwise."""
+        return self._pointwise_code
+
+    def get_uniform_map(self) -> dict[str, str]:
+        """Retrieve the uniform name of each parameter name id."""
+        return self._uniform_map
+
+    def get_local_size(self) -> tuple[int, int]:
+        """Retrieve the work group size declared in the GLSL code."""
+        return self._local_size
+
+    def has_padding_function(self) -> bool:
+        """Tell if the padding depends on the parameter values."""
+        return self._padding_loader is not None
+
+    def get_padding(self, *values) -> Optional[tuple[int, int]]:
+        """Retrieve the horizontal and vertical padding of the input.
+
+        The values of the parameters are only needed when the padding
+        is computed by a function. None means the whole input is read.
+        """
+        if self._padding_loader is None:
+            return self._padding
+        if self._padding_function is None:
+            self._padding_function = self._padding_loader()
+        return self._padding_function(*values)
@@ -8,7 +8,7 @@ default, minimum, and maximum values and can be keyframed for animations.
 from typing import Type
 
 from data_types.data_type import DataType
-from core.entities.keyframe import Keyframe
+from core.entities.keyframe_list import KeyframeList
 
 
 class Parameter:
@@ -20,7 +20,7 @@ class Parameter:
     _default_value: DataType
     _min_value: DataType
     _max_value: DataType
-    _keyframe_list: list[Keyframe]
+    _keyframe_list: KeyframeList
 
     def __init__(self,
                  accepts_keyframes: bool = True,
@@ -38,7 +38,7 @@ class Parameter:
         self._max_value = max_value
         self._current_value = self._default_value
 
-        self._keyframe_list = []
+        self._keyframe_list = KeyframeList()
         self._keyframe_at_frame_dict = dict()
 
     def get_current_value(self) -> DataType:
@@ -49,8 +49,8 @@ class Parameter:
         """Change the current value stored in the Parameter."""
         self._current_value = value.clip(self._min_value, self._max_value)
 
-    def get_keyframe_list(self) -> list[Keyframe]:
-        """Return a reference to the keyframe list."""
+    def get_keyframe_list(self) -> KeyframeList:
+        """Return a reference to the keyframe list, sorted by frame."""
         return self._keyframe_list
 
     def accepts_keyframes(self) -> bool:
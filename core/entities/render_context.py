@@ -4,13 +4,24 @@ Provides useful information about the rendering context.
 A RenderContext is used to provide a ModifierProgram with various
 information about the rendering context, such as the Layer dimensions,
 as well as the source and destination textures, and a ModernGL context
-for running shaders if needed...
+for running shaders if needed... It also holds the region of the
+destination texture a modifier has to write, which is the whole Layer
+unless only part of it is visible. Modifiers running several passes
+request scratch textures, which are recycled once they return, and
+can keep textures computed from some of their parameters across frames.
+Expensive shaders can be run at a reduced rate, only computing every
+pixel near edges.
 """
 
+from typing import Callable, Hashable
+
 import moderngl
 
 from core.entities.gl_context import GLContext
 from core.entities.sequence_context import SequenceContext
+from core.services.memory_service import MemoryCategory, MemoryService
+from core.services.reduced_rate_service import ReducedRateService
+from core.services.texture_cache_service import TextureCacheService
 
 
 class RenderContext:
@@ -21,6 +32,10 @@ class RenderContext:
     _src_texture: moderngl.Texture
     _dest_texture: moderngl.Texture
     _sequence_context: SequenceContext
+    _premultiplied: bool
+    _modifier_name_id: str
+    _region: tuple[int, int, int, int]
+    _scratch_textures: list[moderngl.Texture]
 
     def __init__(self,
                  width: int,
@@ -31,6 +46,10 @@ class RenderContext:
         self._sequence_context = sequence_context
         self._src_texture = None
         self._dest_texture = None
+        self._premultiplied = True
+        self._modifier_name_id = ""
+        self._region = (0, 0, width, height)
+        self._scratch_textures = []
 
     def get_sequence_context(self) -> SequenceContext:
         """Return the sequence context."""
@@ -39,12 +58,135 @@ class RenderContext:
     def release_dest_texture(self):
         """Release the destination moderngl texture."""
         if self._dest_texture is not None:
-            self._dest_texture.release()
+            MemoryService.release_texture(self._dest_texture)
 
     def get_gl_context(self) -> moderngl.Context:
         """Return the moderngl context."""
         return GLContext.get_context()
 
+    def compute_shader_once(self,
+                            glsl_code: str,
+                            reduced_rate: bool = False
+                            ) -> moderngl.ComputeShader:
+        """Return a compute shader, compiling it only the first time.
+
+        Shaders are cached for the modifier being applied, so that
+        they are released when its file is reloaded. With reduced_rate
+        set, the shader is compiled for run_reduced_rate.
+        """
+        if reduced_rate:
+            glsl_code = ReducedRateService.create_reduced_glsl(glsl_code)
+        return GLContext.compute_shader_once((self._modifier_name_id,),
+                                             glsl_code)
+
+    def run_reduced_rate(self,
+                         shader: moderngl.ComputeShader,
+                         texture: moderngl.Texture,
+                         local_size: tuple[int, int] = (16, 16),
+                         region: tuple[int, int, int, int] = None):
+        """Run an expensive shader on part of the pixels of a texture.
+
+        The shader runs on a coarse grid, then for the pixels where
+        neighbouring samples differ, the others being interpolated.
+        Its gl_GlobalInvocationID is the pixel it computes, relative to
+        the region, which is the region to write unless another one is
+        given. Other images and uniforms are bound beforehand.
+        """
+        if region is None:
+            region = self.get_region()
+        ReducedRateService.run(shader, texture, region, local_size)
+
+    def get_reduced_rate(self) -> tuple[int, float]:
+        """Return the grid spacing and edge threshold of reduced rates."""
+        return (ReducedRateService.get_factor(),
+                ReducedRateService.get_threshold())
+
+    def set_modifier_name_id(self, name_id: str):
+        """Set the name id of the modifier being applied."""
+        self._modifier_name_id = name_id
+
+    def get_region(self) -> tuple[int, int, int, int]:
+        """Return the x, y, width and height of the region to write."""
+        return self._region
+
+    def set_region(self, region: tuple[int, int, int, int]):
+        """Set the region of the dest texture to write."""
+        self._region = region
+
+    def get_scratch_textures(self,
+                             count: int,
+                             size: tuple[int, int] = None,
+                             components: int = 4,
+                             dtype: str = "f4") -> list[moderngl.Texture]:
+        """Return temporary textures for the modifier being applied.
+
+        The textures have the size of the Layer unless another size is
+        given, and an undefined content. They are recycled when the
+        modifier returns, so that the next frame reuses them.
+        """
+        if size is None:
+            size = (self.get_width(), self.get_height())
+        _texture_list = [
+            MemoryService.acquire_texture(size, components, dtype)
+            for _ in range(count)]
+        self._scratch_textures += _texture_list
+        return _texture_list
+
+    def release_scratch_textures(self):
+        """Recycle the scratch textures of the modifier applied."""
+        for _texture in self._scratch_textures:
+            MemoryService.recycle_texture(_texture)
+        self._scratch_textures = []
+
+    def cached_texture(self,
+                       key: Hashable,
+                       bake_function: Callable[[moderngl.Texture], None],
+                       capacity: int,
+                       size: tuple[int, int] = None,
+                       components: int = 4,
+                       dtype: str = "f4") -> moderngl.Texture:
+        """Return a texture cached for the modifier being applied.
+
+        The first time a key is requested, a texture is allocated and
+        passed to the bake function to fill it. The modifier keeps
+        the textures of its last capacity keys, which are released
+        when its file is reloaded or when memory is needed, so a
+        cached texture must not be held beyond the current frame.
+        """
+        if size is None:
+            size = (self.get_width(), self.get_height())
+        _key = (key, tuple(size), components, dtype)
+        _texture = TextureCacheService.get_texture(self._modifier_name_id,
+                                                   _key)
+        if _texture is None:
+            _texture = MemoryService.allocate_texture(
+                size, components, dtype, category=MemoryCategory.CACHE)
+            bake_function(_texture)
+            TextureCacheService.store_texture(self._modifier_name_id, _key,
+                                              _texture, capacity)
+        return _texture
+
+    def ping_pong(self,
+                  pass_count: int
+                  ) -> list[tuple[moderngl.Texture, moderngl.Texture]]:
+        """Return the textures read and written by successive passes.
+
+        The first pass reads the src texture, and the last one writes
+        the dest texture. Passes in between alternate between the dest
+        texture and a single scratch texture, so that any number of
+        passes runs within three textures.
+        """
+        _src_texture = self.get_src_texture()
+        _dest_texture = self.get_dest_texture()
+        if pass_count < 2:
+            return [(_src_texture, _dest_texture)][:pass_count]
+        _scratch_texture = self.get_scratch_textures(1)[0]
+        # Going backwards from the dest texture, outputs alternate.
+        _output_list = [_scratch_texture if _index % 2 else _dest_texture
+                        for _index in range(pass_count)][::-1]
+        _input_list = [_src_texture] + _output_list[:-1]
+        return list(zip(_input_list, _output_list))
+
     def get_width(self) -> int:
         """Return the width of the Layer."""
         return self._width
@@ -56,22 +198,26 @@ class RenderContext:
     def get_src_texture(self) -> moderngl.Texture:
         """Return the destination moderngl texture."""
         if self._src_texture is None:
-            self._src_texture = self.get_gl_context().texture(
-                (self.get_width(), self.get_height()), 4, dtype="f4")
+            self._src_texture = MemoryService.allocate_texture(
+                (self.get_width(), self.get_height()))
         return self._src_texture
 
     def get_dest_texture(self) -> moderngl.Texture:
         """Return the destination moderngl texture."""
         if self._dest_texture is None:
-            self._dest_texture = self.get_gl_context().texture(
-                (self.get_width(), self.get_height()), 4, dtype="f4")
+            self._dest_texture = MemoryService.allocate_texture(
+                (self.get_width(), self.get_height()))
         return self._dest_texture
 
     def roll_textures(self):
         """Replace src texture with dest texture, and clear dest texture."""
+        _previous_src_texture = self._src_texture
         self._src_texture = self.get_dest_texture()
-        self._dest_texture = self.get_gl_context().texture(
-            (self.get_width(), self.get_height()), 4, dtype="f4")
+        if (_previous_src_texture is not None
+                and _previous_src_texture is not self._src_texture):
+            MemoryService.release_texture(_previous_src_texture)
+        self._dest_texture = MemoryService.allocate_texture(
+            (self.get_width(), self.get_height()))
     
     def pass_through(self):
         """Copy the src texture onto the dest texture."""
@@ -80,3 +226,11 @@ class RenderContext:
     def set_src_texture(self, texture: moderngl.Texture):
         """Set the source moderngl texture."""
         self._src_texture = texture
+
+    def is_premultiplied(self) -> bool:
+        """Tell if the src texture holds premultiplied colors."""
+        return self._premultiplied
+
+    def set_premultiplied(self, premultiplied: bool):
+        """Set whether the src texture holds premultiplied colors."""
+        self._premultiplied = premultiplied
@@ -8,37 +8,36 @@ keyframing, interpolating between keyframes...
 
 from typing import Union
 
+import numpy as np
+
 from data_types.data_type import DataType
 from core.entities.parameter import Parameter
 from core.entities.parameter_template import ParameterTemplate
-from core.entities.keyframe import Keyframe
+from core.entities.keyframe import Keyframe, KeyframeType
+from core.entities.keyframe_list import KeyframeList
+from utils.interpolate import Interpolate
+
+
+# How the value changes between two keyframes, when sampling.
+SEGMENT_HOLD = 0
+SEGMENT_LINEAR = 1
+SEGMENT_BEZIER = 2
 
 
 class AnimationService:
     """Service concerning animation in general."""
 
-    @classmethod
-    def add_keyframe(cls, parameter: Parameter, keyframe: Keyframe):
-        """Add a keyframe to a parameter."""
+    @staticmethod
+    def add_keyframe(parameter: Parameter, keyframe: Keyframe):
+        """Add a keyframe to a parameter, replacing any at its frame."""
         if parameter.accepts_keyframes():
-            _frame = keyframe.get_frame()
-            cls.remove_keyframe_at_frame(parameter, _frame)
-            _list = parameter.get_keyframe_list()
-            _list.append(keyframe)
-            _list.sort(key=lambda _keyframe: _keyframe.get_frame())
+            parameter.get_keyframe_list().insert(keyframe)
 
     @staticmethod
     def remove_keyframe_at_frame(parameter: Parameter, frame: int):
         """Remove a potential keyframe at a given frame."""
         if parameter.accepts_keyframes():
-            _list = parameter.get_keyframe_list()
-            for _index in range(len(_list)):
-                _keyframe = _list[_index]
-                _frame = _keyframe.get_frame()
-                if _frame == frame:
-                    _list.pop(_index)
-                if _frame >= frame:
-                    break
+            parameter.get_keyframe_list().remove_at_frame(frame)
 
     @staticmethod
     def get_value_at_frame(parameter: Parameter,
@@ -58,27 +57,129 @@ class AnimationService:
             return _list[0].get_value()
 
         # There are at least two keyframes.
-        for _index in range(len(_list)):
-            _keyframe_b = _list[_index]
-            _frame_b = _keyframe_b.get_frame()
-
-            if _frame_b == frame:
-                # The frame has a keyframe.
-                return _keyframe_b.get_value()
-
-            if _frame_b > frame:
-                if _index == 0:
-                    # The frame is before the first keyframe.
-                    return _keyframe_b.get_value()
-
-                # The frame is between two keyframes.
-                _keyframe_a = _list[_index-1]
-                _frame_a = _keyframe_a.get_frame()
-                _t = (frame-_frame_a)/(_frame_b-_frame_a)
-                return _keyframe_a.interpolate_to(_keyframe_b, _t)
-
-        # The frame is after the last keyframe.
-        return _list[-1].get_value()
+        _index = _list.find_segment(frame)
+        if _index == 0:
+            # The frame is before the first keyframe.
+            return _list[0].get_value()
+
+        _keyframe_a = _list[_index-1]
+        _frame_a = _keyframe_a.get_frame()
+        if _frame_a == frame or _index == len(_list):
+            # The frame has a keyframe, or is after the last keyframe.
+            return _keyframe_a.get_value()
+
+        # The frame is between two keyframes.
+        _keyframe_b = _list[_index]
+        _frame_b = _keyframe_b.get_frame()
+        _t = (frame-_frame_a)/(_frame_b-_frame_a)
+        return _keyframe_a.interpolate_to(_keyframe_b, _t)
+
+    @classmethod
+    def sample(cls, parameter: Parameter, frames: np.ndarray) -> np.ndarray:
+        """Retrieve the values of a parameter at many frames at once.
+
+        Returns a float32 array with a row of components per frame,
+        matching get_value_at_frame. The segments of all the frames
+        are searched, and their values interpolated, together. Integer
+        and boolean values are still retrieved frame by frame, as
+        interpolating them rounds intermediate values.
+        """
+        _frames = np.asarray(frames, dtype=np.float64).ravel()
+        _list = parameter.get_keyframe_list()
+        if not parameter.accepts_keyframes() or len(_list) < 2:
+            # The value doesn't change.
+            _value = cls.get_value_at_frame(parameter, 0).get_array()
+            return np.tile(np.ravel(_value).astype(np.float32),
+                           (len(_frames), 1))
+
+        _value_list = [np.ravel(_keyframe.get_value().get_array())
+                       for _keyframe in _list]
+        if not np.issubdtype(_value_list[0].dtype, np.floating):
+            return np.array(
+                [np.ravel(cls.get_value_at_frame(parameter,
+                                                 _frame).get_array())
+                 for _frame in _frames],
+                dtype=np.float32).reshape(len(_frames), -1)
+
+        _key_frames = np.array([_keyframe.get_frame() for _keyframe in _list],
+                               dtype=np.float64)
+        _values = np.array(_value_list, dtype=np.float64)
+        _modes, _y1, _y2, _t1, _t2 = cls._get_segment_arrays(_list)
+
+        # Frames before the first keyframe, on a keyframe, after the
+        # last one or after a constant keyframe hold a value.
+        _count = np.searchsorted(_key_frames, _frames, side="right")
+        _held = np.clip(_count - 1, 0, len(_list) - 1)
+        _result = _values[_held]
+        _segment = np.minimum(_held, len(_list) - 2)
+        _moving = ((_count > 0) & (_count < len(_list))
+                   & (_key_frames[_held] != _frames)
+                   & (_modes[_segment] != SEGMENT_HOLD))
+
+        _index = _segment[_moving]
+        _frame_a = _key_frames[_index]
+        _t = np.clip((_frames[_moving] - _frame_a)
+                     / (_key_frames[_index + 1] - _frame_a), 0, 1)
+        _y0 = _values[_index]
+        _y3 = _values[_index + 1]
+        _moved = _y0*(1-_t[:, None]) + _y3*_t[:, None]
+        _bezier = _modes[_index] == SEGMENT_BEZIER
+        if _bezier.any():
+            _index = _index[_bezier]
+            _T = Interpolate.solve_bezier_2d_handles(
+                _t1[_index], _t2[_index], _t[_bezier])[:, None]
+            _moved[_bezier] = (_y0[_bezier]*(1-_T)**3
+                               + _y1[_index]*(3*_T*(1-_T)**2)
+                               + _y2[_index]*(3*_T**2*(1-_T))
+                               + _y3[_bezier]*_T**3)
+        _result[_moving] = _moved
+        return _result.astype(np.float32)
+
+    @staticmethod
+    def _get_segment_arrays(keyframe_list: KeyframeList) -> tuple:
+        """Return how the value changes between each pair of keyframes.
+
+        Returns the mode of each segment, along with the values and
+        influences of its control points when it is a bezier curve,
+        following the cases of Keyframe.interpolate_to.
+        """
+        _count = len(keyframe_list) - 1
+        _size = np.size(keyframe_list[0].get_value().get_array())
+        _modes = np.full(_count, SEGMENT_HOLD)
+        _y1 = np.zeros((_count, _size))
+        _y2 = np.zeros((_count, _size))
+        _t1 = np.zeros(_count)
+        _t2 = np.ones(_count)
+        _linear_types = [KeyframeType.LINEAR, KeyframeType.BEZIER_LEFT]
+        _bezier_types = [KeyframeType.BEZIER_RIGHT, KeyframeType.BEZIER]
+        _end_types = [KeyframeType.CONSTANT, KeyframeType.LINEAR,
+                      KeyframeType.BEZIER_RIGHT]
+        for _index in range(_count):
+            _keyframe_a = keyframe_list[_index]
+            _keyframe_b = keyframe_list[_index + 1]
+            _type_a = _keyframe_a.get_keyframe_type()
+            _type_b = _keyframe_b.get_keyframe_type()
+            _value_a = np.ravel(_keyframe_a.get_value().get_array())
+            _value_b = np.ravel(_keyframe_b.get_value().get_array())
+            _handle_a = _keyframe_a.get_right_handle()
+            _handle_b = _keyframe_b.get_left_handle()
+            if _type_a in _linear_types and _type_b in _end_types:
+                _modes[_index] = SEGMENT_LINEAR
+                continue
+            if _type_a in _linear_types and _type_b in _bezier_types:
+                _y1[_index] = _value_a
+            elif _type_a in _bezier_types:
+                _y1[_index] = _value_a + np.ravel(_handle_a[1].get_array())
+                _t1[_index] = _handle_a[0]
+            else:
+                continue
+            if _type_b in _end_types:
+                _y2[_index] = _value_b
+            elif _type_b in [KeyframeType.BEZIER_LEFT, KeyframeType.BEZIER]:
+                _y2[_index] = _value_b - np.ravel(_handle_b[1].get_array())
+                _t2[_index] = 1 - _handle_b[0]
+            _modes[_index] = SEGMENT_BEZIER
+        return _modes, _y1, _y2, _t1, _t2
 
     @staticmethod
     def parameter_from_template(parameter_template: ParameterTemplate) -> Parameter:
@@ -0,0 +1,119 @@
+"""
+Service concerning baked animation tables in general.
+
+The AnimationTableService class defines services within the core
+package, concerning the values of animated parameters evaluated ahead
+of rendering. Baking a sequence samples every parameter of its layers
+and modifiers that has keyframes, over the whole duration, into a
+single float32 table holding a row per component, so that rendering a
+frame reads each value from the table by its row and frame instead of
+searching and interpolating keyframes. Rows are baked again when the
+keyframes of their parameter change, and values the table doesn't hold,
+such as integers, are evaluated as usual.
+"""
+
+from typing import Any, Optional, Union
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from core.entities.parameter import Parameter
+from core.entities.sequence import Sequence
+from core.services.animation_service import AnimationService
+
+
+class AnimationTableService:
+    """Service concerning baked animation tables in general."""
+
+    # Table, first row, row count and keyframe revision, by parameter.
+    _entries: WeakKeyDictionary[Parameter, tuple] = WeakKeyDictionary()
+
+    @classmethod
+    def bake_sequence(cls, sequence: Sequence) -> np.ndarray:
+        """Bake the animated parameters of a sequence into a table.
+
+        Parameters animated later are evaluated as usual until the
+        sequence is baked again.
+        """
+        _parameter_list = []
+        for _layer in sequence.get_layer_list():
+            _parameter_list += [
+                _layer.get_property_parameter(_name_id)
+                for _name_id in _layer.get_properties_templates()]
+            for _modifier in _layer.get_modifier_list():
+                _parameter_list += _modifier.get_parameter_list()
+        _parameter_list = [_parameter for _parameter in _parameter_list
+                           if cls._is_bakeable(_parameter)]
+        _size_list = [
+            np.size(_parameter.get_keyframe_list()[0].get_value().get_array())
+            for _parameter in _parameter_list]
+        _table = np.empty((sum(_size_list), sequence.get_duration()),
+                          dtype=np.float32)
+        _row = 0
+        for _parameter, _size in zip(_parameter_list, _size_list):
+            cls._bake_rows(_parameter, (_table, _row, _size, 0))
+            _row += _size
+        return _table
+
+    @staticmethod
+    def clear():
+        """Forget every baked table, evaluating parameters as usual."""
+        AnimationTableService._entries.clear()
+
+    @classmethod
+    def get_array_at_frame(cls,
+                           parameter: Parameter,
+                           frame: Union[int, float]) -> np.ndarray:
+        """Return the value of a parameter at a frame as an array."""
+        _entry = cls._entries.get(parameter)
+        if (_entry is not None and isinstance(frame, int)
+                and 0 <= frame < _entry[0].shape[1]):
+            if _entry[3] != parameter.get_keyframe_list().get_revision():
+                # The keyframes changed since the rows were baked.
+                _entry = cls._bake_rows(parameter, _entry)
+            if _entry is not None:
+                _table, _row, _size, _revision = _entry
+                return _table[_row:_row + _size, frame]
+        return AnimationService.get_value_at_frame(parameter,
+                                                   frame).get_array()
+
+    @classmethod
+    def get_value_at_frame(cls,
+                           parameter: Parameter,
+                           frame: Union[int, float]) -> Any:
+        """Return the value of a parameter at a frame as a common type."""
+        _array = cls.get_array_at_frame(parameter, frame)
+        if np.size(_array) == 1:
+            return _array.tolist()[0]
+        return _array.tolist()
+
+    @classmethod
+    def _bake_rows(cls,
+                   parameter: Parameter,
+                   entry: tuple[np.ndarray, int, int, int]
+                   ) -> Optional[tuple[np.ndarray, int, int, int]]:
+        """Sample a parameter into its rows of a table.
+
+        Returns the entry of the parameter, or None, forgetting the
+        rows, if the parameter can no longer be baked into them.
+        """
+        _table, _row, _size, _revision = entry
+        if (not cls._is_bakeable(parameter)
+                or np.size(parameter.get_keyframe_list()[0].get_value(
+                    ).get_array()) != _size):
+            cls._entries.pop(parameter, None)
+            return None
+        _table[_row:_row + _size] = AnimationService.sample(
+            parameter, np.arange(_table.shape[1])).T
+        _entry = (_table, _row, _size,
+                  parameter.get_keyframe_list().get_revision())
+        cls._entries[parameter] = _entry
+        return _entry
+
+    @staticmethod
+    def _is_bakeable(parameter: Parameter) -> bool:
+        """Tell if a parameter is animated with floating point values."""
+        _list = parameter.get_keyframe_list()
+        return (parameter.accepts_keyframes() and len(_list) > 1
+                and np.issubdtype(_list[0].get_value().get_array().dtype,
+                                  np.floating))
@@ -0,0 +1,348 @@
+"""
+Service concerning rendering on the CPU.
+
+The CPURenderService class defines services within the core
+package, concerning the rendering of a Sequence without a GPU. It
+mirrors the RenderService with numpy arrays: each modifier provides
+an '_apply_numpy' function, and passes are split into tiles of rows
+rendered by a pool of worker processes sharing the images...
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from core.entities.cpu_render_context import CPURenderContext
+from core.entities.modifier import Modifier
+from core.entities.modifier_repository import ModifierRepository
+from core.entities.modifier_template import ModifierFlag
+from core.entities.sequence import Sequence
+from core.entities.sequence_context import SequenceContext
+from core.entities.solid_layer import SolidLayer
+from core.entities.visual_layer import VisualLayer
+from core.services.modifier_service import ModifierService
+from core.services.render_service import RenderService, AntiAliasing
+from utils.config import Config
+from utils.shared_array import SharedArray
+
+
+# Tiles per process, so that uneven tiles still keep every core busy.
+TILES_PER_PROCESS = 4
+MIN_TILE_ROWS = 8
+
+
+def _run_modifier_tile(task: tuple):
+    """Apply the numpy function of a modifier to a tile of rows."""
+    (_py_file, _shape, _src_name, _dest_name,
+     _rows, _frame, _arguments) = task
+    _src = SharedArray(_shape, _src_name)
+    _dest = SharedArray(_shape, _dest_name)
+    try:
+        _function = ModifierService.load_numpy_function(Path(_py_file))
+        # Like shaders, modifiers may produce NaN or infinite values.
+        with np.errstate(all="ignore"):
+            _dest.get_array()[_rows] = _function(
+                _src.get_array(), _rows, _frame, *_arguments)
+    finally:
+        _src.release()
+        _dest.release()
+
+
+def _run_transform_tile(task: tuple):
+    """Transform a layer over a tile of rows and composite it."""
+    (_layer_shape, _layer_name, _frame_shape, _frame_name,
+     _rows, _transform, _analytic) = task
+    _layer = SharedArray(_layer_shape, _layer_name)
+    _frame = SharedArray(_frame_shape, _frame_name)
+    try:
+        _color = CPURenderService.transform_rows(
+            _layer.get_array(), _rows, (_frame_shape[1], _frame_shape[0]),
+            _transform, _analytic)
+        _frame_rows = _frame.get_array()[_rows]
+        _frame_rows[:] = _color + _frame_rows*(1. - _color[..., 3:])
+    finally:
+        _layer.release()
+        _frame.release()
+
+
+class CPURenderService:
+    """Service concerning rendering on the CPU."""
+
+    _pool: ProcessPoolExecutor = None
+
+    @staticmethod
+    def get_process_count() -> int:
+        """Return the number of processes rendering tiles."""
+        if Config.render.cpu_processes > 0:
+            return Config.render.cpu_processes
+        return os.cpu_count() or 1
+
+    @classmethod
+    def get_row_tiles(cls, height: int) -> list[slice]:
+        """Split rows into tiles to be rendered in parallel."""
+        _tile_count = cls.get_process_count() * TILES_PER_PROCESS
+        _tile_rows = max(-(-height // _tile_count), MIN_TILE_ROWS)
+        return [slice(_start, min(_start + _tile_rows, height))
+                for _start in range(0, height, _tile_rows)]
+
+    @classmethod
+    def _run_tiles(cls, function: Callable[[tuple], None],
+                   task_list: list[tuple]):
+        """Run tile tasks in the process pool, or inline."""
+        if cls.get_process_count() == 1 or len(task_list) == 1:
+            for _task in task_list:
+                function(_task)
+            return
+        if cls._pool is None:
+            # Spawned workers don't inherit the GUI or OpenGL state.
+            cls._pool = ProcessPoolExecutor(
+                cls.get_process_count(),
+                mp_context=multiprocessing.get_context("spawn"))
+        for _result in cls._pool.map(function, task_list):
+            pass
+
+    @classmethod
+    def shutdown(cls):
+        """Stop the worker processes."""
+        if cls._pool is not None:
+            cls._pool.shutdown()
+            cls._pool = None
+
+    @classmethod
+    def apply_modifier_to_render_context(cls,
+                                         modifier: Modifier,
+                                         context: CPURenderContext):
+        """Execute the action of a Modifier on a CPURenderContext."""
+        _name_id = modifier.get_template_id()
+        _flags = ModifierRepository.get_template(_name_id).get_flags()
+        _premultiplied = ModifierFlag.STRAIGHT_ALPHA not in _flags
+        if ModifierFlag.WRITEONLY in _flags:
+            context.set_premultiplied(_premultiplied)
+        else:
+            cls.convert_alpha(context, _premultiplied)
+        _py_file = ModifierService.get_modifier_path(_name_id)
+        # Fail early, rather than in every worker process.
+        ModifierService.load_numpy_function(_py_file)
+        _sequence_ctx = context.get_sequence_context()
+        _arguments = [
+            RenderService.get_parameter_value(_parameter, _sequence_ctx)
+            for _parameter in modifier.get_parameter_list()]
+        _shape = (context.get_height(), context.get_width(), 4)
+        _task_list = [
+            (str(_py_file), _shape, context.get_src_array().get_name(),
+             context.get_dest_array().get_name(), _rows,
+             _sequence_ctx.get_current_frame(), _arguments)
+            for _rows in cls.get_row_tiles(context.get_height())]
+        cls._run_tiles(_run_modifier_tile, _task_list)
+
+    @classmethod
+    def render_visual_layer(cls,
+                            layer: VisualLayer,
+                            sequence_ctx: SequenceContext) -> SharedArray:
+        """Render a VisualLayer to a shared array."""
+        if isinstance(layer, SolidLayer):
+            return cls.render_solid_layer(layer, sequence_ctx)
+        raise NotImplementedError(f"Rendering method for '{layer.__class__}' "
+                                  f"not implemented")
+
+    @classmethod
+    def render_solid_layer(cls,
+                           layer: SolidLayer,
+                           sequence_ctx: SequenceContext) -> SharedArray:
+        """Render a SolidLayer to a premultiplied shared array."""
+        _width = layer.get_property("width").get_value()
+        _height = layer.get_property("height").get_value()
+        _context = CPURenderContext(_width, _height, sequence_ctx)
+        _color = RenderService.get_parameter_value(
+            layer.get_property_parameter("color"), sequence_ctx)
+        _alpha = _color[3]
+        _context.get_src_array().get_array()[:] = (
+            _color[0]*_alpha, _color[1]*_alpha, _color[2]*_alpha, _alpha)
+        _modifier_list = ModifierService.get_enabled_modifiers(layer)
+        _start_index = RenderService.get_layer_program(
+            layer).get_start_index()
+        try:
+            for _modifier in _modifier_list[_start_index:]:
+                cls.apply_modifier_to_render_context(_modifier, _context)
+                _context.roll_arrays()
+        except Exception:
+            # Shared memory outlives the process unless it is freed.
+            _context.release()
+            raise
+        cls.convert_alpha(_context, True)
+        _context.release_dest_array()
+        return _context.get_src_array()
+
+    @staticmethod
+    def convert_alpha(context: CPURenderContext, premultiplied: bool):
+        """Convert the src array of a CPURenderContext to an alpha mode."""
+        if context.is_premultiplied() == premultiplied:
+            return
+        _array = context.get_src_array().get_array()
+        _alpha = _array[..., 3:]
+        if premultiplied:
+            _array[..., :3] *= _alpha
+        else:
+            np.divide(_array[..., :3], _alpha, out=_array[..., :3],
+                      where=_alpha > 0.)
+        context.set_premultiplied(premultiplied)
+
+    @classmethod
+    def render_sequence_frame(cls,
+                              sequence: Sequence,
+                              frame: int,
+                              export: bool = False) -> np.ndarray:
+        """Render a frame of a Sequence to a numpy array.
+
+        Rows are stored bottom-up, like the texture returned by
+        RenderService.render_sequence_frame.
+        """
+        _anti_aliasing = RenderService.get_anti_aliasing(export)
+        _width = sequence.get_width()
+        _height = sequence.get_height()
+        _sequence_ctx = SequenceContext(sequence, frame)
+        _frame_array = SharedArray((_height, _width, 4))
+        _frame_array.get_array()[:] = 0.
+        try:
+            for _layer in sequence.get_layer_list():
+                if not isinstance(_layer, VisualLayer):
+                    continue
+                if (frame < _layer.get_start_frame()
+                        or frame >= _layer.get_end_frame()):
+                    continue
+                _layer_array = cls.render_visual_layer(_layer, _sequence_ctx)
+                try:
+                    cls._composite_layer(_layer, _layer_array, _frame_array,
+                                         _sequence_ctx, _anti_aliasing)
+                finally:
+                    _layer_array.release()
+            _result = _frame_array.get_array().copy()
+        finally:
+            _frame_array.release()
+        cls._tonemap(_result)
+        return _result
+
+    @classmethod
+    def _composite_layer(cls,
+                         layer: VisualLayer,
+                         layer_array: SharedArray,
+                         frame_array: SharedArray,
+                         sequence_ctx: SequenceContext,
+                         anti_aliasing: AntiAliasing):
+        """Transform a rendered layer and composite it over the frame."""
+        _layer_shape = layer_array.get_array().shape
+        _layer_size = (_layer_shape[1], _layer_shape[0])
+        _transform = RenderService.get_layer_transform(layer, sequence_ctx)
+        _offset = RenderService.get_integer_offset(_layer_size, _transform,
+                                                   sequence_ctx)
+        if _offset is not None:
+            cls._composite_over(layer_array.get_array(),
+                                frame_array.get_array(), _offset)
+            return
+        # Multisampling strategies are approximated analytically.
+        _analytic = RenderService.resolve_anti_aliasing(
+            anti_aliasing, _layer_size, _transform) != AntiAliasing.NONE
+        _frame_shape = frame_array.get_array().shape
+        _task_list = [
+            (_layer_shape, layer_array.get_name(), _frame_shape,
+             frame_array.get_name(), _rows, _transform, _analytic)
+            for _rows in cls.get_row_tiles(_frame_shape[0])]
+        cls._run_tiles(_run_transform_tile, _task_list)
+
+    @staticmethod
+    def transform_rows(layer_array: np.ndarray,
+                       rows: slice,
+                       frame_size: tuple[int, int],
+                       transform: tuple,
+                       analytic: bool) -> np.ndarray:
+        """Sample a transformed layer over rows of the frame.
+
+        Pixels are mapped back to the layer, which is sampled
+        bilinearly with clamped edges, then weighted by its opacity
+        and by the coverage of the pixel.
+        """
+        _position, _anchor, _scale, _rotation, _opacity = transform
+        _frame_width, _frame_height = frame_size
+        _layer_height, _layer_width = layer_array.shape[:2]
+        _row_count = rows.stop - rows.start
+        _size = (_layer_width*_scale[0], _layer_height*_scale[1])
+        if _size[0] == 0 or _size[1] == 0:
+            return np.zeros((_row_count, _frame_width, 4), dtype=np.float32)
+
+        # Inverse of the rotation and scale, from pixels to layer uv.
+        _cos = np.cos(_rotation)
+        _sin = np.sin(_rotation)
+        _jacobian = np.array([[_cos/_size[0], _sin/_size[0]],
+                              [-_sin/_size[1], _cos/_size[1]]])
+        _x = (np.arange(_frame_width) + .5 - _position[0]*_frame_width)
+        # Rows are stored bottom-up in the frame.
+        _y = (_frame_height - np.arange(rows.start, rows.stop) - .5
+              - _position[1]*_frame_height)
+        _u = (_jacobian[0, 0]*_x[None, :] + _jacobian[0, 1]*_y[:, None]
+              + _anchor[0])
+        _v = (_jacobian[1, 0]*_x[None, :] + _jacobian[1, 1]*_y[:, None]
+              + _anchor[1])
+
+        if analytic:
+            _coverage = np.ones(_u.shape)
+            for _uv, _derivatives in [(_u, _jacobian[0]),
+                                      (_v, _jacobian[1])]:
+                _fwidth = max(np.sum(np.abs(_derivatives)), 1e-6)
+                _edge = np.minimum(_uv, 1. - _uv)/_fwidth
+                _coverage *= np.clip(_edge + .5, 0., 1.)
+        else:
+            _coverage = ((_u >= 0.) & (_u < 1.)
+                         & (_v >= 0.) & (_v < 1.)).astype(np.float64)
+
+        _s = np.clip(_u, 0., 1.)*_layer_width - .5
+        _t = np.clip(_v, 0., 1.)*_layer_height - .5
+        _s0 = np.floor(_s)
+        _t0 = np.floor(_t)
+        _fs = (_s - _s0)[..., None].astype(np.float32)
+        _ft = (_t - _t0)[..., None].astype(np.float32)
+        _s0 = _s0.astype(np.int64)
+        _t0 = _t0.astype(np.int64)
+        _x0 = np.clip(_s0, 0, _layer_width - 1)
+        _x1 = np.clip(_s0 + 1, 0, _layer_width - 1)
+        _y0 = np.clip(_t0, 0, _layer_height - 1)
+        _y1 = np.clip(_t0 + 1, 0, _layer_height - 1)
+        _top = (layer_array[_y0, _x0]*(1. - _fs)
+                + layer_array[_y0, _x1]*_fs)
+        _bottom = (layer_array[_y1, _x0]*(1. - _fs)
+                   + layer_array[_y1, _x1]*_fs)
+        _color = _top*(1. - _ft) + _bottom*_ft
+        _weight = (_opacity*_coverage)[..., None].astype(np.float32)
+        return _color*_weight
+
+    @staticmethod
+    def _composite_over(layer_array: np.ndarray,
+                        frame_array: np.ndarray,
+                        offset: tuple[int, int]):
+        """Composite a layer moved by an integer offset over the frame."""
+        _layer_height, _layer_width = layer_array.shape[:2]
+        _frame_height, _frame_width = frame_array.shape[:2]
+        _x0 = max(offset[0], 0)
+        _x1 = min(offset[0] + _layer_width, _frame_width)
+        _y0 = max(offset[1], 0)
+        _y1 = min(offset[1] + _layer_height, _frame_height)
+        if _x0 >= _x1 or _y0 >= _y1:
+            return
+        _color = layer_array[_y0 - offset[1]:_y1 - offset[1],
+                             _x0 - offset[0]:_x1 - offset[0]]
+        # The frame is stored bottom-up, the layer top-down.
+        _region = frame_array[::-1][_y0:_y1, _x0:_x1]
+        _region[:] = _color + _region*(1. - _color[..., 3:])
+
+    @staticmethod
+    def _tonemap(array: np.ndarray):
+        """Convert premultiplied linear RGB to straight sRGB in place."""
+        _alpha = array[..., 3:]
+        _linear = np.zeros_like(array[..., :3])
+        np.divide(array[..., :3], _alpha, out=_linear, where=_alpha > 0.)
+        _higher = 1.055*np.power(np.maximum(_linear, 0.), 1./2.4) - .055
+        array[..., :3] = np.where(_linear < .0031308, _linear*12.92, _higher)
+        np.clip(array, 0., 1., out=array)
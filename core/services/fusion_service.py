@@ -0,0 +1,109 @@
+"""
+Service concerning the fusion of pointwise modifiers.
+
+The FusionService class defines services within the core
+package, concerning pointwise modifiers. A pointwise modifier
+declares a GLSL function computing each output pixel from the same
+input pixel only, so consecutive pointwise modifiers can be fused
+into a single compute shader, reading and writing each pixel once.
+"""
+
+import re
+
+
+DECLARATION_PATTERNS = [
+    re.compile(r"^(?:(?:uniform|const)\s+)?\w+\s+(\w+)\s*[;=(\[]", re.M),
+    re.compile(r"^struct\s+(\w+)", re.M),
+    re.compile(r"^#define\s+(\w+)", re.M)
+]
+POINTWISE_FUNCTION = "pointwise"
+FUSED_HEADER = """#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+"""
+FUSED_MAIN = """
+void main() {{
+    ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+    ivec2 dimensions = imageSize(img_output).xy;
+    if(any(greaterThanEqual(coords, dimensions))){{return;}}
+    vec4 color = imageLoad(img_input, coords);
+{stages}
+    imageStore(img_output, coords, color);
+}}
+"""
+PREMULTIPLY = "    color.rgb *= color.a;"
+UNPREMULTIPLY = "    if(color.a > 0.){color.rgb /= color.a;}"
+
+
+class FusionService:
+    """Service concerning the fusion of pointwise modifiers."""
+
+    @staticmethod
+    def get_prefix(index: int) -> str:
+        """Return the prefix of the names declared by a fused stage."""
+        return f"m{index}_"
+
+    @staticmethod
+    def get_declared_names(pointwise_code: str) -> list[str]:
+        """Return the names declared at the top level of GLSL code.
+
+        Declarations are expected to start at the beginning of a
+        line, and to declare a single name each.
+        """
+        _names = []
+        for _pattern in DECLARATION_PATTERNS:
+            for _name in _pattern.findall(pointwise_code):
+                if _name not in _names:
+                    _names.append(_name)
+        return _names
+
+    @classmethod
+    def prefix_names(cls, pointwise_code: str, index: int) -> str:
+        """Prefix the names declared by a stage to avoid collisions."""
+        _prefix = cls.get_prefix(index)
+        for _name in cls.get_declared_names(pointwise_code):
+            # Skip swizzles and struct fields, such as 'color.a'.
+            pointwise_code = re.sub(rf"(?<![.\w]){_name}\b",
+                                    f"{_prefix}{_name}", pointwise_code)
+        return pointwise_code
+
+    @classmethod
+    def create_fused_declarations(cls,
+                                  pointwise_code_list: list[str]) -> str:
+        """Join the declarations of the stages, with prefixed names."""
+        return "\n".join(cls.prefix_names(_pointwise_code, _index)
+                         for _index, _pointwise_code
+                         in enumerate(pointwise_code_list))
+
+    @classmethod
+    def create_fused_glsl(cls,
+                          pointwise_code_list: list[str],
+                          straight_alpha_list: list[bool],
+                          input_premultiplied: bool,
+                          output_premultiplied: bool = None) -> str:
+        """Create a compute shader chaining pointwise functions.
+
+        The colors are converted between premultiplied and straight
+        alpha before each stage that requires it, and before writing
+        the output when output_premultiplied is not None.
+        """
+        _stages = []
+        _premultiplied = input_premultiplied
+        for _index, _straight_alpha in enumerate(straight_alpha_list):
+            if _premultiplied and _straight_alpha:
+                _stages.append(UNPREMULTIPLY)
+            elif not _premultiplied and not _straight_alpha:
+                _stages.append(PREMULTIPLY)
+            _premultiplied = not _straight_alpha
+            _function = f"{cls.get_prefix(_index)}{POINTWISE_FUNCTION}"
+            _stages.append(f"    color = {_function}(color, coords);")
+        if output_premultiplied is not None:
+            if _premultiplied and not output_premultiplied:
+                _stages.append(UNPREMULTIPLY)
+            elif not _premultiplied and output_premultiplied:
+                _stages.append(PREMULTIPLY)
+        return (FUSED_HEADER
+                + cls.create_fused_declarations(pointwise_code_list)
+                + FUSED_MAIN.format(stages="\n".join(_stages)))
@@ -0,0 +1,152 @@
+"""
+Service concerning the intermediate textures of a layer in general.
+
+The LayerCacheService class defines services within the core package,
+concerning the textures a layer goes through while its modifiers are
+applied. While a layer is being edited, a copy of the texture output
+by each of its dispatches is kept, along with the state of the layer
+and of the modifiers applied so far. Editing a modifier then only
+applies it and the following ones again, starting from the texture
+left by the previous dispatch. Only the layer being edited is cached,
+and its textures are released first when memory is needed.
+"""
+
+import weakref
+from typing import Optional
+
+import moderngl
+
+from core.entities.gl_context import GLContext
+from core.entities.layer import Layer
+from core.services.memory_service import (MemoryService, MemoryCategory,
+                                          GPUMemoryError)
+from core.services.region_service import RegionService
+
+
+LAYER_CACHE = "layer_cache"
+# Intermediate textures are cheaper to render again than pooled
+# textures or modifier caches are.
+CACHE_PRIORITY = 1
+
+
+class LayerCacheService:
+    """Service concerning the intermediate textures of a layer."""
+
+    _layer: Optional[weakref.ref] = None
+    # State key, valid region, alpha mode and texture, by dispatch count.
+    _entries: dict[int, tuple[int, tuple, bool, moderngl.Texture]] = dict()
+
+    @classmethod
+    def set_edited_layer(cls, layer: Optional[Layer]):
+        """Cache the intermediate textures of a layer, and no other."""
+        if cls.is_edited_layer(layer):
+            return
+        cls.clear()
+        cls._layer = None if layer is None else weakref.ref(layer)
+
+    @classmethod
+    def is_edited_layer(cls, layer: Optional[Layer]) -> bool:
+        """Tell if the intermediate textures of a layer are cached."""
+        _edited_layer = None if cls._layer is None else cls._layer()
+        return layer is not None and _edited_layer is layer
+
+    @classmethod
+    def find_entry(cls,
+                   key_list: list[int],
+                   region_list: list[tuple[int, int, int, int]]
+                   ) -> tuple[int, Optional[moderngl.Texture], bool]:
+        """Return where to resume applying the dispatches of a layer.
+
+        The keys and regions are those of the texture after each
+        dispatch count, starting from the source. The last cached
+        texture with the same key and covering the region is returned
+        as a copy, with its dispatch count and alpha mode, or None and
+        0 if none matches. Textures after it no longer match and are
+        released.
+        """
+        for _count in range(len(key_list) - 1, 0, -1):
+            _entry = cls._entries.get(_count)
+            if _entry is None:
+                continue
+            _key, _region, _premultiplied, _texture = _entry
+            if (_key == key_list[_count]
+                    and RegionService.contains_region(_region,
+                                                   region_list[_count])):
+                break
+        else:
+            cls.clear()
+            return 0, None, True
+        for _stale_count in [_other for _other in cls._entries
+                             if _other > _count]:
+            cls._release_entry(_stale_count)
+        return _count, cls._copy_texture(_texture), _premultiplied
+
+    @classmethod
+    def store_entry(cls,
+                    count: int,
+                    key: int,
+                    region: tuple[int, int, int, int],
+                    premultiplied: bool,
+                    texture: moderngl.Texture):
+        """Keep a copy of the texture after some dispatches."""
+        cls._release_entry(count)
+        try:
+            _copy = cls._copy_texture(texture, MemoryCategory.CACHE)
+        except GPUMemoryError:
+            return
+        if not cls._entries:
+            MemoryService.register_cache(LAYER_CACHE, CACHE_PRIORITY,
+                                         cls._evict)
+        cls._entries[count] = (key, region, premultiplied, _copy)
+
+    @classmethod
+    def clear(cls):
+        """Release every cached texture."""
+        for _count in list(cls._entries):
+            cls._release_entry(_count)
+
+    @classmethod
+    def _release_entry(cls, count: int):
+        """Release the texture cached after some dispatches."""
+        _entry = cls._entries.pop(count, None)
+        if _entry is not None:
+            MemoryService.release_texture(_entry[3])
+        if not cls._entries:
+            MemoryService.unregister_cache(LAYER_CACHE)
+
+    @classmethod
+    def _evict(cls, byte_count: int):
+        """Release cached textures until byte_count is freed.
+
+        Textures after the fewest dispatches go first, as they only
+        help when editing the first modifiers.
+        """
+        _freed = 0
+        for _count in sorted(cls._entries):
+            if _freed >= byte_count:
+                return
+            _texture = cls._entries[_count][3]
+            _freed += MemoryService.texture_bytes(
+                _texture.size, _texture.components, _texture.dtype)
+            cls._release_entry(_count)
+
+    @staticmethod
+    def _copy_texture(texture: moderngl.Texture,
+                      category: MemoryCategory = MemoryCategory.LAYER
+                      ) -> moderngl.Texture:
+        """Return a copy of a texture, allocated in a category.
+
+        Copies meant for the cache raise GPUMemoryError rather than
+        exceeding the memory budget. Pixels go through a buffer on the
+        GPU, as copying framebuffers would clamp them.
+        """
+        _copy = MemoryService.allocate_texture(
+            texture.size, texture.components, texture.dtype,
+            category=category, may_fail=category == MemoryCategory.CACHE)
+        _buffer = GLContext.get_context().buffer(
+            reserve=MemoryService.texture_bytes(
+                texture.size, texture.components, texture.dtype))
+        texture.read_into(_buffer)
+        _copy.write(_buffer)
+        _buffer.release()
+        return _copy
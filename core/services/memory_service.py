@@ -0,0 +1,234 @@
+"""
+Service concerning GPU memory in general.
+
+The MemoryService class defines services within the core
+package, concerning the allocation of GPU textures. It accounts
+for the bytes held by each category of texture, and enforces a
+memory budget by evicting registered caches in priority order...
+Textures used for a short while can also be recycled into a pool,
+instead of being released and allocated again for each frame.
+"""
+
+from enum import Enum
+from typing import Callable, Optional
+
+import moderngl
+
+from core.entities.gl_context import GLContext
+from utils.config import Config
+
+
+DTYPE_SIZES = {"f1": 1, "u1": 1, "i1": 1, "f2": 2, "u2": 2, "i2": 2,
+               "f4": 4, "u4": 4, "i4": 4}
+POOL_CACHE = "texture_pool"
+# Pooled textures are unused, so they are evicted before any cache.
+POOL_PRIORITY = -1
+
+
+class MemoryCategory(Enum):
+    """Enumerate the categories of GPU memory being accounted for."""
+
+    LAYER = 0
+    RENDER_TARGET = 1
+    FRAME = 2
+    VIEWER = 3
+    CACHE = 4
+
+
+class GPUMemoryError(Exception):
+    """Raised when a texture cannot fit in GPU memory."""
+
+
+class MemoryService:
+    """Service concerning GPU memory in general."""
+
+    _allocations: dict[int, tuple[MemoryCategory, int]] = dict()
+    _usage: dict[MemoryCategory, int] = {
+        _category: 0 for _category in MemoryCategory}
+    _caches: list[tuple[int, str, Callable[[int], None]]] = []
+    # Unused textures by size, components and dtype.
+    _pool: dict[tuple, list[moderngl.Texture]] = dict()
+
+    @staticmethod
+    def texture_bytes(size: tuple[int, int],
+                      components: int = 4,
+                      dtype: str = "f4",
+                      samples: int = 0) -> int:
+        """Return the number of bytes a texture occupies."""
+        return (size[0] * size[1] * components
+                * DTYPE_SIZES[dtype] * max(samples, 1))
+
+    @classmethod
+    def get_budget(cls) -> int:
+        """Return the GPU memory budget in bytes."""
+        return Config.render.memory_budget_mb * 1024 * 1024
+
+    @classmethod
+    def get_usage(cls, category: MemoryCategory = None) -> int:
+        """Return the bytes held by a category, or by all of them."""
+        if category is None:
+            return sum(cls._usage.values())
+        return cls._usage[category]
+
+    @classmethod
+    def register_cache(cls,
+                       name: str,
+                       priority: int,
+                       evict_function: Callable[[int], None]):
+        """Register a cache that can free memory under pressure.
+
+        The evict function receives the number of bytes to free, and
+        releases as many of its textures as it sees fit. Caches with
+        the lowest priority are evicted first.
+        """
+        cls.unregister_cache(name)
+        cls._caches.append((priority, name, evict_function))
+        cls._caches.sort(key=lambda _cache: _cache[0])
+
+    @classmethod
+    def unregister_cache(cls, name: str):
+        """Stop evicting a registered cache."""
+        cls._caches = [_cache for _cache in cls._caches
+                       if _cache[1] != name]
+
+    @classmethod
+    def evict(cls, byte_count: int):
+        """Evict caches in priority order until byte_count is freed."""
+        _target = cls.get_usage() - byte_count
+        for _priority, _name, _evict_function in list(cls._caches):
+            _missing = cls.get_usage() - _target
+            if _missing <= 0:
+                return
+            _evict_function(_missing)
+
+    @classmethod
+    def allocate_texture(cls,
+                         size: tuple[int, int],
+                         components: int = 4,
+                         dtype: str = "f4",
+                         samples: int = 0,
+                         category: MemoryCategory = MemoryCategory.LAYER,
+                         fallback_dtype: Optional[str] = None,
+                         may_fail: bool = False
+                         ) -> moderngl.Texture:
+        """Allocate an accounted moderngl Texture.
+
+        Caches are evicted when the texture would exceed the budget.
+        If it still does not fit, the texture is allocated with the
+        fallback dtype when one is given, or GPUMemoryError is raised
+        when may_fail is set. Otherwise the budget is exceeded rather
+        than interrupting the render.
+        """
+        _byte_count = cls.texture_bytes(size, components, dtype, samples)
+        _overflow = cls.get_usage() + _byte_count - cls.get_budget()
+        if _overflow > 0:
+            cls.evict(_overflow)
+            _overflow = cls.get_usage() + _byte_count - cls.get_budget()
+        if _overflow > 0:
+            if fallback_dtype is not None:
+                return cls.allocate_texture(size, components, fallback_dtype,
+                                            samples, category,
+                                            may_fail=may_fail)
+            if may_fail:
+                raise GPUMemoryError(f"Texture of {_byte_count} bytes "
+                                     f"exceeds the memory budget")
+        try:
+            _texture = cls._create_texture(size, components, dtype, samples)
+        except moderngl.Error:
+            # The driver ran out of memory: free every cache and retry.
+            cls.evict(cls.get_usage())
+            try:
+                _texture = cls._create_texture(size, components,
+                                               dtype, samples)
+            except moderngl.Error as _error:
+                if fallback_dtype is not None:
+                    return cls.allocate_texture(size, components,
+                                                fallback_dtype, samples,
+                                                category, may_fail=may_fail)
+                raise GPUMemoryError(f"Couldn't allocate a texture of "
+                                     f"{_byte_count} bytes") from _error
+        cls._allocations[_texture.glo] = (category, _byte_count)
+        cls._usage[category] += _byte_count
+        return _texture
+
+    @staticmethod
+    def _create_texture(size: tuple[int, int],
+                        components: int,
+                        dtype: str,
+                        samples: int) -> moderngl.Texture:
+        """Create a moderngl Texture with the shared context."""
+        return GLContext.get_context().texture(
+            size, components, dtype=dtype, samples=samples)
+
+    @classmethod
+    def release_texture(cls, texture: moderngl.Texture):
+        """Release a moderngl Texture and stop accounting for it."""
+        if texture is None:
+            return
+        _allocation = cls._allocations.pop(texture.glo, None)
+        if _allocation is not None:
+            _category, _byte_count = _allocation
+            cls._usage[_category] -= _byte_count
+        texture.release()
+
+    @classmethod
+    def acquire_texture(cls,
+                        size: tuple[int, int],
+                        components: int = 4,
+                        dtype: str = "f4",
+                        category: MemoryCategory = MemoryCategory.LAYER
+                        ) -> moderngl.Texture:
+        """Return a recycled texture if one matches, or allocate one.
+
+        The content of a recycled texture is left undefined.
+        """
+        _free_list = cls._pool.get((tuple(size), components, dtype))
+        if _free_list:
+            _texture = _free_list.pop()
+            cls.set_category(_texture, category)
+            return _texture
+        return cls.allocate_texture(size, components, dtype,
+                                    category=category)
+
+    @classmethod
+    def recycle_texture(cls, texture: moderngl.Texture):
+        """Keep a texture for acquire_texture instead of releasing it.
+
+        Recycled textures still count towards the budget, and are
+        released first when memory is needed.
+        """
+        if texture is None:
+            return
+        if not cls._pool:
+            cls.register_cache(POOL_CACHE, POOL_PRIORITY,
+                               cls._evict_pool)
+        cls.set_category(texture, MemoryCategory.CACHE)
+        _key = (texture.size, texture.components, texture.dtype)
+        cls._pool.setdefault(_key, []).append(texture)
+
+    @classmethod
+    def _evict_pool(cls, byte_count: int):
+        """Release recycled textures until byte_count is freed."""
+        _freed = 0
+        for _key in list(cls._pool):
+            _free_list = cls._pool[_key]
+            while _free_list and _freed < byte_count:
+                _texture = _free_list.pop()
+                _freed += cls._allocations.get(_texture.glo, (None, 0))[1]
+                cls.release_texture(_texture)
+            if not _free_list:
+                del cls._pool[_key]
+        if not cls._pool:
+            cls.unregister_cache(POOL_CACHE)
+
+    @classmethod
+    def set_category(cls,
+                     texture: moderngl.Texture,
+                     category: MemoryCategory):
+        """Move an accounted texture to another category."""
+        if texture.glo not in cls._allocations:
+            return
+        _old_category, _byte_count = cls._allocations[texture.glo]
+        cls._usage[_old_category] -= _byte_count
+        cls._usage[category] += _byte_count
+        cls._allocations[texture.glo] = (category, _byte_count)
@@ -5,12 +5,57 @@ The ModifierService class defines services within the core
 package, concerning modifiers that the user can apply. This
 includes loading and managing the modifier repository,
 adding modifiers to layers...
+
+The metadata of each modifier file is cached in a manifest, so that
+only new or changed files are imported when the app starts. Other
+modifiers are imported the first time their '_apply' function is
+needed.
+
+Instead of an '_apply' function, a modifier can declare its GLSL code
+in '_glsl', along with an optional '_uniforms' dict mapping parameter
+name ids to uniform names (by default, each parameter is uploaded to
+the uniform of the same name). The engine then compiles, caches and
+dispatches the shader itself. The shader reads the source image at
+binding 0 and writes the destination image at binding 1, and can
+declare a 'frame' float uniform to receive the current frame.
+Scalar and vector uniforms are moved to a std140 uniform block at
+binding 0, filled once per frame, so they must be declared one per
+line, with 'uniform' as the first word.
+
+A modifier whose output pixels only depend on the same input pixel
+can instead declare '_pointwise', the GLSL code of a function
+'vec4 pointwise(vec4 color, ivec2 coords)' along with its uniforms
+and helpers. The engine fuses consecutive pointwise modifiers into a
+single shader, so declarations must start at the beginning of a line.
+
+A GLSL modifier flagged "expensive" is dispatched at a reduced rate:
+on a coarse grid first, then only for the pixels where neighbouring
+samples differ, the others being interpolated. Each invocation must
+then compute its own pixel without sharing data with the others.
+
+To be rendered by the CPU backend, a modifier also defines an
+'_apply_numpy(_src, _rows, _frame, ...)' function taking the source
+image as a float32 array of shape (height, width, 4), and returning
+the rows selected by the '_rows' slice of the destination image.
+
+So that the viewer can render only part of a layer, a modifier can
+declare '_padding', how far the input pixels it reads extend beyond
+the output pixels it writes: a list of horizontal and vertical pixel
+counts, "unbounded", or a function of the parameters returning such a
+list. Pointwise modifiers have no padding, and other modifiers are
+unbounded unless they declare one. An '_apply' function declaring a
+padding reads the output region from the render context, and only
+reads its source within that region grown by the padding.
 """
 
-from typing import Callable
+from typing import Callable, Optional
 from pathlib import Path
+from types import ModuleType
 import importlib.util
 import inspect
+import hashlib
+import json
+import re
 
 from data_types.data_type_name import DataTypeName
 from core.entities.modifier_template import ModifierTemplate, ModifierFlag
@@ -19,15 +64,27 @@ from core.entities.parameter_template import ParameterTemplate, ParameterFlag
 from core.services.animation_service import AnimationService
 from core.entities.modifier import Modifier
 from core.entities.layer import Layer
+from core.entities.gl_context import GLContext
+from core.services.texture_cache_service import TextureCacheService
 
 from utils.config import Config
 
 
+MANIFEST_VERSION = 4
+LOCAL_SIZE_PATTERN = re.compile(r"local_size_([xy])\s*=\s*(\d+)")
+
+
 class ModifierService:
     """Service concerning modifiers in general."""
 
     _loaded: bool = False
     _modifier_count = 0
+    _manifest: dict[str, dict] = dict()
+    _paths: dict[str, Path] = dict()
+    # Modification time and size of each file when last checked.
+    _file_stats: dict[str, tuple[int, int]] = dict()
+    # NumPy functions of the CPU backend, by file and modification time.
+    _numpy_functions: dict[tuple[str, int], Callable] = dict()
 
     @classmethod
     def load_modifiers_from_directory(cls):
@@ -38,66 +95,331 @@ class ModifierService:
         if not _directory.is_dir():
             raise ValueError(f"Trying to load modifiers from "
                              f"invalid directory '{_directory}'")
+        _manifest_path = Path(Config().app.modifier_manifest)
+        _old_manifest = cls._read_manifest(_manifest_path)
+        _manifest = cls._manifest
         _repository = ModifierRepository.get_repository()
-        _structure = ModifierRepository.get_structure()
         for _py_file in _directory.rglob("*.py"):
-            if _py_file.is_file():
-                _name_id, _template = cls.load_modifier_from_file(_py_file)
-                if _name_id in _repository:
-                    print(f"Modifier '{_name_id}' already in repository")
-                    continue
-                _repository[_name_id] = _template
-                # Append to the sub-folders structure.
-                _folder_depth = 0
-                _sub_structure = _structure
-                _relative_path = _py_file.relative_to(_directory)
-                _sub_folders = _relative_path.parts
-                while _folder_depth + 1 < len(_sub_folders):
-                    _sub_folder = _sub_folders[_folder_depth]
-                    if _sub_folder not in _sub_structure:
-                        _sub_structure[_sub_folder] = dict()
-                    _sub_structure = _sub_structure[_sub_folder]
-                    _folder_depth += 1
-                _sub_structure[_name_id] = _name_id
-                print(f"Loaded modifier '{_name_id}' in repository")
+            if not _py_file.is_file():
+                continue
+            _relative_path = _py_file.relative_to(_directory)
+            _key = _relative_path.as_posix()
+            cls._file_stats[_key] = cls._stat_file(_py_file)
+            _entry = cls._get_fresh_entry(_old_manifest.get(_key), _py_file)
+            if _entry is None:
+                # Import new or changed files to describe them again.
+                _name_id, _template, _entry = cls._load_modifier_entry(
+                    _py_file)
+                print(f"Loaded modifier '{_name_id}' from {_key}")
+            else:
+                _name_id, _template = cls._template_from_entry(
+                    _entry, apply_loader=cls._create_apply_loader(_py_file),
+                    padding_loader=cls._create_padding_loader(_py_file))
+            if _name_id in _repository:
+                print(f"Modifier '{_name_id}' already in repository")
+                continue
+            _manifest[_key] = _entry
+            _repository[_name_id] = _template
+            cls._paths[_name_id] = _py_file
+            cls._add_to_structure(_name_id, _relative_path)
+        if _manifest != _old_manifest:
+            cls._write_manifest(_manifest_path, _manifest)
+        ModifierRepository.increment_revision()
+        print(f"Loaded {len(_manifest)} modifiers in repository")
         cls._loaded = True
 
+    @classmethod
+    def reload_changed_modifiers(cls) -> list[str]:
+        """Reload the modifier files changed since they were loaded.
+
+        Each reloaded ModifierTemplate replaces the previous one in the
+        repository, and the shaders compiled for it are released.
+        Existing Modifier objects keep their parameters, so they keep
+        working as long as the parameter templates are unchanged. A
+        file that fails to load keeps its previous template until it
+        changes again. Return the name ids of the reloaded modifiers.
+        """
+        if not cls._loaded:
+            return []
+        _directory = Path(Config().app.modifiers_directory)
+        _repository = ModifierRepository.get_repository()
+        _reloaded_list = []
+        for _py_file in _directory.rglob("*.py"):
+            if not _py_file.is_file():
+                continue
+            _relative_path = _py_file.relative_to(_directory)
+            _key = _relative_path.as_posix()
+            _file_stat = cls._stat_file(_py_file)
+            if cls._file_stats.get(_key) == _file_stat:
+                continue
+            cls._file_stats[_key] = _file_stat
+            _entry = cls._get_fresh_entry(cls._manifest.get(_key), _py_file)
+            if _entry is not None:
+                cls._manifest[_key] = _entry
+                continue
+            try:
+                _name_id, _template, _entry = cls._load_modifier_entry(
+                    _py_file)
+            except Exception as _error:
+                print(f"Couldn't reload modifier from {_key}: {_error}")
+                continue
+            _previous_template = _repository.get(_name_id)
+            if _previous_template is None:
+                cls._add_to_structure(_name_id, _relative_path)
+            elif not cls._same_parameters(_previous_template, _template):
+                print(f"Parameters of modifier '{_name_id}' changed, "
+                      f"existing instances may need to be re-applied")
+            _repository[_name_id] = _template
+            cls._paths[_name_id] = _py_file
+            cls._manifest[_key] = _entry
+            GLContext.release_compute_shaders(_name_id)
+            TextureCacheService.release_textures(_name_id)
+            _reloaded_list.append(_name_id)
+            print(f"Reloaded modifier '{_name_id}' from {_key}")
+        if _reloaded_list:
+            ModifierRepository.increment_revision()
+            cls._write_manifest(Path(Config().app.modifier_manifest),
+                                cls._manifest)
+        return _reloaded_list
+
+    @classmethod
+    def get_modifier_path(cls, name_id: str) -> Path:
+        """Return the python file a modifier was loaded from."""
+        if name_id not in cls._paths:
+            raise KeyError(f"Modifier '{name_id}' was not loaded "
+                           f"from a file.")
+        return cls._paths[name_id]
+
+    @classmethod
+    def load_numpy_function(cls, py_file: Path) -> Callable:
+        """Import the '_apply_numpy' function of a modifier file.
+
+        The function is cached until the file changes, so that each
+        worker process of the CPU backend imports a modifier once.
+        """
+        _key = (str(py_file), cls._stat_file(py_file)[0])
+        if _key not in cls._numpy_functions:
+            _module = cls._import_module(py_file)
+            _name_id = getattr(_module, "_name_id", py_file.name)
+            _function = getattr(_module, "_apply_numpy", None)
+            if _function is None:
+                raise NotImplementedError(f"Modifier '{_name_id}' has no "
+                                          f"'_apply_numpy' function for "
+                                          f"the CPU backend")
+            if not callable(_function):
+                raise TypeError(f"Attribute '_apply_numpy' in modifier "
+                                f"'{_name_id}' should be a function.")
+            cls._numpy_functions[_key] = _function
+        return cls._numpy_functions[_key]
+
+    @staticmethod
+    def _same_parameters(template_a: ModifierTemplate,
+                         template_b: ModifierTemplate) -> bool:
+        """Tell if two templates take the same parameters."""
+        _list_a = template_a.get_parameter_template_list()
+        _list_b = template_b.get_parameter_template_list()
+        return ([(_template.get_name_id(), _template.get_data_type())
+                 for _template in _list_a]
+                == [(_template.get_name_id(), _template.get_data_type())
+                    for _template in _list_b])
+
+    @staticmethod
+    def _stat_file(py_file: Path) -> tuple[int, int]:
+        """Return the modification time and size of a file."""
+        _stat = py_file.stat()
+        return _stat.st_mtime_ns, _stat.st_size
+
+    @staticmethod
+    def _add_to_structure(name_id: str, relative_path: Path):
+        """Append a modifier to the sub-folders structure."""
+        _sub_structure = ModifierRepository.get_structure()
+        for _sub_folder in relative_path.parts[:-1]:
+            if _sub_folder not in _sub_structure:
+                _sub_structure[_sub_folder] = dict()
+            _sub_structure = _sub_structure[_sub_folder]
+        _sub_structure[name_id] = name_id
+
+    @staticmethod
+    def _read_manifest(manifest_path: Path) -> dict[str, dict]:
+        """Read the cached manifest, or return an empty one."""
+        if not manifest_path.is_file():
+            return dict()
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as _file:
+                _manifest = json.load(_file)
+        except (OSError, ValueError):
+            print(f"Couldn't read modifier manifest '{manifest_path}'")
+            return dict()
+        if (not isinstance(_manifest, dict)
+                or _manifest.get("version") != MANIFEST_VERSION
+                or not isinstance(_manifest.get("modifiers"), dict)):
+            return dict()
+        return _manifest["modifiers"]
+
+    @staticmethod
+    def _write_manifest(manifest_path: Path, manifest: dict[str, dict]):
+        """Write the manifest, leaving out entries JSON can't hold."""
+        _modifiers = dict()
+        for _key, _entry in manifest.items():
+            try:
+                json.dumps(_entry)
+            except (TypeError, ValueError):
+                continue
+            _modifiers[_key] = _entry
+        try:
+            with open(manifest_path, "w", encoding="utf-8") as _file:
+                json.dump({"version": MANIFEST_VERSION,
+                           "modifiers": _modifiers}, _file, indent=2)
+        except OSError:
+            print(f"Couldn't write modifier manifest '{manifest_path}'")
+
+    @staticmethod
+    def _hash_file(py_file: Path) -> str:
+        """Return the SHA-1 hash of a file's content."""
+        return hashlib.sha1(py_file.read_bytes()).hexdigest()
+
+    @classmethod
+    def _get_fresh_entry(cls,
+                         entry: Optional[dict],
+                         py_file: Path) -> Optional[dict]:
+        """Return a manifest entry if it still describes the file.
+
+        The modification time and size are checked first. When they
+        differ, the content hash decides, so that touching a file
+        doesn't force it to be imported.
+        """
+        if entry is None:
+            return None
+        _mtime_ns, _size = cls._stat_file(py_file)
+        if entry.get("mtime_ns") == _mtime_ns and entry.get("size") == _size:
+            return entry
+        if entry.get("hash") != cls._hash_file(py_file):
+            return None
+        return dict(entry, mtime_ns=_mtime_ns, size=_size)
+
     @classmethod
     def load_modifier_from_file(cls,
                                 py_file: Path
                                 ) -> tuple[str, ModifierTemplate]:
         """Load a modifier given its python file."""
+        _name_id, _template, _entry = cls._load_modifier_entry(py_file)
+        return _name_id, _template
+
+    @classmethod
+    def _load_modifier_entry(cls,
+                             py_file: Path
+                             ) -> tuple[str, ModifierTemplate, dict]:
+        """Load a modifier and describe it with a manifest entry."""
+        _module = cls._import_module(py_file)
+        _entry = cls._describe_module(_module, py_file.name)
+        _name_id, _template = cls._template_from_entry(
+            _entry, apply_loader=lambda: cls._get_apply_function(
+                _module, _name_id, _template.get_parameter_template_list()),
+            padding_loader=lambda: _module._padding)
+        if (_template.get_glsl_code() is None
+                and _template.get_pointwise_code() is None):
+            # Check the '_apply' function while the module is imported.
+            _template.get_apply_function()
+        _entry["mtime_ns"], _entry["size"] = cls._stat_file(py_file)
+        _entry["hash"] = cls._hash_file(py_file)
+        return _name_id, _template, _entry
+
+    @classmethod
+    def _import_module(cls, py_file: Path) -> ModuleType:
+        """Import a modifier file as a python module."""
         if not py_file.is_file():
             raise ValueError(f"{py_file} is not a file")
-        if py_file.suffix != ".py":
+        if not py_file.name.endswith(".py"):
             raise ValueError(f"{py_file} is not a *.py file")
-
-        # Load the modifier as a python module
         _spec = importlib.util.spec_from_file_location(
             f"modifier_{cls._modifier_count}", py_file)
         _module = importlib.util.module_from_spec(_spec)
         _spec.loader.exec_module(_module)
         cls._modifier_count += 1
+        return _module
 
-        # Retrieve modifier attributes
-        _name_id = getattr(_module, "_name_id", None)
+    @staticmethod
+    def _describe_module(module: ModuleType, file_name: str) -> dict:
+        """Retrieve the metadata of a modifier module."""
+        _name_id = getattr(module, "_name_id", None)
         if _name_id is None:
             raise AttributeError(f"Couldn't find attribute '_name_id' "
-                                 f"in '{py_file.name}'")
+                                 f"in '{file_name}'")
         if not isinstance(_name_id, str):
-            raise TypeError(f"Attribute '_name_id' in '{py_file.name}' "
+            raise TypeError(f"Attribute '_name_id' in '{file_name}' "
                             f"should be a str.")
 
-        _title = getattr(_module, "_title", "")
+        _title = getattr(module, "_title", "")
         if not isinstance(_title, str):
             raise TypeError(f"Attribute '_title' in modifier "
                             f"'{_name_id}' should be a str.")
 
-        _flags = set()
-        _flags_list = getattr(_module, "_flags", [])
+        _flags_list = getattr(module, "_flags", [])
         if not isinstance(_flags_list, list):
             raise TypeError(f"Attribute '_flags' in modifier "
                             f"'{_name_id}' should be a list of str.")
+
+        _parameters_info = getattr(module, "_parameters", [])
+        if not isinstance(_parameters_info, list):
+            raise TypeError(f"Attribute '_parameters' in modifier "
+                            f"'{_name_id}' should be a list of dict.")
+
+        _entry = {"name_id": _name_id,
+                  "title": _title,
+                  "flags": _flags_list,
+                  "parameters": _parameters_info}
+
+        _padding = getattr(module, "_padding", None)
+        if callable(_padding):
+            _entry["padding"] = "function"
+        elif _padding == "unbounded":
+            _entry["padding"] = _padding
+        elif _padding is not None:
+            if (not isinstance(_padding, (list, tuple))
+                    or len(_padding) != 2
+                    or not all(isinstance(_value, int) and _value >= 0
+                               for _value in _padding)):
+                raise TypeError(f"Attribute '_padding' in modifier "
+                                f"'{_name_id}' should be a list of two "
+                                f"positive int, 'unbounded' or a "
+                                f"function.")
+            _entry["padding"] = list(_padding)
+
+        _code_attributes = [_attribute
+                            for _attribute in ("_apply", "_glsl", "_pointwise")
+                            if hasattr(module, _attribute)]
+        if len(_code_attributes) > 1:
+            raise AttributeError(f"Modifier '{_name_id}' should define only "
+                                 f"one of '_apply', '_glsl' or '_pointwise'")
+        for _attribute in ("_glsl", "_pointwise"):
+            _code = getattr(module, _attribute, None)
+            if _code is None:
+                continue
+            if not isinstance(_code, str):
+                raise TypeError(f"Attribute '{_attribute}' in modifier "
+                                f"'{_name_id}' should be a str.")
+            _uniforms = getattr(module, "_uniforms", dict())
+            if (not isinstance(_uniforms, dict)
+                    or not all(isinstance(_key, str)
+                               and isinstance(_value, str)
+                               for _key, _value in _uniforms.items())):
+                raise TypeError(f"Attribute '_uniforms' in modifier "
+                                f"'{_name_id}' should be a dict with "
+                                f"str keys and values.")
+            _entry[_attribute.lstrip("_")] = _code
+            _entry["uniforms"] = _uniforms
+        return _entry
+
+    @classmethod
+    def _template_from_entry(cls,
+                             entry: dict,
+                             apply_loader: Callable[[], Callable] = None,
+                             padding_loader: Callable[[], Callable] = None
+                             ) -> tuple[str, ModifierTemplate]:
+        """Create a ModifierTemplate from a manifest entry."""
+        _name_id = entry["name_id"]
+        _flags = set()
+        _flags_list = entry["flags"]
         for _flag_id in range(len(_flags_list)):
             if not isinstance(_flags_list[_flag_id], str):
                 raise TypeError(f"Flag {_flag_id} in modifier "
@@ -108,31 +430,81 @@ class ModifierService:
                                  f"modifier '{_name_id}'")
             _flags.add(getattr(ModifierFlag, _flag_str))
 
-        # Retrieve parameters templates
-        _parameters_info = getattr(_module, "_parameters", [])
-        if not isinstance(_parameters_info, list):
-            raise TypeError(f"Attribute '_parameters' in modifier "
-                            f"'{_name_id}' should be a list of dict.")
         _parameter_template_list = cls._create_parameter_list(
-            _parameters_info, modifier_name_id=_name_id)
+            entry["parameters"], modifier_name_id=_name_id)
+
+        _padding_info = entry.get(
+            "padding", [0, 0] if "pointwise" in entry else "unbounded")
+        _padding = None
+        if isinstance(_padding_info, list):
+            _padding = tuple(_padding_info)
+        if _padding_info != "function":
+            padding_loader = None
+
+        if "glsl" not in entry and "pointwise" not in entry:
+            _modifier_template = ModifierTemplate(
+                None, title=entry["title"], flags=_flags,
+                parameter_template_list=_parameter_template_list,
+                apply_loader=apply_loader, padding=_padding,
+                padding_loader=padding_loader)
+            return _name_id, _modifier_template
+
+        _uniform_map = {_template.get_name_id(): _template.get_name_id()
+                        for _template in _parameter_template_list}
+        for _parameter_name_id, _uniform in entry["uniforms"].items():
+            if _parameter_name_id not in _uniform_map:
+                raise ValueError(f"Unknown parameter '{_parameter_name_id}'"
+                                 f" in '_uniforms' of modifier '{_name_id}'")
+            _uniform_map[_parameter_name_id] = _uniform
+        _local_size = dict(LOCAL_SIZE_PATTERN.findall(entry.get("glsl", "")))
+        _modifier_template = ModifierTemplate(
+            None, title=entry["title"], flags=_flags,
+            parameter_template_list=_parameter_template_list,
+            glsl_code=entry.get("glsl"),
+            pointwise_code=entry.get("pointwise"),
+            uniform_map=_uniform_map,
+            local_size=(int(_local_size.get("x", 1)),
+                        int(_local_size.get("y", 1))),
+            padding=_padding, padding_loader=padding_loader)
+        return _name_id, _modifier_template
+
+    @classmethod
+    def _create_apply_loader(cls,
+                             py_file: Path) -> Callable[[], Callable]:
+        """Create a function importing a modifier's '_apply' function."""
+        def _load_apply_function() -> Callable:
+            _module = cls._import_module(py_file)
+            _name_id = getattr(_module, "_name_id", py_file.name)
+            _template = ModifierRepository.get_template(_name_id)
+            return cls._get_apply_function(
+                _module, _name_id, _template.get_parameter_template_list())
+        return _load_apply_function
 
-        # Retrieve _apply function
-        _apply_function = getattr(_module, "_apply", None)
+    @classmethod
+    def _create_padding_loader(cls,
+                               py_file: Path) -> Callable[[], Callable]:
+        """Create a function importing a modifier's '_padding' function."""
+        def _load_padding_function() -> Callable:
+            return cls._import_module(py_file)._padding
+        return _load_padding_function
+
+    @classmethod
+    def _get_apply_function(cls,
+                            module: ModuleType,
+                            name_id: str,
+                            template_list: list[ParameterTemplate]
+                            ) -> Callable:
+        """Retrieve and check the '_apply' function of a module."""
+        _apply_function = getattr(module, "_apply", None)
         if _apply_function is None:
             raise AttributeError(f"Couldn't find '_apply' function "
-                                 f"in modifier '{_name_id}'")
+                                 f"in modifier '{name_id}'")
         if not callable(_apply_function):
             raise TypeError(f"Attribute '_apply' in modifier "
-                            f"'{_name_id}' should be a function.")
-        cls._inspect_apply_signature(_apply_function,
-                                      _parameter_template_list,
-                                      modifier_name_id=_name_id)
-
-        # Return name id and modifier template
-        _modifier_template = ModifierTemplate(
-            _apply_function, title=_title, flags=_flags,
-            parameter_template_list=_parameter_template_list)
-        return _name_id, _modifier_template
+                            f"'{name_id}' should be a function.")
+        cls._inspect_apply_signature(_apply_function, template_list,
+                                      modifier_name_id=name_id)
+        return _apply_function
 
     @staticmethod
     def _create_parameter_list(info_list: list[dict],
@@ -294,6 +666,12 @@ class ModifierService:
         _modifier_list = layer.get_modifier_list()
         _modifier_list.append(modifier)
 
+    @staticmethod
+    def get_enabled_modifiers(layer: Layer) -> list[Modifier]:
+        """Return the modifiers of a Layer which aren't bypassed."""
+        return [_modifier for _modifier in layer.get_modifier_list()
+                if _modifier.is_enabled()]
+
     @staticmethod
     def modifier_has_flag(modifier: Modifier, flag: ModifierFlag):
         """Checks if a modifier holds a flag."""
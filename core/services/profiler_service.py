@@ -0,0 +1,141 @@
+"""
+Service concerning GPU profiling in general.
+
+The ProfilerService class defines services within the core package,
+concerning the timing of render passes on the GPU. While profiling is
+enabled, each modifier dispatch and internal pass of a frame is
+wrapped in a timer query. Queries are only read a few frames later,
+or after a delay, once the GPU is done with them, so that profiling
+doesn't stall the pipeline. The resulting FrameProfile objects are
+kept in a short history, for the profiler panel or headless runs.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+import moderngl
+
+from core.entities.frame_profile import FrameProfile
+from core.entities.gl_context import GLContext
+from utils.config import Config
+
+
+# Frames rendered before the queries of a frame are read.
+PROFILE_LATENCY = 2
+# Seconds after which the queries of a frame are read anyway.
+PROFILE_DELAY = .1
+PROFILE_HISTORY = 120
+FRAME_SCOPE = "Frame"
+
+
+class ProfilerService:
+    """Service concerning GPU profiling in general."""
+
+    _enabled: bool = None
+    _scope: str = FRAME_SCOPE
+    _query_pool: list[moderngl.Query] = []
+    # Queries of the frame being rendered, None outside of a frame.
+    _frame_queries: Optional[list[tuple[str, str, moderngl.Query]]] = None
+    _frame: int = 0
+    _pending_frames: deque = deque()
+    _profiles: deque = deque(maxlen=PROFILE_HISTORY)
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        """Tell if render passes are being timed."""
+        if cls._enabled is None:
+            cls._enabled = Config.render.gpu_profiling
+        return cls._enabled
+
+    @classmethod
+    def set_enabled(cls, enabled: bool):
+        """Start or stop timing render passes."""
+        cls._enabled = enabled
+
+    @classmethod
+    def begin_frame(cls, frame: int):
+        """Start collecting the timer queries of a frame."""
+        if not cls.is_enabled():
+            return
+        cls._frame = frame
+        cls._frame_queries = []
+        cls._scope = FRAME_SCOPE
+
+    @classmethod
+    def end_frame(cls):
+        """Submit the timer queries of a frame, and read older ones."""
+        if cls._frame_queries is None:
+            return
+        cls._pending_frames.append(
+            (cls._frame, time.perf_counter(), cls._frame_queries))
+        cls._frame_queries = None
+        cls._scope = FRAME_SCOPE
+        cls.collect()
+
+    @classmethod
+    def set_scope(cls, scope: str):
+        """Set the scope of the next passes, usually a layer title."""
+        cls._scope = scope
+
+    @classmethod
+    def section(cls, name: str):
+        """Return a context manager timing a pass of the current frame.
+
+        Timer queries can't be nested, so sections only wrap passes
+        that don't contain other sections.
+        """
+        if cls._frame_queries is None:
+            return nullcontext()
+        return cls._time_section(name)
+
+    @classmethod
+    @contextmanager
+    def _time_section(cls, name: str) -> Iterator[None]:
+        """Wrap a pass in a timer query."""
+        if cls._query_pool:
+            _query = cls._query_pool.pop()
+        else:
+            _query = GLContext.get_context().query(time=True)
+        cls._frame_queries.append((cls._scope, name, _query))
+        with _query:
+            yield
+
+    @classmethod
+    def collect(cls, wait: bool = False):
+        """Read the timer queries the GPU should be done with.
+
+        The queries of a frame are read once PROFILE_LATENCY frames
+        were rendered after it, or after PROFILE_DELAY seconds. With
+        wait set, every pending frame is read, which may stall.
+        """
+        _now = time.perf_counter()
+        while cls._pending_frames:
+            _frame, _submit_time, _query_list = cls._pending_frames[0]
+            if (not wait and len(cls._pending_frames) <= PROFILE_LATENCY
+                    and _now - _submit_time < PROFILE_DELAY):
+                break
+            cls._pending_frames.popleft()
+            _entry_list = []
+            for _scope, _name, _query in _query_list:
+                _entry_list.append((_scope, _name, _query.elapsed / 1e6))
+                cls._query_pool.append(_query)
+            cls._profiles.append(FrameProfile(_frame, _entry_list))
+
+    @classmethod
+    def get_profiles(cls) -> list[FrameProfile]:
+        """Return the profiles read so far, oldest first."""
+        return list(cls._profiles)
+
+    @classmethod
+    def get_last_profile(cls) -> Optional[FrameProfile]:
+        """Return the most recent profile read, if any."""
+        if not cls._profiles:
+            return None
+        return cls._profiles[-1]
+
+    @classmethod
+    def clear(cls):
+        """Forget the profiles read so far."""
+        cls._profiles.clear()
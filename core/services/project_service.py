@@ -95,7 +95,7 @@ class ProjectService:
                 for modifier in layer.get_modifier_list():
                     modifier_data = {
                         "template_id": modifier.get_template_id(),
-                        "enabled": True,  # Modifiers don't have is_enabled in this version
+                        "enabled": modifier.is_enabled(),
                         "parameters": {}
                     }
                     
@@ -198,7 +198,7 @@ class ProjectService:
                         if template:
                             from core.services.modifier_service import ModifierService
                             modifier = ModifierService.modifier_from_template(template_id)
-                            # Note: enabled state not stored in modifier object
+                            modifier.set_enabled(mod_data.get("enabled", True))
                             
                             # Deserialize parameters and keyframes
                             params_data = mod_data.get("parameters", {})
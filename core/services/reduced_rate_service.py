@@ -0,0 +1,256 @@
+"""
+Service concerning reduced-rate rendering in general.
+
+The ReducedRateService class defines services within the core
+package, concerning compute shaders too expensive to run for every
+pixel, such as those of generators flagged as expensive. Such a
+shader first runs on a coarse grid, one pixel every few pixels in each
+direction. The pixels between four samples are then interpolated from
+them when the samples are close, and listed when they differ, as they
+do across the edge of a shape. The shader finally runs again for the
+listed pixels only, so that edges are computed at full resolution
+while smooth areas only cost a fraction of the invocations.
+"""
+
+import moderngl
+import numpy as np
+
+from core.entities.gl_context import GLContext
+from core.services.region_service import INVOCATION_PATTERN
+from core.services.uniform_block_service import VERSION_PATTERN
+from utils.config import Config
+
+
+# Bindings of the pixel list, of the arguments of the dispatch over
+# it, and of the image being filled.
+LIST_BINDING = 7
+ARGUMENTS_BINDING = 6
+IMAGE_BINDING = 7
+REDUCED_INVOCATION = "reduced_invocation()"
+# Pixels past the end of the list are sent out of the image.
+OUT_OF_RANGE = 0x7FFFFFFF
+LOCAL_SIZE = 16
+
+LIST_HEADER = f"""
+uniform ivec2 reduced_size;
+uniform int reduced_factor;
+uniform int reduced_group_size;
+uniform bool reduced_listed;
+layout (std430, binding = {LIST_BINDING}) readonly buffer reduced_list {{
+    uint reduced_count;
+    uint reduced_pixels[];
+}};
+
+// Pixel of the region an invocation computes, on the coarse grid, or
+// from the pixel list once the grid was filled.
+uvec3 reduced_invocation(){{
+    if(reduced_listed){{
+        uint index = gl_WorkGroupID.x*uint(reduced_group_size)
+                     + gl_LocalInvocationIndex;
+        if(index >= reduced_count){{
+            return uvec3({OUT_OF_RANGE}u, {OUT_OF_RANGE}u, 0u);
+        }}
+        uint pixel = reduced_pixels[index];
+        return uvec3(pixel & 0xFFFFu, pixel >> 16, 0u);
+    }}
+    ivec2 grid = ivec2(gl_GlobalInvocationID.xy);
+    return uvec3(min(grid*reduced_factor, reduced_size - 1), 0u);
+}}
+"""
+
+
+class ReducedRateService:
+    """Service concerning reduced-rate rendering in general."""
+
+    _fill_shader: moderngl.ComputeShader = None
+    _arguments_shader: moderngl.ComputeShader = None
+    _list_buffer: moderngl.Buffer = None
+    _arguments_buffer: moderngl.Buffer = None
+
+    @staticmethod
+    def get_factor() -> int:
+        """Return the spacing of the coarse grid, 1 being disabled."""
+        return max(1, Config.render.reduced_rate)
+
+    @staticmethod
+    def get_threshold() -> float:
+        """Return how much samples differ across an edge."""
+        return Config.render.reduced_rate_threshold
+
+    @staticmethod
+    def create_reduced_glsl(glsl_code: str) -> str:
+        """Make a compute shader runnable at a reduced rate.
+
+        Its invocation ids are replaced by the pixels it computes,
+        relative to the region being rendered, so each invocation must
+        compute a single pixel without sharing data with the others.
+        Regions can't exceed 65535 pixels in either dimension.
+        """
+        _code = INVOCATION_PATTERN.sub(REDUCED_INVOCATION, glsl_code)
+        _match = VERSION_PATTERN.search(_code)
+        _index = 0 if _match is None else _match.end()
+        return _code[:_index] + LIST_HEADER + _code[_index:]
+
+    @classmethod
+    def run(cls,
+            shader: moderngl.ComputeShader,
+            texture: moderngl.Texture,
+            region: tuple[int, int, int, int],
+            local_size: tuple[int, int]):
+        """Dispatch a reduced-rate shader writing a region of a texture.
+
+        The shader is compiled from create_reduced_glsl, with its
+        images and uniforms already bound, and writes the texture.
+        """
+        _gl_context = GLContext.get_context()
+        _x, _y, _width, _height = region
+        _factor = cls.get_factor()
+        _group_size = local_size[0] * local_size[1]
+        shader["reduced_size"] = (_width, _height)
+        shader["reduced_group_size"] = _group_size
+        shader["reduced_listed"] = False
+        if _factor == 1:
+            shader["reduced_factor"] = 1
+            shader.run((_width + local_size[0] - 1) // local_size[0],
+                       (_height + local_size[1] - 1) // local_size[1], 1)
+            return
+
+        # Samples at every factor pixels, and on the last row and column.
+        shader["reduced_factor"] = _factor
+        _grid_size = ((_width - 1) // _factor + 2,
+                      (_height - 1) // _factor + 2)
+        shader.run((_grid_size[0] + local_size[0] - 1) // local_size[0],
+                   (_grid_size[1] + local_size[1] - 1) // local_size[1], 1)
+        _gl_context.memory_barrier()
+
+        _list_buffer = cls._get_list_buffer(_width * _height)
+        _list_buffer.write(np.zeros(1, dtype=np.uint32).tobytes())
+        _list_buffer.bind_to_storage_buffer(LIST_BINDING)
+        _fill_shader = cls._get_fill_shader()
+        _fill_shader["region_origin"] = (_x, _y)
+        _fill_shader["reduced_size"] = (_width, _height)
+        _fill_shader["reduced_factor"] = _factor
+        _fill_shader["threshold"] = cls.get_threshold()
+        texture.bind_to_image(IMAGE_BINDING, read=True, write=True)
+        _fill_shader.run((_width + LOCAL_SIZE - 1) // LOCAL_SIZE,
+                         (_height + LOCAL_SIZE - 1) // LOCAL_SIZE, 1)
+        _gl_context.memory_barrier()
+
+        # The number of work groups is only known by the GPU.
+        _arguments_shader = cls._get_arguments_shader()
+        _arguments_shader["reduced_group_size"] = _group_size
+        cls._get_arguments_buffer().bind_to_storage_buffer(ARGUMENTS_BINDING)
+        _arguments_shader.run(1, 1, 1)
+        _gl_context.memory_barrier()
+        shader["reduced_listed"] = True
+        shader.run_indirect(cls._get_arguments_buffer())
+        _gl_context.memory_barrier()
+
+    @classmethod
+    def _get_list_buffer(cls, pixel_count: int) -> moderngl.Buffer:
+        """Return a buffer holding a count and up to pixel_count pixels."""
+        _size = 4 * (pixel_count + 1)
+        if cls._list_buffer is None or cls._list_buffer.size < _size:
+            if cls._list_buffer is not None:
+                cls._list_buffer.release()
+            cls._list_buffer = GLContext.get_context().buffer(reserve=_size)
+        return cls._list_buffer
+
+    @classmethod
+    def _get_arguments_buffer(cls) -> moderngl.Buffer:
+        """Return the buffer of the indirect dispatch arguments."""
+        if cls._arguments_buffer is None:
+            cls._arguments_buffer = GLContext.get_context().buffer(
+                reserve=12)
+        return cls._arguments_buffer
+
+    @classmethod
+    def _get_fill_shader(cls) -> moderngl.ComputeShader:
+        """Return the shader interpolating smooth cells and listing edges."""
+        if cls._fill_shader is None:
+            _glsl_code = f"""
+                #version 430
+
+                layout (local_size_x = {LOCAL_SIZE},
+                        local_size_y = {LOCAL_SIZE}) in;
+                layout (rgba32f, binding = {IMAGE_BINDING})
+                    uniform image2D img_output;
+                layout (std430, binding = {LIST_BINDING})
+                    buffer reduced_list {{
+                        uint reduced_count;
+                        uint reduced_pixels[];
+                    }};
+
+                uniform ivec2 region_origin;
+                uniform ivec2 reduced_size;
+                uniform int reduced_factor;
+                uniform float threshold;
+
+                ivec2 sample_coords(ivec2 cell){{
+                    return min(cell*reduced_factor, reduced_size - 1);
+                }}
+
+                vec4 load(int x, int y){{
+                    return imageLoad(img_output, region_origin + ivec2(x, y));
+                }}
+
+                void main() {{
+                    ivec2 xy = ivec2(gl_GlobalInvocationID.xy);
+                    if(any(greaterThanEqual(xy, reduced_size))){{return;}}
+                    ivec2 cell = xy/reduced_factor;
+                    ivec2 start = sample_coords(cell);
+                    ivec2 end = sample_coords(cell + 1);
+                    // Samples are never written, so they can be read.
+                    if((xy.x == start.x || xy.x == end.x)
+                       && (xy.y == start.y || xy.y == end.y)){{return;}}
+                    vec4 c00 = load(start.x, start.y);
+                    vec4 c10 = load(end.x, start.y);
+                    vec4 c01 = load(start.x, end.y);
+                    vec4 c11 = load(end.x, end.y);
+                    vec4 low = min(min(c00, c10), min(c01, c11));
+                    vec4 high = max(max(c00, c10), max(c01, c11));
+                    if(any(greaterThan(high - low, vec4(threshold)))){{
+                        uint index = atomicAdd(reduced_count, 1u);
+                        reduced_pixels[index] = uint(xy.x) | uint(xy.y) << 16;
+                        return;
+                    }}
+                    vec2 t = vec2(xy - start)/vec2(max(end - start, 1));
+                    imageStore(img_output, region_origin + xy,
+                               mix(mix(c00, c10, t.x), mix(c01, c11, t.x),
+                                   t.y));
+                }}
+            """
+            cls._fill_shader = GLContext.get_context().compute_shader(
+                _glsl_code)
+        return cls._fill_shader
+
+    @classmethod
+    def _get_arguments_shader(cls) -> moderngl.ComputeShader:
+        """Return the shader sizing the dispatch over the pixel list."""
+        if cls._arguments_shader is None:
+            _glsl_code = f"""
+                #version 430
+
+                layout (local_size_x = 1) in;
+                layout (std430, binding = {LIST_BINDING})
+                    readonly buffer reduced_list {{
+                        uint reduced_count;
+                    }};
+                layout (std430, binding = {ARGUMENTS_BINDING})
+                    writeonly buffer reduced_arguments {{
+                        uint group_counts[3];
+                    }};
+
+                uniform int reduced_group_size;
+
+                void main() {{
+                    uint group_size = uint(reduced_group_size);
+                    group_counts[0] = (reduced_count + group_size - 1u)
+                                      /group_size;
+                    group_counts[1] = 1u;
+                    group_counts[2] = 1u;
+                }}
+            """
+            cls._arguments_shader = GLContext.get_context().compute_shader(
+                _glsl_code)
+        return cls._arguments_shader
@@ -0,0 +1,122 @@
+"""
+Service concerning regions of interest in general.
+
+The RegionService class defines services within the core package,
+concerning the rendering of only part of a frame. A region is a tuple
+of x, y, width and height in pixels, with rows counted from the top.
+The visible region of a frame is mapped back to each layer through
+its transform, then grown by the padding of each modifier, from the
+last one to the first one, so that every dispatch only computes what
+the next one reads.
+"""
+
+import re
+from typing import Optional
+
+import numpy as np
+
+from core.services.uniform_block_service import VERSION_PATTERN
+
+
+INVOCATION_PATTERN = re.compile(r"\bgl_GlobalInvocationID\b")
+REGION_UNIFORM = "region_origin"
+# Frame pixels added around a region for the edges of the transform
+# pass, and layer pixels added for bilinear filtering.
+FRAME_MARGIN = 2
+LAYER_MARGIN = 2
+
+
+class RegionService:
+    """Service concerning regions of interest in general."""
+
+    @staticmethod
+    def offset_invocations(glsl_code: str) -> str:
+        """Offset the invocations of a compute shader by a uniform.
+
+        The shader can then be dispatched over a region only, with the
+        region origin set in its 'region_origin' uniform.
+        """
+        _code = INVOCATION_PATTERN.sub(
+            f"(gl_GlobalInvocationID + uvec3({REGION_UNIFORM}, 0))",
+            glsl_code)
+        _match = VERSION_PATTERN.search(_code)
+        _index = 0 if _match is None else _match.end()
+        return (_code[:_index] + f"uniform ivec2 {REGION_UNIFORM};\n"
+                + _code[_index:])
+
+    @staticmethod
+    def intersect_regions(region_a: tuple[int, int, int, int],
+                          region_b: tuple[int, int, int, int]
+                          ) -> tuple[int, int, int, int]:
+        """Return the intersection of two regions, possibly empty."""
+        _x = max(region_a[0], region_b[0])
+        _y = max(region_a[1], region_b[1])
+        _right = min(region_a[0] + region_a[2], region_b[0] + region_b[2])
+        _bottom = min(region_a[1] + region_a[3], region_b[1] + region_b[3])
+        return _x, _y, max(_right - _x, 0), max(_bottom - _y, 0)
+
+    @classmethod
+    def expand_region(cls,
+                      region: tuple[int, int, int, int],
+                      padding: tuple[int, int],
+                      size: tuple[int, int]) -> tuple[int, int, int, int]:
+        """Grow a region by a padding, within an image of a given size."""
+        _padded_region = (region[0] - padding[0], region[1] - padding[1],
+                          region[2] + 2*padding[0], region[3] + 2*padding[1])
+        return cls.intersect_regions(_padded_region, (0, 0, *size))
+
+    @staticmethod
+    def flip_region(region: tuple[int, int, int, int],
+                    height: int) -> tuple[int, int, int, int]:
+        """Return a region with its rows counted from the other side."""
+        return region[0], height - region[1] - region[3], *region[2:]
+
+    @staticmethod
+    def contains_region(region_a: Optional[tuple[int, int, int, int]],
+                        region_b: Optional[tuple[int, int, int, int]]
+                        ) -> bool:
+        """Tell if a region contains another, None being everything."""
+        if region_a is None:
+            return True
+        if region_b is None:
+            return False
+        return (region_a[0] <= region_b[0] and region_a[1] <= region_b[1]
+                and region_b[0] + region_b[2] <= region_a[0] + region_a[2]
+                and region_b[1] + region_b[3] <= region_a[1] + region_a[3])
+
+    @classmethod
+    def get_layer_region(cls,
+                         frame_region: tuple[int, int, int, int],
+                         transform: tuple,
+                         texture_size: tuple[int, int],
+                         context_size: tuple[int, int]
+                         ) -> tuple[int, int, int, int]:
+        """Return the region of a layer needed to render a frame region.
+
+        The corners of the frame region are mapped to the layer with
+        the inverse of its transform, as returned by
+        RenderService.get_layer_transform.
+        """
+        _position, _anchor, _scale, _rotation, _opacity = transform
+        _full_region = (0, 0, *texture_size)
+        if abs(_scale[0]) < 1e-6 or abs(_scale[1]) < 1e-6:
+            return _full_region
+        _x, _y, _width, _height = frame_region
+        _corners = np.array(
+            [[_x, _y], [_x + _width, _y],
+             [_x, _y + _height], [_x + _width, _y + _height]],
+            dtype=np.float64)
+        _corners += np.array([[-1, -1], [1, -1], [-1, 1], [1, 1]]
+                             ) * FRAME_MARGIN
+        _corners -= np.asarray(_position) * np.asarray(context_size)
+        _cos, _sin = np.cos(_rotation), np.sin(_rotation)
+        _layer_corners = np.stack(
+            [_cos*_corners[:, 0] + _sin*_corners[:, 1],
+             -_sin*_corners[:, 0] + _cos*_corners[:, 1]], axis=1)
+        _layer_corners /= np.asarray(_scale)
+        _layer_corners += np.asarray(_anchor) * np.asarray(texture_size)
+        _start = np.floor(_layer_corners.min(axis=0)) - LAYER_MARGIN
+        _end = np.ceil(_layer_corners.max(axis=0)) + LAYER_MARGIN
+        _region = (int(_start[0]), int(_start[1]),
+                   int(_end[0] - _start[0]), int(_end[1] - _start[1]))
+        return cls.intersect_regions(_region, _full_region)
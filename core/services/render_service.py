@@ -8,53 +8,266 @@ of layers within a Sequence...
 """
 
 import time
+from enum import Enum
+from functools import partial
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+
 import moderngl
 import numpy as np
 
 from core.entities.modifier_repository import ModifierRepository
 from core.entities.modifier import Modifier
-from core.entities.modifier_template import ModifierFlag
+from core.entities.modifier_template import ModifierTemplate, ModifierFlag
 from core.entities.render_context import RenderContext
 from core.entities.sequence_context import SequenceContext
 from core.entities.visual_layer import VisualLayer
 from core.entities.solid_layer import SolidLayer
 from core.entities.sequence import Sequence
 from core.entities.gl_context import GLContext
+from core.entities.layer_program import LayerProgram
 from core.entities.parameter import Parameter
 from data_types.data_type import DataType
-from core.services.animation_service import AnimationService
+from core.services.animation_table_service import AnimationTableService
 from core.services.modifier_service import ModifierService
+from core.services.fusion_service import FusionService
+from core.services.uniform_block_service import (UniformBlockService,
+                                                 PARAMETER_BINDING)
+from core.services.memory_service import (MemoryService, MemoryCategory,
+                                          GPUMemoryError)
+from core.services.region_service import RegionService, REGION_UNIFORM
+from core.services.reduced_rate_service import ReducedRateService
+from core.services.layer_cache_service import LayerCacheService
+from core.services.profiler_service import ProfilerService, FRAME_SCOPE
 from data_types.color import Color
 from utils.image import Image
 from utils.config import Config
 
 
+MIN_SUPERSAMPLING_TILE_SIZE = 64
+# Compute shaders require OpenGL 4.3.
+MIN_GL_VERSION = 430
+# Largest uniform buffer offset alignment required by common drivers.
+DEFAULT_BLOCK_ALIGNMENT = 256
+# Properties of a VisualLayer making up its transform, in order.
+TRANSFORM_PROPERTIES = ["position", "anchor", "scale", "rotation", "opacity"]
+
+
+class AntiAliasing(Enum):
+    """Enumerate the anti-aliasing strategies of the transform pass."""
+
+    NONE = 0
+    ANALYTIC = 1
+    MSAA = 2
+    ADAPTIVE_MSAA = 3
+    SUPERSAMPLING = 4
+
+
+class RenderBackend(Enum):
+    """Enumerate the backends frames can be rendered with."""
+
+    GPU = 0
+    CPU = 1
+
+
 class RenderService:
     """Service concerning rendering in general."""
 
     _transform_program: moderngl.Program = None
+    _transform_vao: moderngl.VertexArray = None
     _color_shader: moderngl.ComputeShader = None
     _compositing_shader: moderngl.ComputeShader = None
+    _alpha_shader: moderngl.ComputeShader = None
+    _downsampling_shader: moderngl.ComputeShader = None
     _tonemapping_shader: moderngl.ComputeShader = None
     _transform_msaa_fbo: moderngl.Buffer = None
     _transform_fbo: moderngl.Buffer = None
     _transform_msaa_texture: moderngl.Texture = None
     _transform_texture: moderngl.Texture = None
+    _supersampling_fbo: moderngl.Framebuffer = None
+    _supersampling_texture: moderngl.Texture = None
+    # Fused GLSL code by templates and alpha modes.
+    _fused_glsl: dict[tuple, str] = dict()
+    # Parameter block layouts and sizes, by templates.
+    _fused_blocks: dict[tuple, tuple[dict, int]] = dict()
+    # GLSL code with a parameter block, layout and size, by template.
+    _parameter_blocks: dict[ModifierTemplate, tuple[str, dict, int]] = dict()
+    # Repository revision the caches above were last pruned for.
+    _template_revision: int = None
+    _parameter_buffer: moderngl.Buffer = None
+    # Offset and size of each uploaded parameter block, by dispatch.
+    _parameter_offsets: dict[tuple[int, ...], tuple[int, int]] = dict()
+    _parameter_context: SequenceContext = None
+    _block_alignment: int = None
+    # Compiled programs by layer, dropped along with their layer.
+    _layer_programs: WeakKeyDictionary = WeakKeyDictionary()
+    # Backend picked when the configured backend is 'auto'.
+    _auto_backend: RenderBackend = None
 
     @classmethod
     def apply_modifier_to_render_context(cls,
                                          modifier: Modifier,
                                          context: RenderContext):
         """Execute the action of a Modifier on a RenderContext."""
-        _name_id = modifier.get_template_id()
-        _modifier_template = ModifierRepository.get_template(_name_id)
-        _function = _modifier_template.get_apply_function()
-        _arguments = []
-        _sequence_ctx = context.get_sequence_context()
-        for _parameter in modifier.get_parameter_list():
-            _data = cls.get_parameter_value(_parameter, _sequence_ctx)
-            _arguments.append(_data)
-        _function(context, *_arguments)
+        cls._compile_dispatch_step([modifier], None)(context)
+
+    @classmethod
+    def apply_pointwise_modifiers(cls,
+                                  modifier_list: list[Modifier],
+                                  context: RenderContext,
+                                  output_premultiplied: bool = None):
+        """Apply consecutive pointwise modifiers in a single dispatch.
+
+        The modifiers are fused into one compute shader, compiled once
+        per distinct chain. Alpha conversions happen within the shader,
+        which leaves the destination texture in the output_premultiplied
+        mode, or in the mode of the last modifier if it is None.
+        """
+        cls._compile_dispatch_step(modifier_list,
+                                   output_premultiplied)(context)
+
+    @classmethod
+    def _compile_dispatch_step(cls,
+                               modifier_list: list[Modifier],
+                               output_premultiplied: Optional[bool]
+                               ) -> Callable[[RenderContext], None]:
+        """Return a callable applying a dispatch to a RenderContext.
+
+        Templates and flags are looked up once here, and bound to the
+        callable along with the parameters of the modifiers.
+        """
+        _template_list = tuple(
+            ModifierRepository.get_template(_modifier.get_template_id())
+            for _modifier in modifier_list)
+        _key = cls._get_dispatch_key(modifier_list)
+        if _template_list[0].get_pointwise_code() is not None:
+            _straight_alpha_list = tuple(
+                ModifierFlag.STRAIGHT_ALPHA in _template.get_flags()
+                for _template in _template_list)
+            return partial(cls._run_pointwise_step, modifier_list,
+                           _template_list, _straight_alpha_list, _key,
+                           output_premultiplied)
+        _template = _template_list[0]
+        _flags = _template.get_flags()
+        _premultiplied = ModifierFlag.STRAIGHT_ALPHA not in _flags
+        _writeonly = ModifierFlag.WRITEONLY in _flags
+        if _template.get_glsl_code() is not None:
+            return partial(cls._run_glsl_step, modifier_list, _template,
+                           _key, _premultiplied, _writeonly,
+                           ModifierFlag.EXPENSIVE in _flags)
+        _evaluator_list = [
+            partial(AnimationTableService.get_value_at_frame, _parameter)
+            for _parameter in modifier_list[0].get_parameter_list()]
+        return partial(cls._run_apply_step, modifier_list[0], _template,
+                       _evaluator_list, _premultiplied, _writeonly)
+
+    @classmethod
+    def _run_pointwise_step(cls,
+                            modifier_list: list[Modifier],
+                            template_list: tuple[ModifierTemplate, ...],
+                            straight_alpha_list: tuple[bool, ...],
+                            key: tuple[int, ...],
+                            output_premultiplied: Optional[bool],
+                            context: RenderContext):
+        """Dispatch the fused shader of consecutive pointwise modifiers."""
+        _shader_key = (template_list, context.is_premultiplied(),
+                       output_premultiplied)
+        if _shader_key not in cls._fused_glsl:
+            _glsl_code = FusionService.create_fused_glsl(
+                [_template.get_pointwise_code()
+                 for _template in template_list],
+                list(straight_alpha_list), context.is_premultiplied(),
+                output_premultiplied)
+            cls._fused_glsl[_shader_key] = RegionService.offset_invocations(
+                UniformBlockService.create_parameter_block(_glsl_code)[0])
+        _shader = GLContext.compute_shader_once(
+            tuple(_modifier.get_template_id() for _modifier in modifier_list),
+            cls._fused_glsl[_shader_key])
+
+        cls._bind_parameter_block(modifier_list, key, context)
+        context.get_src_texture().bind_to_image(0, read=True, write=False)
+        context.get_dest_texture().bind_to_image(1, read=False, write=True)
+        cls._run_over_region(_shader, context, (16, 16))
+        if output_premultiplied is None:
+            output_premultiplied = not straight_alpha_list[-1]
+        context.set_premultiplied(output_premultiplied)
+
+    @classmethod
+    def _run_glsl_step(cls,
+                       modifier_list: list[Modifier],
+                       modifier_template: ModifierTemplate,
+                       key: tuple[int, ...],
+                       premultiplied: bool,
+                       writeonly: bool,
+                       expensive: bool,
+                       context: RenderContext):
+        """Compile, feed and dispatch the shader of a GLSL modifier.
+
+        Expensive modifiers are run at a reduced rate, if enabled.
+        """
+        cls._prepare_alpha(context, premultiplied, writeonly)
+        context.set_modifier_name_id(modifier_list[0].get_template_id())
+        _reduced = expensive and ReducedRateService.get_factor() > 1
+        _glsl_code = cls._get_parameter_block(modifier_template)[0]
+        _shader = context.compute_shader_once(_glsl_code, _reduced)
+        cls._bind_parameter_block(modifier_list, key, context)
+        if not writeonly:
+            context.get_src_texture().bind_to_image(0, read=True,
+                                                    write=False)
+        context.get_dest_texture().bind_to_image(1, read=False, write=True)
+        if _reduced:
+            # The region origin is added to the pixels of the region.
+            _uniform = _shader.get(REGION_UNIFORM, None)
+            if _uniform is not None:
+                _uniform.value = context.get_region()[:2]
+            context.run_reduced_rate(_shader, context.get_dest_texture(),
+                                     modifier_template.get_local_size())
+            return
+        cls._run_over_region(_shader, context,
+                             modifier_template.get_local_size())
+
+    @staticmethod
+    def _run_over_region(shader: moderngl.ComputeShader,
+                         context: RenderContext,
+                         local_size: tuple[int, int]):
+        """Dispatch an engine-managed shader over the region to write."""
+        _x, _y, _width, _height = context.get_region()
+        _uniform = shader.get(REGION_UNIFORM, None)
+        if _uniform is not None:
+            _uniform.value = (_x, _y)
+        shader.run((_width + local_size[0] - 1) // local_size[0],
+                   (_height + local_size[1] - 1) // local_size[1], 1)
+
+    @classmethod
+    def _run_apply_step(cls,
+                        modifier: Modifier,
+                        modifier_template: ModifierTemplate,
+                        evaluator_list: list[Callable],
+                        premultiplied: bool,
+                        writeonly: bool,
+                        context: RenderContext):
+        """Call the apply function of a modifier with its parameters."""
+        cls._prepare_alpha(context, premultiplied, writeonly)
+        context.set_modifier_name_id(modifier.get_template_id())
+        _frame = context.get_sequence_context().get_current_frame()
+        _function = modifier_template.get_apply_function()
+        try:
+            _function(context, *[_evaluator(_frame)
+                                 for _evaluator in evaluator_list])
+        finally:
+            context.release_scratch_textures()
+
+    @classmethod
+    def _prepare_alpha(cls,
+                       context: RenderContext,
+                       premultiplied: bool,
+                       writeonly: bool):
+        """Put the src texture in the alpha mode a modifier works in."""
+        if writeonly:
+            # The source is ignored, so it needs no conversion.
+            context.set_premultiplied(premultiplied)
+        else:
+            cls.convert_alpha(context, premultiplied)
 
     @staticmethod
     def _image_from_texture(texture: moderngl.Texture) -> Image:
@@ -77,60 +290,465 @@ class RenderService:
     @classmethod
     def render_visual_layer(cls,
                             layer: VisualLayer,
-                            sequence_ctx: SequenceContext
+                            sequence_ctx: SequenceContext,
+                            region: tuple[int, int, int, int] = None
                             ) -> moderngl.Texture:
-        """Render a VisualLayer to a texture."""
-
-        # TODO : render only the visible part of the layer
-        # (don't render any potential offscreen pixels)
+        """Render a VisualLayer to a texture.
 
+        If a region is given, only the pixels within it are valid.
+        """
+        ProfilerService.set_scope(layer.get_title())
         if isinstance(layer, SolidLayer):
-            return cls.render_solid_layer(layer, sequence_ctx)
+            return cls.render_solid_layer(layer, sequence_ctx, region)
         raise NotImplementedError(f"Rendering method for '{layer.__class__}' "
                                   f"not implemented")
 
+    @staticmethod
+    def get_layer_size(layer: VisualLayer) -> tuple[int, int]:
+        """Return the size of the texture a VisualLayer renders to."""
+        if isinstance(layer, SolidLayer):
+            return (layer.get_property("width").get_value(),
+                    layer.get_property("height").get_value())
+        raise NotImplementedError(f"Size of '{layer.__class__}' "
+                                  f"not implemented")
+
     @classmethod
     def render_solid_layer(cls,
                            layer: SolidLayer,
-                           sequence_ctx: SequenceContext
+                           sequence_ctx: SequenceContext,
+                           region: tuple[int, int, int, int] = None
                            ) -> moderngl.Texture:
-        """Render a SolidLayer to a texture."""
-        _width = layer.get_property("width").get_value()
-        _height = layer.get_property("height").get_value()
+        """Render a SolidLayer to a texture.
+
+        If a region is given, only the pixels within it are valid. If
+        the layer is being edited, dispatches resume from the last
+        cached texture whose state didn't change.
+        """
+        _program = cls.get_layer_program(layer)
+        _width, _height = cls.get_layer_size(layer)
         _context = RenderContext(_width, _height, sequence_ctx)
-        _color = cls.get_parameter_value(layer.get_property_parameter("color"),
-                                         sequence_ctx)
-        _texture = cls.create_color_texture(_width, _height, _color)
-        _context.set_src_texture(_texture)
-        _modifier_list = layer.get_modifier_list()
+        _region_list = cls._get_step_regions(_program, (_width, _height),
+                                             sequence_ctx, region)
+        _key_list = None
+        _start_count = 0
+        if LayerCacheService.is_edited_layer(layer):
+            _key_list = cls._get_state_keys(_program, layer, sequence_ctx)
+            _start_count, _texture, _premultiplied = (
+                LayerCacheService.find_entry(_key_list, _region_list))
+            if _texture is not None:
+                _context.set_src_texture(_texture)
+                _context.set_premultiplied(_premultiplied)
+        if _start_count == 0 and not _program.is_source_ignored():
+            _color = cls.get_parameter_value(
+                layer.get_property_parameter("color"), sequence_ctx)
+            with ProfilerService.section("fill"):
+                _texture = cls.create_color_texture(_width, _height, _color,
+                                                    _region_list[0])
+            _context.set_src_texture(_texture)
+        for _count, (_step, _label) in enumerate(
+                zip(_program.get_step_list(), _program.get_label_list()),
+                start=1):
+            if _count <= _start_count:
+                continue
+            _context.set_region(_region_list[_count])
+            with ProfilerService.section(_label):
+                _step(_context)
+            _context.roll_textures()
+            if _key_list is not None:
+                LayerCacheService.store_entry(
+                    _count, _key_list[_count], _region_list[_count],
+                    _context.is_premultiplied(), _context.get_src_texture())
+        with ProfilerService.section("alpha"):
+            cls.convert_alpha(_context, True)
+        _context.release_dest_texture()
+        return _context.get_src_texture()
+
+    @staticmethod
+    def _get_step_regions(program: LayerProgram,
+                          size: tuple[int, int],
+                          sequence_ctx: SequenceContext,
+                          region: Optional[tuple[int, int, int, int]]
+                          ) -> list[tuple[int, int, int, int]]:
+        """Return the region of the source, then of each dispatch output.
+
+        Going backwards from the region of the layer, the region a
+        dispatch writes is the one the next dispatch reads.
+        """
+        _full_region = (0, 0, *size)
+        if region is None:
+            return [_full_region] * (len(program.get_step_list()) + 1)
+        _frame = sequence_ctx.get_current_frame()
+        _region_list = [region]
+        for _padding_function in reversed(program.get_padding_list()):
+            _padding = _padding_function(_frame)
+            if _padding is None:
+                region = _full_region
+            else:
+                region = RegionService.expand_region(region, _padding, size)
+            _region_list.append(region)
+        return _region_list[::-1]
+
+    @classmethod
+    def _get_state_keys(cls,
+                        program: LayerProgram,
+                        layer: SolidLayer,
+                        sequence_ctx: SequenceContext) -> list[int]:
+        """Return the state of the source, then after each dispatch.
+
+        Each state hashes the previous one with the values of the
+        parameters the dispatch reads, starting from the structure of
+        the layer, its size, its color and the frame.
+        """
+        _frame = sequence_ctx.get_current_frame()
+        _color = AnimationTableService.get_array_at_frame(
+            layer.get_property_parameter("color"), _frame)
+        _key = hash((program.get_signature(), cls.get_layer_size(layer),
+                     _frame, _color.tobytes()))
+        _key_list = [_key]
+        for _evaluator_list in program.get_state_evaluators():
+            _key = hash((_key, tuple(
+                _evaluator(_frame).tobytes()
+                for _evaluator in _evaluator_list)))
+            _key_list.append(_key)
+        return _key_list
+
+    @classmethod
+    def get_layer_program(cls, layer: VisualLayer) -> LayerProgram:
+        """Return the program rendering a layer, compiling it if needed.
+
+        A program is compiled again when the structure of its layer
+        changes, that is its modifier list and which modifiers are
+        enabled, the templates of the repository or the pointwise
+        fusion setting. Disabled modifiers are left out of the program.
+        """
+        _signature = (ModifierRepository.get_revision(),
+                      Config.render.pointwise_fusion,
+                      tuple((id(_modifier), _modifier.is_enabled())
+                            for _modifier in layer.get_modifier_list()))
+        _program = cls._layer_programs.get(layer)
+        if _program is None or _program.get_signature() != _signature:
+            _program = cls._compile_layer_program(layer, _signature)
+            cls._layer_programs[layer] = _program
+        return _program
+
+    @classmethod
+    def _compile_layer_program(cls,
+                               layer: VisualLayer,
+                               signature: tuple) -> LayerProgram:
+        """Compile the dispatches and evaluators rendering a layer."""
+        cls._prune_template_caches()
+        _modifier_list = ModifierService.get_enabled_modifiers(layer)
+        _step_list = []
+        _label_list = []
+        _padding_list = []
+        _entry_list = []
+        _state_list = []
+        _range_list = cls._get_dispatch_ranges(_modifier_list)
+        for _start, _end in _range_list:
+            _dispatch = _modifier_list[_start:_end]
+            _step_list.append(cls._compile_dispatch_step(
+                _dispatch, cls._get_required_alpha(_modifier_list, _end)))
+            _label_list.append("+".join(_modifier.get_template_id()
+                                        for _modifier in _dispatch))
+            _padding_list.append(cls._compile_step_padding(_dispatch))
+            _entry = cls._compile_parameter_entry(_dispatch)
+            if _entry is not None:
+                _entry_list.append(_entry)
+            _state_list.append([
+                partial(AnimationTableService.get_array_at_frame, _parameter)
+                for _modifier in _dispatch
+                for _parameter in _modifier.get_parameter_list()])
+        _start_index = len(_modifier_list)
+        _source_ignored = False
+        if _range_list:
+            _start_index = _range_list[0][0]
+            _source_ignored = ModifierService.modifier_has_flag(
+                _modifier_list[_start_index], ModifierFlag.WRITEONLY)
+        _transform_evaluators = [
+            partial(AnimationTableService.get_value_at_frame,
+                    layer.get_property_parameter(_name_id))
+            for _name_id in TRANSFORM_PROPERTIES]
+        return LayerProgram(signature, _start_index, _source_ignored,
+                            _step_list, _label_list, _padding_list,
+                            _entry_list, _state_list, _transform_evaluators)
+
+    @classmethod
+    def _compile_step_padding(cls,
+                              modifier_list: list[Modifier]
+                              ) -> Callable[[int], Optional[tuple]]:
+        """Return a callable giving the input padding of a dispatch.
+
+        Fused dispatches only hold pointwise modifiers, which have no
+        padding, so the first modifier decides.
+        """
+        _template = ModifierRepository.get_template(
+            modifier_list[0].get_template_id())
+        _evaluator_list = []
+        if _template.has_padding_function():
+            _evaluator_list = [
+                partial(AnimationTableService.get_value_at_frame, _parameter)
+                for _parameter in modifier_list[0].get_parameter_list()]
+        return partial(cls._get_padding_at_frame, _template, _evaluator_list)
+
+    @staticmethod
+    def _get_padding_at_frame(modifier_template: ModifierTemplate,
+                              evaluator_list: list[Callable],
+                              frame: int) -> Optional[tuple[int, int]]:
+        """Return the input padding of a modifier at a frame."""
+        return modifier_template.get_padding(
+            *[_evaluator(frame) for _evaluator in evaluator_list])
+
+    @classmethod
+    def _get_dispatch_ranges(cls,
+                             modifier_list: list[Modifier]
+                             ) -> list[tuple[int, int]]:
+        """Return the ranges of modifiers applied by each dispatch.
+
+        Modifiers before the last one ignoring its source are skipped,
+        and consecutive pointwise modifiers share a range.
+        """
         _start_index = 0
-        for _modifier_index in range(_start_index, len(_modifier_list)):
-            _modifier = _modifier_list[_modifier_index]
+        for _modifier_index, _modifier in enumerate(modifier_list):
             if ModifierService.modifier_has_flag(
                 _modifier, ModifierFlag.WRITEONLY):
                 _start_index = _modifier_index
-        for _modifier_index in range(_start_index, len(_modifier_list)):
-            _modifier = _modifier_list[_modifier_index]
-            cls.apply_modifier_to_render_context(_modifier, _context)
-            _context.roll_textures()
-        _context.release_dest_texture()
-        return _context.get_src_texture()
-    
+        _range_list = []
+        _modifier_index = _start_index
+        while _modifier_index < len(modifier_list):
+            _chain_end = cls._get_pointwise_chain_end(modifier_list,
+                                                      _modifier_index)
+            _end_index = max(_chain_end, _modifier_index + 1)
+            _range_list.append((_modifier_index, _end_index))
+            _modifier_index = _end_index
+        return _range_list
+
+    @classmethod
+    def upload_parameters(cls,
+                          dispatch_list: list[list[Modifier]],
+                          sequence_ctx: SequenceContext):
+        """Pack the parameters of several dispatches into one buffer.
+
+        Each dispatch applies a list of modifiers whose shader is
+        managed by the engine. Their parameter blocks are packed with
+        numpy at aligned offsets, and uploaded at once.
+        """
+        _entry_list = []
+        for _modifier_list in dispatch_list:
+            _entry = cls._compile_parameter_entry(_modifier_list)
+            if _entry is not None:
+                _entry_list.append(_entry)
+        cls._upload_parameter_entries(_entry_list, sequence_ctx)
+
+    @classmethod
+    def _compile_parameter_entry(cls,
+                                 modifier_list: list[Modifier]
+                                 ) -> Optional[tuple]:
+        """Return the parameter block entry of a dispatch.
+
+        The entry holds the key, layout and size of the block, and the
+        uniform names bound to the evaluators of their parameters, or
+        to None for the frame. None is returned for modifiers setting
+        their own uniforms.
+        """
+        _template_list = tuple(
+            ModifierRepository.get_template(_modifier.get_template_id())
+            for _modifier in modifier_list)
+        _block = cls._get_dispatch_block(_template_list)
+        if _block is None:
+            return None
+        _layout, _size, _prefix_list = _block
+        _binding_list = []
+        for _prefix, _modifier, _template in zip(
+                _prefix_list, modifier_list, _template_list):
+            _uniform_map = _template.get_uniform_map()
+            for _parameter_template, _parameter in zip(
+                    _template.get_parameter_template_list(),
+                    _modifier.get_parameter_list()):
+                _name = _prefix + _uniform_map[
+                    _parameter_template.get_name_id()]
+                if _name in _layout:
+                    _binding_list.append((_name, partial(
+                        AnimationTableService.get_array_at_frame,
+                        _parameter)))
+            if _prefix + "frame" in _layout:
+                _binding_list.append((_prefix + "frame", None))
+        return (cls._get_dispatch_key(modifier_list), _layout, _size,
+                _binding_list)
+
+    @classmethod
+    def _upload_parameter_entries(cls,
+                                  entry_list: list[tuple],
+                                  sequence_ctx: SequenceContext):
+        """Evaluate and upload parameter blocks at the current frame."""
+        _alignment = cls._get_block_alignment()
+        _frame = sequence_ctx.get_current_frame()
+        cls._parameter_context = sequence_ctx
+        cls._parameter_offsets = dict()
+        _block_list = []
+        _byte_count = 0
+        for _key, _layout, _size, _binding_list in entry_list:
+            _values = {
+                _name: _frame if _evaluator is None
+                else _evaluator(_frame)
+                for _name, _evaluator in _binding_list}
+            _block_list.append((_byte_count, _layout, _values))
+            cls._parameter_offsets[_key] = (_byte_count, _size)
+            _byte_count += -(-_size // _alignment) * _alignment
+        if _byte_count == 0:
+            return
+        _words = UniformBlockService.pack_blocks(_byte_count, _block_list)
+        if (cls._parameter_buffer is not None
+                and cls._parameter_buffer.size < _byte_count):
+            cls._parameter_buffer.release()
+            cls._parameter_buffer = None
+        if cls._parameter_buffer is None:
+            cls._parameter_buffer = GLContext.get_context().buffer(
+                reserve=_byte_count)
+        cls._parameter_buffer.write(_words)
+
+    @classmethod
+    def _bind_parameter_block(cls,
+                              modifier_list: list[Modifier],
+                              key: tuple[int, ...],
+                              context: RenderContext):
+        """Bind the parameter block of a dispatch, uploading it if needed.
+
+        Dispatches are expected to be uploaded along with the rest of
+        the frame, but can also be uploaded on their own.
+        """
+        _sequence_ctx = context.get_sequence_context()
+        if (_sequence_ctx is not cls._parameter_context
+                or key not in cls._parameter_offsets):
+            cls.upload_parameters([modifier_list], _sequence_ctx)
+        _byte_offset, _size = cls._parameter_offsets[key]
+        if _size > 0:
+            cls._parameter_buffer.bind_to_uniform_block(
+                PARAMETER_BINDING, offset=_byte_offset, size=_size)
+
+    @staticmethod
+    def _get_dispatch_key(modifier_list: list[Modifier]) -> tuple[int, ...]:
+        """Return the key of the parameter block of a dispatch."""
+        return tuple(id(_modifier) for _modifier in modifier_list)
+
+    @classmethod
+    def _get_block_alignment(cls) -> int:
+        """Return the alignment of uniform buffer bindings in bytes."""
+        if cls._block_alignment is None:
+            cls._block_alignment = GLContext.get_context().info.get(
+                "GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT",
+                DEFAULT_BLOCK_ALIGNMENT)
+        return cls._block_alignment
+
+    @classmethod
+    def _prune_template_caches(cls):
+        """Drop the code cached for templates no longer in the repository.
+
+        Reloading a modifier file replaces its template, and entries
+        keyed by the previous one would otherwise be kept forever.
+        """
+        _revision = ModifierRepository.get_revision()
+        if _revision == cls._template_revision:
+            return
+        cls._template_revision = _revision
+        _template_set = set(ModifierRepository.get_repository().values())
+        cls._fused_glsl = {
+            _key: _value for _key, _value in cls._fused_glsl.items()
+            if _template_set.issuperset(_key[0])}
+        cls._fused_blocks = {
+            _key: _value for _key, _value in cls._fused_blocks.items()
+            if _template_set.issuperset(_key)}
+        cls._parameter_blocks = {
+            _key: _value for _key, _value in cls._parameter_blocks.items()
+            if _key in _template_set}
+
+    @classmethod
+    def _get_parameter_block(cls,
+                             modifier_template: ModifierTemplate
+                             ) -> tuple[str, dict[str, tuple], int]:
+        """Return the code, block layout and size of a GLSL modifier."""
+        if modifier_template not in cls._parameter_blocks:
+            _glsl_code, _layout, _size = (
+                UniformBlockService.create_parameter_block(
+                    modifier_template.get_glsl_code()))
+            cls._parameter_blocks[modifier_template] = (
+                RegionService.offset_invocations(_glsl_code), _layout, _size)
+        return cls._parameter_blocks[modifier_template]
+
+    @classmethod
+    def _get_dispatch_block(cls,
+                            template_list: tuple[ModifierTemplate, ...]
+                            ) -> Optional[tuple[dict, int, list[str]]]:
+        """Return the block layout, size and uniform prefixes of a dispatch.
+
+        None is returned for modifiers setting their own uniforms.
+        """
+        if template_list[0].get_pointwise_code() is not None:
+            if template_list not in cls._fused_blocks:
+                _declarations = FusionService.create_fused_declarations(
+                    [_template.get_pointwise_code()
+                     for _template in template_list])
+                cls._fused_blocks[template_list] = (
+                    UniformBlockService.create_parameter_block(
+                        _declarations)[1:])
+            _layout, _size = cls._fused_blocks[template_list]
+            return _layout, _size, [FusionService.get_prefix(_index)
+                                    for _index in range(len(template_list))]
+        if template_list[0].get_glsl_code() is not None:
+            _glsl_code, _layout, _size = cls._get_parameter_block(
+                template_list[0])
+            return _layout, _size, [""]
+        return None
+
+    @staticmethod
+    def _get_pointwise_chain_end(modifier_list: list[Modifier],
+                                 start_index: int) -> int:
+        """Return the end of the pointwise chain starting at an index."""
+        _end_index = start_index
+        while _end_index < len(modifier_list):
+            _template = ModifierRepository.get_template(
+                modifier_list[_end_index].get_template_id())
+            if _template.get_pointwise_code() is None:
+                break
+            _end_index += 1
+            if not Config.render.pointwise_fusion:
+                break
+        return _end_index
+
+    @staticmethod
+    def _get_required_alpha(modifier_list: list[Modifier],
+                            index: int) -> Optional[bool]:
+        """Return the alpha mode required by the modifier at an index.
+
+        Past the end of the list, layers are premultiplied. None is
+        returned when the modifier ignores its source.
+        """
+        if index >= len(modifier_list):
+            return True
+        _flags = ModifierRepository.get_template(
+            modifier_list[index].get_template_id()).get_flags()
+        if ModifierFlag.WRITEONLY in _flags:
+            return None
+        return ModifierFlag.STRAIGHT_ALPHA not in _flags
+
     @staticmethod
     def get_parameter_value(parameter: Parameter,
                             sequence_ctx: SequenceContext
                             ) -> DataType:
         """Get the value of a parameter according to a sequence context."""
-        return AnimationService.get_value_at_frame(
-            parameter, sequence_ctx.get_current_frame()).get_value()
+        return AnimationTableService.get_value_at_frame(
+            parameter, sequence_ctx.get_current_frame())
 
     @classmethod
     def create_color_texture(cls,
                              width: int,
                              height: int,
-                             color: tuple = (0, 0, 0, 0)
+                             color: tuple = (0, 0, 0, 0),
+                             region: tuple[int, int, int, int] = None
                              ) -> moderngl.Texture:
-        """Render a SolidLayer to a texture using a fragment shader."""
+        """Render a SolidLayer to a premultiplied texture.
+
+        Only the pixels within the region are filled, if given.
+        """
         _gl_context = GLContext.get_context()
         if cls._color_shader is None:
             _glsl_code = """
@@ -138,55 +756,237 @@ class RenderService:
             layout (local_size_x = 1, local_size_y = 1) in;
             layout (rgba32f, binding = 0) uniform writeonly image2D texture;
             uniform vec4 color;
+            uniform ivec2 region_origin;
             void main() {
-                imageStore(texture, ivec2(gl_GlobalInvocationID.xy), color);
+                imageStore(texture,
+                           ivec2(gl_GlobalInvocationID.xy) + region_origin,
+                           color);
             }
             """
             cls._color_shader = _gl_context.compute_shader(_glsl_code)
-        _texture = _gl_context.texture((width, height), 4, dtype="f4")
+        _texture = MemoryService.allocate_texture((width, height))
         _texture.bind_to_image(0, read=False, write=True)
-        cls._color_shader["color"] = color
-        cls._color_shader.run(width, height, 1)
+        _alpha = color[3]
+        cls._color_shader["color"] = (color[0]*_alpha, color[1]*_alpha,
+                                      color[2]*_alpha, _alpha)
+        if region is None:
+            region = (0, 0, width, height)
+        cls._color_shader["region_origin"] = region[:2]
+        cls._color_shader.run(region[2], region[3], 1)
         return _texture
 
+    @classmethod
+    def convert_alpha(cls, context: RenderContext, premultiplied: bool):
+        """Convert the src texture of a RenderContext to an alpha mode.
+
+        The conversion happens in place and only if the RenderContext
+        is not already in the requested mode, so that consecutive
+        modifiers working on straight alpha share a single conversion.
+        """
+        if context.is_premultiplied() == premultiplied:
+            return
+        _gl_context = GLContext.get_context()
+        if cls._alpha_shader is None:
+            _glsl_code = """
+            #version 430
+            layout (local_size_x = 16, local_size_y = 16) in;
+            layout (rgba32f, binding = 0) uniform image2D img;
+            uniform bool premultiply;
+            void main() {
+                ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+                ivec2 dimensions = imageSize(img).xy;
+                if(any(greaterThanEqual(coords, dimensions))){return;}
+                vec4 color = imageLoad(img, coords);
+                if(premultiply){
+                    color.rgb *= color.a;
+                }else if(color.a > 0.){
+                    color.rgb /= color.a;
+                }
+                imageStore(img, coords, color);
+            }
+            """
+            cls._alpha_shader = _gl_context.compute_shader(_glsl_code)
+        _texture = context.get_src_texture()
+        _texture.bind_to_image(0, read=True, write=True)
+        cls._alpha_shader["premultiply"] = premultiplied
+        cls._alpha_shader.run(_texture.width//16+1, _texture.height//16+1, 1)
+        context.set_premultiplied(premultiplied)
+
     @classmethod
     def render_sequence_frame(cls,
                               sequence: Sequence,
-                              frame: int
+                              frame: int,
+                              export: bool = False,
+                              region: tuple[int, int, int, int] = None,
+                              solo_layers: list[int] = None,
+                              edited_layer: int = None
                               ) -> moderngl.Texture:
-        """Render a frame of a Sequence to an OpenGL texture."""
+        """Render a frame of a Sequence to an OpenGL texture.
+
+        If a region of the frame is given, with rows counted from the
+        top, layers are only rendered where they cover it, and the
+        rest of the frame is left transparent. If a list of layer ids
+        is given as solo_layers, the other layers are skipped. If the
+        id of a layer being edited is given, its intermediate textures
+        are cached, unless exporting, and those of any other layer are
+        released.
+        """
+        LayerCacheService.set_edited_layer(
+            None if export or edited_layer is None
+            else sequence.get_layer(edited_layer))
+        _anti_aliasing = cls.get_anti_aliasing(export)
         _width = sequence.get_width()
         _height = sequence.get_height()
+        # Region of the frame texture, whose rows are stored bottom-up.
+        _target_region = None
+        if region is not None:
+            region = RegionService.intersect_regions(
+                region, (0, 0, _width, _height))
+            _target_region = RegionService.flip_region(region, _height)
         _sequence_ctx = SequenceContext(sequence, frame)
         _gl_context = GLContext.get_context()
-        _result_texture = _gl_context.texture((_width, _height), 4, dtype="f4")
+        ProfilerService.begin_frame(frame)
+        _result_texture = MemoryService.allocate_texture(
+            (_width, _height), category=MemoryCategory.FRAME)
 
-        # TODO : try avoiding doing this just to clear the texture
         _fbo = _gl_context.framebuffer(color_attachments=[_result_texture])
         _fbo.use()
         _fbo.clear()
-        _fbo.release()
 
-        _layer_list = sequence.get_layer_list()
+        _layer_list = [
+            _layer for _layer_id, _layer
+            in enumerate(sequence.get_layer_list())
+            if isinstance(_layer, VisualLayer)
+            and _layer.get_start_frame() <= frame < _layer.get_end_frame()
+            and (solo_layers is None or _layer_id in solo_layers)]
+        # Upload the parameters of every modifier of the frame at once.
+        _entry_list = []
         for _layer in _layer_list:
-            if not isinstance(_layer, VisualLayer):
-                continue
-            _start = _layer.get_start_frame()
-            _end = _layer.get_end_frame()
-            if frame < _start or frame >= _end:
-                continue
-            _texture = cls.render_visual_layer(_layer, _sequence_ctx)
-            cls._transform_visual_layer_texture(
-                _layer, _texture, _sequence_ctx)
-            _texture.release()
-            cls._composite_over(cls._transform_texture, _result_texture)
+            _entry_list += cls.get_layer_program(
+                _layer).get_parameter_entries()
+        cls._upload_parameter_entries(_entry_list, _sequence_ctx)
+        for _layer in _layer_list:
+            _transform = cls.get_layer_transform(_layer, _sequence_ctx)
+            _layer_region = None
+            if region is not None:
+                _layer_region = RegionService.get_layer_region(
+                    region, _transform, cls.get_layer_size(_layer),
+                    (_width, _height))
+                if _layer_region[2] == 0 or _layer_region[3] == 0:
+                    continue
+            _texture = cls.render_visual_layer(_layer, _sequence_ctx,
+                                               _layer_region)
+            _offset = cls.get_integer_offset(
+                (_texture.width, _texture.height), _transform, _sequence_ctx)
+            _layer_anti_aliasing = cls.resolve_anti_aliasing(
+                _anti_aliasing, (_texture.width, _texture.height), _transform)
+            if _offset is not None:
+                # Identity or integer translation: copy the layer directly.
+                with ProfilerService.section("composite"):
+                    cls._composite_over(_texture, _result_texture,
+                                        offset=_offset, flip=True,
+                                        region=_layer_region)
+            elif (Config.render.blend_compositing
+                  and _layer_anti_aliasing in [AntiAliasing.NONE,
+                                               AntiAliasing.ANALYTIC]):
+                cls._blend_visual_layer_texture(
+                    _transform, _texture, _sequence_ctx, _fbo,
+                    _layer_anti_aliasing)
+            else:
+                cls._transform_visual_layer_texture(
+                    _transform, _texture, _sequence_ctx, _layer_anti_aliasing)
+                with ProfilerService.section("composite"):
+                    cls._composite_over(cls._transform_texture,
+                                        _result_texture,
+                                        region=_target_region)
+            MemoryService.release_texture(_texture)
 
-        cls._tonemap(_result_texture)
+        if region is not None:
+            cls._clear_outside_region(_fbo, region, (_width, _height))
+        _fbo.release()
+        ProfilerService.set_scope(FRAME_SCOPE)
+        with ProfilerService.section("tonemap"):
+            cls._tonemap(_result_texture, _target_region)
+        ProfilerService.end_frame()
         return _result_texture
 
+    @staticmethod
+    def _clear_outside_region(fbo: moderngl.Framebuffer,
+                              region: tuple[int, int, int, int],
+                              size: tuple[int, int]):
+        """Clear the pixels of a frame outside a region.
+
+        Layers are only valid within the region they were rendered
+        for, so stale pixels may have been composited elsewhere.
+        """
+        _x, _y, _width, _height = region
+        _frame_width, _frame_height = size
+        # Rows are stored bottom-up in the framebuffer.
+        _bottom = _frame_height - _y - _height
+        GLContext.get_context().memory_barrier()
+        for _viewport in [(0, 0, _frame_width, _bottom),
+                          (0, _bottom + _height, _frame_width, _y),
+                          (0, _bottom, _x, _height),
+                          (_x + _width, _bottom,
+                           _frame_width - _x - _width, _height)]:
+            if _viewport[2] > 0 and _viewport[3] > 0:
+                fbo.clear(viewport=_viewport)
+
     @classmethod
-    def _tonemap(cls, texture: moderngl.Texture):
-        """Apply tone mapping to convert linear RGB to sRGB."""
+    def get_backend(cls) -> RenderBackend:
+        """Return the configured render backend.
+
+        In 'auto' mode, the CPU backend is used when no OpenGL context
+        can be created, such as on render nodes without a GPU.
+        """
+        _name = Config.render.backend.strip().upper()
+        if _name != "AUTO":
+            if not hasattr(RenderBackend, _name):
+                raise ValueError(f"Unknown render backend '{_name}'")
+            return RenderBackend[_name]
+        if cls._auto_backend is None:
+            try:
+                _version = GLContext.get_context().version_code
+                if _version < MIN_GL_VERSION:
+                    raise RuntimeError(f"OpenGL {_version} doesn't support "
+                                       f"compute shaders")
+                cls._auto_backend = RenderBackend.GPU
+            except Exception as _error:
+                print(f"Couldn't create an OpenGL context, "
+                      f"rendering on the CPU: {_error}")
+                cls._auto_backend = RenderBackend.CPU
+        return cls._auto_backend
+
+    @classmethod
+    def read_sequence_frame(cls,
+                            sequence: Sequence,
+                            frame: int,
+                            export: bool = False
+                            ) -> np.ndarray:
+        """Render a frame of a Sequence to a numpy array.
+
+        The frame is rendered with the configured backend, and its rows
+        are ordered like those of the texture of render_sequence_frame.
+        """
+        if cls.get_backend() == RenderBackend.CPU:
+            # The CPU backend builds on this service.
+            from core.services.cpu_render_service import CPURenderService
+            return CPURenderService.render_sequence_frame(sequence, frame,
+                                                          export)
+        _texture = cls.render_sequence_frame(sequence, frame, export)
+        _array = np.frombuffer(_texture.read(), dtype=np.float32).reshape(
+            _texture.height, _texture.width, 4).copy()
+        MemoryService.release_texture(_texture)
+        return _array
+
+    @classmethod
+    def _tonemap(cls,
+                 texture: moderngl.Texture,
+                 region: tuple[int, int, int, int] = None):
+        """Convert premultiplied linear RGB to straight sRGB.
+
+        Only the pixels within the region are converted, if given.
+        """
         # TODO : handle different tonemapping algorithms
         _gl_context = GLContext.get_context()
         if cls._tonemapping_shader is None:
@@ -194,10 +994,14 @@ class RenderService:
             #version 430
             layout (local_size_x = 1, local_size_y = 1) in;
             layout (rgba32f, binding = 0) uniform image2D texture;
+            uniform ivec2 region_origin;
             void main() {
-                ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+                ivec2 coords = ivec2(gl_GlobalInvocationID.xy) + region_origin;
                 vec4 color = imageLoad(texture, coords);
-                vec3 linear = color.rgb;
+                vec3 linear = vec3(0.);
+                if(color.a > 0.){
+                    linear = color.rgb/color.a;
+                }
 
                 bvec3 cutoff = lessThan(linear, vec3(.0031308));
                 vec3 higher = 1.055*pow(linear, vec3(1./2.4)) - .055;
@@ -209,14 +1013,27 @@ class RenderService:
             }
             """
             cls._tonemapping_shader = _gl_context.compute_shader(_glsl_code)
+        if region is None:
+            region = (0, 0, texture.width, texture.height)
         texture.bind_to_image(0, read=True, write=True)
-        cls._tonemapping_shader.run(texture.width, texture.height, 1)
+        cls._tonemapping_shader["region_origin"] = region[:2]
+        cls._tonemapping_shader.run(region[2], region[3], 1)
 
     @classmethod
     def _composite_over(cls,
                         texture_a: moderngl.Texture,
-                        texture_b: moderngl.Texture):
-        """Composite two equal size moderngl Texture on top of each other."""
+                        texture_b: moderngl.Texture,
+                        offset: tuple[int, int] = (0, 0),
+                        flip: bool = False,
+                        region: tuple[int, int, int, int] = None):
+        """Composite a premultiplied moderngl Texture on top of another.
+
+        The pixel (x, y) of texture_a lands on the pixel (x, y) + offset
+        of texture_b, or on its vertically mirrored row if flip is set,
+        which matches the orientation produced by the transform pass.
+        Only the pixels of texture_a within the region are composited,
+        if given.
+        """
         _gl_context = GLContext.get_context()
         if cls._compositing_shader is None:
             _glsl_code = """
@@ -224,46 +1041,123 @@ class RenderService:
             layout (local_size_x = 1, local_size_y = 1) in;
             layout (rgba32f, binding = 0) uniform readonly image2D texture_a;
             layout (rgba32f, binding = 1) uniform image2D texture_b;
+            uniform ivec2 offset;
+            uniform bool flip;
+            uniform ivec2 region_origin;
             void main() {
-                ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
-                vec4 color_a = imageLoad(texture_a, coords);
-                vec4 out_color;
-                if(color_a.a == 1.){
-                    out_color = color_a;
-                }else{
-                    vec4 color_b = imageLoad(texture_b, coords);
-
-                    vec3 rgb_a = color_a.rgb;
-                    vec3 rgb_b = color_b.rgb;
-                    float alpha_a = color_a.a;
-                    float alpha_b = color_b.a;
-
-                    float out_alpha = alpha_a + alpha_b*(1.-alpha_a);
-                    vec3 out_rgb = (rgb_a*alpha_a+rgb_b*alpha_b*(1.-alpha_a));
-                    if(out_alpha > 0.){
-                        out_rgb /= out_alpha;
-                    }
-                    out_color = vec4(out_rgb, out_alpha);
+                ivec2 coords_a = ivec2(gl_GlobalInvocationID.xy)
+                                 + region_origin;
+                ivec2 dimensions_b = imageSize(texture_b).xy;
+                ivec2 coords = coords_a + offset;
+                if(flip){
+                    coords.y = dimensions_b.y - 1 - coords.y;
                 }
-                imageStore(texture_b, coords.xy, out_color);
+                if(any(lessThan(coords, ivec2(0)))
+                   || any(greaterThanEqual(coords, dimensions_b))){
+                    return;
+                }
+                vec4 color_a = imageLoad(texture_a, coords_a);
+                vec4 color_b = imageLoad(texture_b, coords);
+                vec4 out_color = color_a + color_b*(1.-color_a.a);
+                imageStore(texture_b, coords, out_color);
             }
             """
             cls._compositing_shader = _gl_context.compute_shader(_glsl_code)
+        if region is None:
+            region = (0, 0, texture_a.width, texture_a.height)
+        cls._compositing_shader["offset"] = offset
+        cls._compositing_shader["flip"] = flip
+        cls._compositing_shader["region_origin"] = region[:2]
         texture_a.bind_to_image(0, read=True, write=False)
         texture_b.bind_to_image(1, read=True, write=True)
-        cls._compositing_shader.run(texture_a.width, texture_a.height, 1)
+        cls._compositing_shader.run(region[2], region[3], 1)
 
     @classmethod
-    def _transform_visual_layer_texture(cls,
-                                        visual_layer: VisualLayer,
-                                        texture: moderngl.Texture,
-                                        sequence_ctx: SequenceContext):
-        """Transform a texture based on a VisualLayer geometry."""
-        out_width = sequence_ctx.get_width()
-        out_height = sequence_ctx.get_height()
+    def get_layer_transform(cls,
+                            visual_layer: VisualLayer,
+                            sequence_ctx: SequenceContext
+                            ) -> tuple:
+        """Return position, anchor, scale, rotation and opacity."""
+        # TODO : make this part thread safe, by storing the geometrical info
+        # about the layer inside the RenderContext
+        _frame = sequence_ctx.get_current_frame()
+        return tuple(
+            _evaluator(_frame) for _evaluator
+            in cls.get_layer_program(visual_layer).get_transform_evaluators())
+
+    @staticmethod
+    def get_integer_offset(texture_size: tuple[int, int],
+                           transform: tuple,
+                           sequence_ctx: SequenceContext
+                           ) -> Optional[tuple[int, int]]:
+        """Return the pixel offset of a pure integer translation.
+
+        Return None if the transform scales, rotates, fades, or moves
+        the texture by a fraction of a pixel, in which case it has to
+        go through the transform pass.
+        """
+        _position, _anchor, _scale, _rotation, _opacity = transform
+        if (_rotation != 0 or _opacity != 1
+                or _scale[0] != 1 or _scale[1] != 1):
+            return None
+        _context_size = (sequence_ctx.get_width(), sequence_ctx.get_height())
+        _offset = []
+        for _axis in range(2):
+            _pixels = (_position[_axis]*_context_size[_axis]
+                       - _anchor[_axis]*texture_size[_axis])
+            if abs(_pixels - round(_pixels)) > 1e-4:
+                return None
+            _offset.append(int(round(_pixels)))
+        return tuple(_offset)
+
+    @classmethod
+    def get_anti_aliasing(cls, export: bool = False) -> AntiAliasing:
+        """Return the configured anti-aliasing strategy."""
+        _name = Config.render.anti_aliasing
+        if export:
+            _name = Config.render.export_anti_aliasing
+        _name = _name.strip().upper()
+        if not hasattr(AntiAliasing, _name):
+            raise ValueError(f"Unknown anti-aliasing strategy '{_name}'")
+        return AntiAliasing[_name]
+
+    @staticmethod
+    def _needs_multisampling(texture_size: tuple[int, int],
+                             scale: tuple[float, float],
+                             rotation: float) -> bool:
+        """Tell if a transform produces edges that are not pixel aligned."""
+        _quarter_turns = rotation / (np.pi/2)
+        if abs(_quarter_turns - round(_quarter_turns)) > 1e-6:
+            return True
+        for _size, _factor in zip(texture_size, scale):
+            _scaled_size = _size * _factor
+            if abs(_scaled_size - round(_scaled_size)) > 1e-6:
+                return True
+        return False
+
+    @classmethod
+    def resolve_anti_aliasing(cls,
+                              anti_aliasing: AntiAliasing,
+                              texture_size: tuple[int, int],
+                              transform: tuple) -> AntiAliasing:
+        """Return the strategy to use for a given layer transform."""
+        if anti_aliasing != AntiAliasing.ADAPTIVE_MSAA:
+            return anti_aliasing
+        _scale = transform[2]
+        _rotation = transform[3]
+        if cls._needs_multisampling(texture_size, _scale, _rotation):
+            return AntiAliasing.MSAA
+        return AntiAliasing.NONE
+
+    @classmethod
+    def _bind_transform_program(cls,
+                                transform: tuple,
+                                texture: moderngl.Texture,
+                                sequence_ctx: SequenceContext,
+                                analytic: bool
+                                ) -> moderngl.VertexArray:
+        """Prepare the transform program and return its quad."""
         _gl_context = GLContext.get_context()
-        _tex_width = texture.width
-        _tex_height = texture.height
         if cls._transform_program is None:
             _vertex_code = """
             #version 330 core
@@ -275,16 +1169,24 @@ class RenderService:
             uniform vec2 anchor;
             uniform vec2 scale;
             uniform float rotation;
+            uniform float padding;
+            uniform vec2 view_offset;
+            uniform vec2 view_size;
             void main() {
+                // Grow the quad by a few pixels for edge coverage.
+                vec2 pixel_size = 1./max(texture_size*abs(scale), 1e-6);
+                vec2 padded_uv = in_uv + (2.*in_uv-1.)*padding*pixel_size;
                 mat2 rot = mat2(cos(rotation), sin(rotation),
                                 -sin(rotation), cos(rotation));
-                vec2 transformed_pos = texture_size*scale*(in_uv-anchor);
+                vec2 transformed_pos = texture_size*scale*(padded_uv-anchor);
                 transformed_pos = rot*transformed_pos;
                 transformed_pos += position*context_size;
-                transformed_pos = transformed_pos*2./context_size - 1.;
-                transformed_pos.y *= -1.;
+                // Rows are stored bottom-up in the framebuffer.
+                transformed_pos.y = context_size.y - transformed_pos.y;
+                transformed_pos -= view_offset;
+                transformed_pos = transformed_pos*2./view_size - 1.;
                 gl_Position = vec4(transformed_pos, 0., 1.);
-                uv = in_uv;
+                uv = padded_uv;
             }
             """
             _fragment_code = """
@@ -293,67 +1195,239 @@ class RenderService:
             out vec4 out_color;
             uniform sampler2D in_texture;
             uniform float opacity;
+            uniform bool analytic;
             void main() {
-                vec4 tex_color = texture(in_texture, uv);
-                out_color = vec4(tex_color.rgb, tex_color.a * opacity);
+                // The texture holds premultiplied colors.
+                vec4 tex_color = texture(in_texture, clamp(uv, 0., 1.));
+                float coverage = 1.;
+                if(analytic){
+                    // Distance to the nearest edges, in output pixels.
+                    vec2 edge = min(uv, 1.-uv)/max(fwidth(uv), 1e-6);
+                    vec2 axis_coverage = clamp(edge + .5, 0., 1.);
+                    coverage = axis_coverage.x*axis_coverage.y;
+                }
+                out_color = tex_color * opacity * coverage;
             }
             """
             cls._transform_program = _gl_context.program(
                 vertex_shader=_vertex_code,
                 fragment_shader=_fragment_code
             )
-        _quad_vertices = np.array([0,0,1,0,0,1,1,1], dtype=np.float32)
-        _vbo = _gl_context.buffer(_quad_vertices.tobytes())
-        _vao = _gl_context.vertex_array(cls._transform_program, _vbo, "in_uv")
+        if cls._transform_vao is None:
+            _quad_vertices = np.array([0,0,1,0,0,1,1,1], dtype=np.float32)
+            _vbo = _gl_context.buffer(_quad_vertices.tobytes())
+            cls._transform_vao = _gl_context.vertex_array(
+                cls._transform_program, _vbo, "in_uv")
+        # Clamp to edge, rather than blending opposite edges together.
+        texture.repeat_x = False
+        texture.repeat_y = False
         texture.use(location=0)
 
-        # TODO : make this part thread safe, by storing the geometrical info
-        # about the layer inside the RenderContext
-        _position = cls.get_parameter_value(
-            visual_layer.get_property_parameter("position"), sequence_ctx)
-        _anchor = cls.get_parameter_value(
-            visual_layer.get_property_parameter("anchor"), sequence_ctx)
-        _scale = cls.get_parameter_value(
-            visual_layer.get_property_parameter("scale"), sequence_ctx)
-        _rotation = cls.get_parameter_value(
-            visual_layer.get_property_parameter("rotation"), sequence_ctx)
-        _opacity = cls.get_parameter_value(
-            visual_layer.get_property_parameter("opacity"), sequence_ctx)
-
+        _position, _anchor, _scale, _rotation, _opacity = transform
         cls._transform_program["in_texture"] = 0
-        cls._transform_program["context_size"] = out_width, out_height
-        cls._transform_program["texture_size"] = _tex_width, _tex_height
+        _context_size = (sequence_ctx.get_width(), sequence_ctx.get_height())
+        cls._transform_program["context_size"] = _context_size
+        cls._transform_program["view_offset"] = 0, 0
+        cls._transform_program["view_size"] = _context_size
+        cls._transform_program["texture_size"] = texture.width, texture.height
         cls._transform_program["position"] = _position
         cls._transform_program["anchor"] = _anchor
         cls._transform_program["scale"] = _scale
         cls._transform_program["rotation"] = _rotation
         cls._transform_program["opacity"] = _opacity
+        cls._transform_program["padding"] = 2. if analytic else 0.
+        cls._transform_program["analytic"] = analytic
+        return cls._transform_vao
+
+    @classmethod
+    def _blend_visual_layer_texture(cls,
+                                    transform: tuple,
+                                    texture: moderngl.Texture,
+                                    sequence_ctx: SequenceContext,
+                                    fbo: moderngl.Framebuffer,
+                                    anti_aliasing: AntiAliasing
+                                    = AntiAliasing.NONE):
+        """Draw a transformed texture over a framebuffer with blending.
+
+        This replaces the transform and compositing passes for the
+        strategies that rasterize straight to the output resolution.
+        """
+        _gl_context = GLContext.get_context()
+        _vao = cls._bind_transform_program(
+            transform, texture, sequence_ctx,
+            anti_aliasing == AntiAliasing.ANALYTIC)
+        # Make previous compute writes to the result visible.
+        _gl_context.memory_barrier()
+        fbo.use()
+        _gl_context.enable(moderngl.BLEND)
+        _gl_context.blend_func = moderngl.ONE, moderngl.ONE_MINUS_SRC_ALPHA
+        with ProfilerService.section("composite"):
+            _vao.render(moderngl.TRIANGLE_STRIP)
+        _gl_context.disable(moderngl.BLEND)
+
+    @classmethod
+    def _transform_visual_layer_texture(cls,
+                                        transform: tuple,
+                                        texture: moderngl.Texture,
+                                        sequence_ctx: SequenceContext,
+                                        anti_aliasing: AntiAliasing
+                                        = AntiAliasing.MSAA):
+        """Transform a texture based on a VisualLayer geometry.
+
+        The transform is the tuple returned by get_layer_transform.
+        """
+        out_width = sequence_ctx.get_width()
+        out_height = sequence_ctx.get_height()
+        _gl_context = GLContext.get_context()
+        anti_aliasing = cls.resolve_anti_aliasing(
+            anti_aliasing, (texture.width, texture.height), transform)
+        _vao = cls._bind_transform_program(
+            transform, texture, sequence_ctx,
+            anti_aliasing == AntiAliasing.ANALYTIC)
 
         if (cls._transform_texture is not None
             and (cls._transform_texture.width != out_width
                  or cls._transform_texture.height != out_height)):
-            cls._transform_msaa_texture.release()
-            cls._transform_msaa_fbo.release()
-            cls._transform_texture.release()
-            cls._transform_fbo.release()
-            cls._transform_msaa_texture = None
-            cls._transform_msaa_fbo = None
-            cls._transform_texture = None
-            cls._transform_fbo = None
+            cls._release_transform_targets()
 
         if cls._transform_texture is None:
-            cls._transform_msaa_texture = _gl_context.texture(
-                (out_width, out_height), 4, dtype="f4",
-                samples=Config.render.anti_aliasing_samples)
-            cls._transform_msaa_fbo = _gl_context.framebuffer(
-                color_attachments=[cls._transform_msaa_texture])
-            cls._transform_texture = _gl_context.texture(
-                (out_width, out_height), 4, dtype="f4")
+            cls._transform_texture = MemoryService.allocate_texture(
+                (out_width, out_height),
+                category=MemoryCategory.RENDER_TARGET)
             cls._transform_fbo = _gl_context.framebuffer(
                 color_attachments=[cls._transform_texture])
 
-        cls._transform_msaa_fbo.use()
-        cls._transform_msaa_fbo.clear(0, 0, 0, 0)
-        _vao.render(moderngl.TRIANGLE_STRIP)
-        _gl_context.copy_framebuffer(cls._transform_fbo,
-                                     cls._transform_msaa_fbo)
+        if anti_aliasing == AntiAliasing.MSAA:
+            if cls._transform_msaa_texture is None:
+                cls._transform_msaa_texture = MemoryService.allocate_texture(
+                    (out_width, out_height),
+                    samples=Config.render.anti_aliasing_samples,
+                    category=MemoryCategory.RENDER_TARGET,
+                    fallback_dtype="f2")
+                cls._transform_msaa_fbo = _gl_context.framebuffer(
+                    color_attachments=[cls._transform_msaa_texture])
+            cls._transform_msaa_fbo.use()
+            cls._transform_msaa_fbo.clear(0, 0, 0, 0)
+            with ProfilerService.section("transform"):
+                _vao.render(moderngl.TRIANGLE_STRIP)
+            with ProfilerService.section("resolve"):
+                _gl_context.copy_framebuffer(cls._transform_fbo,
+                                             cls._transform_msaa_fbo)
+
+        elif anti_aliasing == AntiAliasing.SUPERSAMPLING:
+            cls._supersample(_vao, out_width, out_height)
+
+        else:
+            cls._transform_fbo.use()
+            cls._transform_fbo.clear(0, 0, 0, 0)
+            with ProfilerService.section("transform"):
+                _vao.render(moderngl.TRIANGLE_STRIP)
+
+    @classmethod
+    def _supersample(cls,
+                     vao: moderngl.VertexArray,
+                     width: int,
+                     height: int):
+        """Render the transform quad supersampled into the transform texture.
+
+        The supersampled target covers the whole frame when it fits in
+        the memory budget, otherwise the frame is rendered in tiles.
+        """
+        _gl_context = GLContext.get_context()
+        _factor = max(1, Config.render.supersampling_factor)
+        if cls._supersampling_texture is not None:
+            _tile_width = cls._supersampling_texture.width // _factor
+            if (_tile_width * _factor != cls._supersampling_texture.width
+                    or _tile_width > width):
+                # The supersampling factor changed since the allocation.
+                MemoryService.release_texture(cls._supersampling_texture)
+                cls._supersampling_fbo.release()
+                cls._supersampling_texture = None
+                cls._supersampling_fbo = None
+        if cls._supersampling_texture is None:
+            _tile_size = (width, height)
+            while cls._supersampling_texture is None:
+                # Below the minimum tile size, exceed the budget instead.
+                _smallest = max(_tile_size) <= MIN_SUPERSAMPLING_TILE_SIZE
+                try:
+                    cls._supersampling_texture = (
+                        MemoryService.allocate_texture(
+                            (_tile_size[0]*_factor, _tile_size[1]*_factor),
+                            category=MemoryCategory.RENDER_TARGET,
+                            may_fail=not _smallest))
+                except GPUMemoryError:
+                    if _smallest:
+                        raise
+                    _tile_size = ((_tile_size[0]+1)//2,
+                                  (_tile_size[1]+1)//2)
+            cls._supersampling_fbo = _gl_context.framebuffer(
+                color_attachments=[cls._supersampling_texture])
+        _tile_width = cls._supersampling_texture.width // _factor
+        _tile_height = cls._supersampling_texture.height // _factor
+        cls._transform_program["view_size"] = _tile_width, _tile_height
+        for _y in range(0, height, _tile_height):
+            for _x in range(0, width, _tile_width):
+                cls._transform_program["view_offset"] = _x, _y
+                cls._supersampling_fbo.use()
+                cls._supersampling_fbo.clear(0, 0, 0, 0)
+                with ProfilerService.section("transform"):
+                    vao.render(moderngl.TRIANGLE_STRIP)
+                with ProfilerService.section("resolve"):
+                    cls._downsample(cls._supersampling_texture,
+                                    cls._transform_texture, _factor,
+                                    (_x, _y))
+
+    @classmethod
+    def _release_transform_targets(cls):
+        """Release the render targets used by the transform pass."""
+        for _name in ["_transform_msaa_texture", "_transform_texture",
+                      "_supersampling_texture"]:
+            MemoryService.release_texture(getattr(cls, _name))
+            setattr(cls, _name, None)
+        for _name in ["_transform_msaa_fbo", "_transform_fbo",
+                      "_supersampling_fbo"]:
+            _fbo = getattr(cls, _name)
+            if _fbo is not None:
+                _fbo.release()
+                setattr(cls, _name, None)
+
+    @classmethod
+    def _downsample(cls,
+                    src_texture: moderngl.Texture,
+                    dest_texture: moderngl.Texture,
+                    factor: int,
+                    offset: tuple[int, int] = (0, 0)):
+        """Average blocks of factor x factor premultiplied pixels.
+
+        The downsampled src texture lands at offset in dest texture.
+        """
+        _gl_context = GLContext.get_context()
+        if cls._downsampling_shader is None:
+            _glsl_code = """
+            #version 430
+            layout (local_size_x = 16, local_size_y = 16) in;
+            layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+            layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+            uniform int factor;
+            uniform ivec2 offset;
+            void main() {
+                ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+                ivec2 out_coords = coords + offset;
+                ivec2 dimensions = imageSize(img_output).xy;
+                if(any(greaterThanEqual(out_coords, dimensions))){return;}
+                vec4 sum = vec4(0.);
+                for(int j=0; j<factor; j++){
+                    for(int i=0; i<factor; i++){
+                        sum += imageLoad(img_input, coords*factor+ivec2(i, j));
+                    }
+                }
+                imageStore(img_output, out_coords, sum/float(factor*factor));
+            }
+            """
+            cls._downsampling_shader = _gl_context.compute_shader(_glsl_code)
+        cls._downsampling_shader["factor"] = factor
+        cls._downsampling_shader["offset"] = offset
+        src_texture.bind_to_image(0, read=True, write=False)
+        dest_texture.bind_to_image(1, read=False, write=True)
+        cls._downsampling_shader.run(src_texture.width//factor//16+1,
+                                     src_texture.height//factor//16+1, 1)
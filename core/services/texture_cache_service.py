@@ -0,0 +1,93 @@
+"""
+Service concerning textures cached by modifiers in general.
+
+The TextureCacheService class defines services within the core
+package, concerning textures that a modifier computes once and reads
+again on later frames, such as lookup tables depending only on some
+of its parameters. Textures are cached by owner, the name id of the
+modifier, then by a key the modifier chooses. Each owner keeps a
+limited number of keys, least recently used ones being released
+first, and every cached texture is released under memory pressure
+or when its modifier is reloaded.
+"""
+
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import moderngl
+
+from core.services.memory_service import MemoryCategory, MemoryService
+
+
+TEXTURE_CACHE = "modifier_textures"
+# Cached textures took work to compute, so the pool is evicted first.
+CACHE_PRIORITY = 0
+
+
+class TextureCacheService:
+    """Service concerning textures cached by modifiers in general."""
+
+    # Textures by owner name id, then by key, least recently used first.
+    _textures: dict[str, OrderedDict[Hashable, moderngl.Texture]] = dict()
+
+    @classmethod
+    def get_texture(cls,
+                    owner_name_id: str,
+                    key: Hashable) -> Optional[moderngl.Texture]:
+        """Return the texture cached for a key, if any."""
+        _owner_textures = cls._textures.get(owner_name_id)
+        if _owner_textures is None or key not in _owner_textures:
+            return None
+        _owner_textures.move_to_end(key)
+        return _owner_textures[key]
+
+    @classmethod
+    def store_texture(cls,
+                      owner_name_id: str,
+                      key: Hashable,
+                      texture: moderngl.Texture,
+                      capacity: int):
+        """Cache a texture, keeping at most capacity keys for its owner."""
+        if not cls._textures:
+            MemoryService.register_cache(TEXTURE_CACHE, CACHE_PRIORITY,
+                                         cls._evict)
+        MemoryService.set_category(texture, MemoryCategory.CACHE)
+        _owner_textures = cls._textures.setdefault(owner_name_id,
+                                                   OrderedDict())
+        _previous_texture = _owner_textures.pop(key, None)
+        if _previous_texture not in (None, texture):
+            MemoryService.release_texture(_previous_texture)
+        _owner_textures[key] = texture
+        while len(_owner_textures) > max(capacity, 1):
+            MemoryService.release_texture(
+                _owner_textures.popitem(last=False)[1])
+
+    @classmethod
+    def release_textures(cls, owner_name_id: str):
+        """Release the textures cached for an owner."""
+        for _texture in cls._textures.pop(owner_name_id, dict()).values():
+            MemoryService.release_texture(_texture)
+        if not cls._textures:
+            MemoryService.unregister_cache(TEXTURE_CACHE)
+
+    @classmethod
+    def _evict(cls, byte_count: int):
+        """Release cached textures until byte_count is freed.
+
+        The least recently used key of each owner goes first, owners
+        taking turns so that no modifier loses its whole cache first.
+        """
+        _freed = 0
+        while _freed < byte_count and cls._textures:
+            for _owner_name_id in list(cls._textures):
+                _owner_textures = cls._textures[_owner_name_id]
+                _texture = _owner_textures.popitem(last=False)[1]
+                _freed += MemoryService.texture_bytes(
+                    _texture.size, _texture.components, _texture.dtype)
+                MemoryService.release_texture(_texture)
+                if not _owner_textures:
+                    del cls._textures[_owner_name_id]
+                if _freed >= byte_count:
+                    break
+        if not cls._textures:
+            MemoryService.unregister_cache(TEXTURE_CACHE)
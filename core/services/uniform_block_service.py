@@ -0,0 +1,103 @@
+"""
+Service concerning uniform blocks in general.
+
+The UniformBlockService class defines services within the core
+package, concerning the upload of modifier parameters. The scalar
+and vector uniforms declared by the shaders the engine dispatches are
+gathered into a std140 uniform block, so that the parameters of a
+whole frame can be packed with numpy and uploaded in a single buffer.
+"""
+
+import re
+
+import numpy as np
+
+
+# Component count, alignment in 4 byte words and numpy dtype by type.
+GLSL_TYPES = {
+    "float": (1, 1, np.float32),
+    "int": (1, 1, np.int32),
+    "uint": (1, 1, np.int32),
+    "bool": (1, 1, np.int32),
+    "vec2": (2, 2, np.float32),
+    "ivec2": (2, 2, np.int32),
+    "vec3": (3, 4, np.float32),
+    "ivec3": (3, 4, np.int32),
+    "vec4": (4, 4, np.float32),
+    "ivec4": (4, 4, np.int32)
+}
+UNIFORM_PATTERN = re.compile(r"^[ \t]*uniform\s+(\w+)\s+(\w+)\s*;[ \t]*\n?",
+                             re.M)
+VERSION_PATTERN = re.compile(r"^[ \t]*#version[^\n]*\n", re.M)
+PARAMETER_BINDING = 0
+
+
+class UniformBlockService:
+    """Service concerning uniform blocks in general."""
+
+    @staticmethod
+    def create_parameter_block(glsl_code: str
+                               ) -> tuple[str, dict[str, tuple], int]:
+        """Move the scalar and vector uniforms of GLSL code to a block.
+
+        Return the new code, the layout of the block, mapping each
+        uniform name to its offset in 4 byte words, its component count
+        and its dtype, and the size of the block in bytes.
+        """
+        _member_list = []
+
+        def _remove_declaration(match: re.Match) -> str:
+            _type, _name = match.groups()
+            if _type not in GLSL_TYPES:
+                return match.group(0)
+            _member_list.append((_type, _name))
+            return ""
+
+        _code = UNIFORM_PATTERN.sub(_remove_declaration, glsl_code)
+        if len(_member_list) == 0:
+            return glsl_code, dict(), 0
+        _layout = dict()
+        _word = 0
+        for _type, _name in _member_list:
+            _count, _alignment, _dtype = GLSL_TYPES[_type]
+            _word = -(-_word // _alignment) * _alignment
+            _layout[_name] = (_word, _count, _dtype)
+            _word += _count
+        # std140 blocks are padded to a multiple of a vec4.
+        _size = -(-_word // 4) * 16
+        _declaration = (
+            f"layout (std140, binding = {PARAMETER_BINDING}) "
+            f"uniform Parameters {{\n"
+            + "".join(f"    {_type} {_name};\n"
+                      for _type, _name in _member_list)
+            + "};\n")
+        _match = VERSION_PATTERN.search(_code)
+        _index = 0 if _match is None else _match.end()
+        return _code[:_index] + _declaration + _code[_index:], _layout, _size
+
+    @staticmethod
+    def pack_blocks(byte_count: int,
+                    block_list: list[tuple[int, dict[str, tuple], dict]]
+                    ) -> np.ndarray:
+        """Pack the values of several blocks into an array of words.
+
+        Each block is given by its offset in bytes, its layout and its
+        values by uniform name. Values whose name isn't part of the
+        layout are ignored, like uniforms optimized out of a shader.
+        """
+        _indices = {np.float32: [], np.int32: []}
+        _values = {np.float32: [], np.int32: []}
+        for _byte_offset, _layout, _value_dict in block_list:
+            _word_offset = _byte_offset // 4
+            for _name, _value in _value_dict.items():
+                if _name not in _layout:
+                    continue
+                _word, _count, _dtype = _layout[_name]
+                _start = _word_offset + _word
+                _indices[_dtype].extend(range(_start, _start + _count))
+                _values[_dtype].extend(np.ravel(_value)[:_count])
+        _words = np.zeros(byte_count // 4, dtype=np.uint32)
+        for _dtype in _indices:
+            # Assign each dtype at once, through a view of the words.
+            _words.view(_dtype)[_indices[_dtype]] = _values[_dtype]
+        return _words
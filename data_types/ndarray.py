@@ -89,6 +89,10 @@ class NDArray(DataType):
             return self._value.tolist()[0]
         return self._value.tolist()
 
+    def get_array(self) -> np.ndarray:
+        """Return the value as a numpy array, without copying it."""
+        return self._value
+
     @staticmethod
     def is_array(val: Any) -> bool:
         """Tells if an object is a numpy array, a list or a tuple."""
@@ -1,10 +1,14 @@
 """A set of services for modifier related GUI elements."""
 
+from PySide6.QtCore import QObject, QTimer
+
 from core.entities.layer import Layer
+from core.entities.modifier import Modifier
 from core.services.modifier_service import ModifierService
 from core.services.project_service import ProjectService
 from gui.services.sequence_gui_service import SequenceGUIService
 from utils.notification import Notification
+from utils.config import Config
 
 
 class ModifierGUIService:
@@ -12,6 +16,26 @@ class ModifierGUIService:
 
     update_modifiers_signal = Notification()
     update_parameter_signal = Notification()
+    reload_modifiers_signal = Notification()
+
+    _reload_timer: QTimer = None
+
+    @classmethod
+    def watch_modifiers_directory(cls, parent: QObject):
+        """Poll the modifiers directory to reload changed files."""
+        _interval = Config.app.modifier_reload_interval
+        if _interval <= 0 or cls._reload_timer is not None:
+            return
+        cls._reload_timer = QTimer(parent)
+        cls._reload_timer.timeout.connect(cls.reload_changed_modifiers)
+        cls._reload_timer.start(_interval)
+
+    @classmethod
+    def reload_changed_modifiers(cls):
+        """Reload changed modifier files and redraw the viewers."""
+        _reloaded_list = ModifierService.reload_changed_modifiers()
+        if _reloaded_list:
+            cls.reload_modifiers_signal.emit(_reloaded_list)
 
     @classmethod
     def add_modifier_to_layer(cls,
@@ -26,3 +50,13 @@ class ModifierGUIService:
 
         # TODO: Change this to a more precise signal:
         cls.update_modifiers_signal.emit(sequence_id, layer_id)
+
+    @classmethod
+    def set_modifier_enabled(cls,
+                             sequence_id: int,
+                             layer_id: int,
+                             modifier: Modifier,
+                             enabled: bool):
+        """Enable a modifier of a layer, or bypass it."""
+        modifier.set_enabled(enabled)
+        cls.update_parameter_signal.emit(sequence_id, layer_id)
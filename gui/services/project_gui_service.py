@@ -118,8 +118,8 @@ class ProjectGUIService:
         if file_path:
             try:
                 from core.services.render_service import RenderService
+                from core.services.animation_table_service import AnimationTableService
                 from utils.image import save_image
-                import numpy as np
                 
                 sequence = SequenceGUIService.get_focused_sequence()
                 if not sequence:
@@ -136,22 +136,18 @@ class ProjectGUIService:
                 
                 # Export as PNG sequence
                 base_path = file_path.replace('.png', '')
+                AnimationTableService.bake_sequence(sequence)
                 for frame in range(duration):
                     if progress.wasCanceled():
                         break
                     
                     progress.setValue(frame)
-                    texture = RenderService.render_sequence_frame(sequence, frame)
+                    # Rendered with the GPU or the CPU backend
+                    output = RenderService.read_sequence_frame(
+                        sequence, frame, export=True)
                     
-                    if texture is not None:
-                        # Convert moderngl.Texture to numpy array
-                        output = np.frombuffer(
-                            texture.read(), 
-                            dtype=np.float32
-                        ).reshape((sequence.get_height(), sequence.get_width(), 4))
-                        
-                        frame_path = f"{base_path}_{frame:04d}.png"
-                        save_image(output, frame_path)
+                    frame_path = f"{base_path}_{frame:04d}.png"
+                    save_image(output, frame_path)
                 
                 progress.setValue(duration)
                 
@@ -63,14 +63,25 @@ class SequenceGUIService:
     
     @staticmethod
     def request_texture_from_sequence(sequence_id: int,
-                                      frame: int
+                                      frame: int,
+                                      region: tuple[int, int, int, int] = None,
+                                      solo_layers: list[int] = None,
+                                      edited_layer: int = None
                                       ) -> moderngl.Texture:
-        """Return a rendered frame within a sequence."""
+        """Return a rendered frame within a sequence.
+
+        If a region is given, only that part of the frame is rendered,
+        and if solo layers are given, only those layers are rendered.
+        If the layer being edited is given, its intermediate textures
+        are cached.
+        """
         # TODO : Optimize a lot this part, render only if needed
         # (probably better to do it in the core package,
         # with a MemoryStorage class for instance)
         _sequence = ProjectService.get_sequence_by_id(sequence_id)
-        _texture = RenderService.render_sequence_frame(_sequence, frame)
+        _texture = RenderService.render_sequence_frame(
+            _sequence, frame, region=region, solo_layers=solo_layers,
+            edited_layer=edited_layer)
         return _texture
 
     @classmethod
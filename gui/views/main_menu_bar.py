@@ -21,6 +21,7 @@ class MainMenuBar(QMenuBar):
         self.create_edit_menu()
         self.create_sequence_menu()
         self.create_layer_menu()
+        self.create_window_menu(parent)
 
     def create_file_menu(self):
         """Create the file menu."""
@@ -85,6 +86,15 @@ class MainMenuBar(QMenuBar):
         _parameters.setEnabled(False)
         _menu.addAction(_parameters)
 
+    def create_window_menu(self, window: 'MainWindow'):
+        """Create the window menu."""
+        _menu = self.addMenu("&Window")
+        _profiler = window.get_profiler_dock().toggleViewAction()
+        _profiler.setText("Profiler")
+        _profiler.setStatusTip("Profiler")
+        _profiler.setShortcut(QKeySequence("Ctrl+Shift+P"))
+        _menu.addAction(_profiler)
+
     def _action(self,
                   title: str,
                   function: Optional[Callable] = None,
@@ -5,7 +5,7 @@ from typing import Callable
 from PySide6.QtGui import QIcon, QKeySequence, QAction, QKeyEvent
 from PySide6.QtCore import QSize, Qt
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QSplitter,
-                               QFrame, QStatusBar, QLayout)
+                               QFrame, QStatusBar, QLayout, QDockWidget)
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 
 from utils.config import Config
@@ -14,12 +14,16 @@ from gui.views.viewer.viewer_pane import ViewerPane
 from gui.views.explorer.explorer_pane import ExplorerPane
 from gui.views.timeline.timeline_pane import TimelinePane
 from gui.views.misc.misc_pane import MiscPane
+from gui.views.misc.profiler_panel import ProfilerPanel
 from gui.views.main_menu_bar import MainMenuBar
+from gui.services.modifier_gui_service import ModifierGUIService
 
 
 class MainWindow(QMainWindow):
     """Main window of the app."""
 
+    _profiler_dock: QDockWidget
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("{0} {1}.{2}".format(
@@ -41,11 +45,13 @@ class MainWindow(QMainWindow):
         _layout.addWidget(_panes)
 
         self.setStatusBar(QStatusBar(self))
+        self.create_profiler_dock()
         self.setMenuBar(MainMenuBar(self))
         _tool_bar = MainToolBar(self)
         self.addToolBar(_tool_bar)
 
         self.initialize_open_gl_context(_layout)
+        ModifierGUIService.watch_modifiers_directory(self)
     
     def center(self):
         """Center the window in the current screen."""
@@ -90,6 +96,18 @@ class MainWindow(QMainWindow):
         _main.setHandleWidth(Config.window.splitter_width)
         return _main
     
+    def create_profiler_dock(self):
+        """Create the profiler panel in a dock, hidden by default."""
+        self._profiler_dock = QDockWidget("Profiler", self)
+        self._profiler_dock.setObjectName("profiler_dock")
+        self._profiler_dock.setWidget(ProfilerPanel(self._profiler_dock))
+        self.addDockWidget(Qt.BottomDockWidgetArea, self._profiler_dock)
+        self._profiler_dock.hide()
+
+    def get_profiler_dock(self) -> QDockWidget:
+        """Return the dock of the profiler panel."""
+        return self._profiler_dock
+
     def initialize_open_gl_context(self, layout: QLayout):
         """Create and remove an OpenGL widget to initialize the context."""
         _first_open_gl_context = QOpenGLWidget()
@@ -7,7 +7,7 @@ an editor for all the parameters of a modifier.
 
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (QWidget, QHBoxLayout, QGridLayout, QLabel,
-                               QSizePolicy, QFrame)
+                               QSizePolicy, QFrame, QCheckBox)
 
 from core.entities.modifier import Modifier
 from core.entities.parameter import Parameter
@@ -15,6 +15,7 @@ from core.entities.modifier_repository import ModifierRepository
 from data_types.data_type import DataType
 from utils.notification import Notification
 from gui.services.input_gui_service import InputGUIService
+from gui.services.modifier_gui_service import ModifierGUIService
 
 
 class ModifierEditor(QFrame):
@@ -46,7 +47,13 @@ class ModifierEditor(QFrame):
         _layout.setAlignment(Qt.AlignLeft)
         self.setLayout(_layout)
 
-        _title_widget = QLabel(self._title, self)
+        # Unchecking the title bypasses the modifier.
+        _title_widget = QCheckBox(self._title, self)
+        _title_widget.setCursor(Qt.PointingHandCursor)
+        _title_widget.setChecked(modifier.is_enabled())
+        _title_widget.toggled.connect(
+            lambda enabled: ModifierGUIService.set_modifier_enabled(
+                self._sequence_id, self._layer_id, modifier, enabled))
         _layout.addWidget(_title_widget, 0, 0, 1, 2)
 
         _param_template_list = _template.get_parameter_template_list()
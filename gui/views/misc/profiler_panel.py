@@ -0,0 +1,78 @@
+"""
+A panel showing the GPU timings of the rendered frames.
+
+The ProfilerPanel provides the user with the time each layer, and each
+modifier and pass within it, took on the GPU, for the last frame read
+and on average over the recent ones. Profiling is only enabled while
+the panel is visible.
+"""
+
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QShowEvent, QHideEvent
+from PySide6.QtWidgets import QWidget, QTreeWidget, QTreeWidgetItem
+
+from core.services.profiler_service import ProfilerService
+
+
+REFRESH_INTERVAL = 250
+
+
+class ProfilerPanel(QTreeWidget):
+    """A panel showing the GPU timings of the rendered frames."""
+
+    _refresh_timer: QTimer
+
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+        self.setHeaderLabels(["Pass", "Last (ms)", "Average (ms)"])
+        self.setFrameStyle(QTreeWidget.NoFrame)
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(REFRESH_INTERVAL)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event: QShowEvent):
+        """Start profiling while the panel is visible."""
+        ProfilerService.set_enabled(True)
+        self._refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event: QHideEvent):
+        """Stop profiling when the panel is hidden."""
+        ProfilerService.set_enabled(False)
+        self._refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """Read the pending timings and update the tree."""
+        ProfilerService.collect()
+        _profile_list = ProfilerService.get_profiles()
+        if not _profile_list:
+            return
+        _last_dict = _profile_list[-1].get_scope_dict()
+        _sum_dict = dict()
+        for _profile in _profile_list:
+            for _scope, _pass_dict in _profile.get_scope_dict().items():
+                _sums = _sum_dict.setdefault(_scope, dict())
+                for _name, _milliseconds in _pass_dict.items():
+                    _sums[_name] = _sums.get(_name, 0.) + _milliseconds
+        _count = len(_profile_list)
+        _expanded = {self.topLevelItem(_index).text(0)
+                     for _index in range(self.topLevelItemCount())
+                     if self.topLevelItem(_index).isExpanded()}
+        self.clear()
+        for _scope, _pass_dict in _last_dict.items():
+            _average_dict = _sum_dict.get(_scope, dict())
+            _scope_item = QTreeWidgetItem(
+                [_scope, self._format(sum(_pass_dict.values())),
+                 self._format(sum(_average_dict.values()) / _count)])
+            for _name, _milliseconds in _pass_dict.items():
+                _scope_item.addChild(QTreeWidgetItem(
+                    [_name, self._format(_milliseconds),
+                     self._format(_average_dict.get(_name, 0.) / _count)]))
+            self.addTopLevelItem(_scope_item)
+            _scope_item.setExpanded(_scope in _expanded)
+
+    @staticmethod
+    def _format(milliseconds: float) -> str:
+        """Format a duration for the tree."""
+        return f"{milliseconds:.3f}"
@@ -3,9 +3,13 @@ The OpenGL widget within a ViewerPane.
 
 The GLViewer inherits from QOpenGLWidget and provides
 an OpenGL context for displaying renders and media.
+When zoomed in, only the visible part of the frame is rendered, with
+a margin, and the frame is rendered again when panning or zooming
+uncovers pixels that weren't rendered.
 """
 
 import time
+from typing import Optional
 
 import numpy as np
 import moderngl
@@ -16,6 +20,8 @@ from PySide6.QtCore import Qt, QPointF
 
 from utils.config import Config
 from utils.image import Image
+from core.services.memory_service import MemoryService, MemoryCategory
+from core.services.region_service import RegionService
 from gui.services.sequence_gui_service import SequenceGUIService
 
 
@@ -35,6 +41,9 @@ class GLViewer(QOpenGLWidget):
     _mouse_middle_dragging: bool
     _mouse_last_position: QPointF
     _checkerboard: bool
+    _solo: bool
+    _edited_layer: Optional[int]
+    _rendered_region: Optional[tuple[int, int, int, int]]
 
     def __init__(self, parent: QWidget, sequence_id: int):
         super().__init__(parent)
@@ -48,7 +57,10 @@ class GLViewer(QOpenGLWidget):
         self._mouse_middle_dragging = False
         self._mouse_last_position = None
         self._checkerboard = False
+        self._solo = False
+        self._edited_layer = None
         self._texture = None
+        self._rendered_region = None
         self.setFocusPolicy(Qt.WheelFocus)
         self.update_texture()
     
@@ -56,6 +68,7 @@ class GLViewer(QOpenGLWidget):
         """Set the current frame value."""
         if frame != self._current_frame:
             self._current_frame = frame
+            self._edited_layer = None
             self.update_texture()
 
     def toggle_checkerboard(self, state: bool):
@@ -63,11 +76,40 @@ class GLViewer(QOpenGLWidget):
         self._checkerboard = state
         self.update()
 
+    def toggle_solo(self, state: bool):
+        """Toggle rendering only the selected layers."""
+        self._solo = state
+        self.update_texture()
+
+    def update_selected_layers(self):
+        """Render the frame again if only selected layers are shown."""
+        self._edited_layer = None
+        if self._solo:
+            self.update_texture()
+
+    def set_edited_layer(self, layer_id: Optional[int]):
+        """Cache the intermediate textures of a layer being edited.
+
+        Editing stops when the frame or the selected layers change.
+        """
+        self._edited_layer = layer_id
+
+    def get_solo_layers(self) -> Optional[list[int]]:
+        """Return the layers to render in solo mode, None for all."""
+        if not self._solo:
+            return None
+        _selected_layers = SequenceGUIService.get_selected_layers(
+            self._sequence_id)
+        if not _selected_layers:
+            return None
+        return list(_selected_layers)
+
     def set_texture(self, texture: moderngl.Texture):
         """Set the displayed texture."""
         if self._texture is not None:
-            self._texture.release()
+            MemoryService.release_texture(self._texture)
         self._texture = texture
+        MemoryService.set_category(self._texture, MemoryCategory.VIEWER)
         self._texture.repeat_x = False
         self._texture.repeat_y = False
         self._texture.build_mipmaps()
@@ -79,6 +121,7 @@ class GLViewer(QOpenGLWidget):
         _gl_context.viewport = (0, 0, width, height)
         if self._fitting_zoom:
             self.fit_to_frame(self._fitting_zoom_max, False)
+        self.update_region()
 
     def initializeGL(self):
         """Setup OpenGL, program and geometry."""
@@ -203,12 +246,14 @@ class GLViewer(QOpenGLWidget):
         self._fitting_zoom = not just_once
         self._fitting_zoom_max = max_zoom
         if update:
+            self.update_region()
             self.update()
 	
     def choose_zoom(self, zoom: float):
         """Choose a specific zoom value."""
         self.set_zoom(zoom)
         self._fitting_zoom = False
+        self.update_region()
         self.update()
 
     def widget_to_texture_coords(self,
@@ -255,6 +300,7 @@ class GLViewer(QOpenGLWidget):
             self._center_y = _img_y/_tex_height - (
                 _img_y/_tex_height - self._center_y)/_factor
         self._fitting_zoom = False
+        self.update_region()
         self.update()
     
     def mousePressEvent(self, event: QMouseEvent):
@@ -286,11 +332,47 @@ class GLViewer(QOpenGLWidget):
         _tex_height = self._texture.height
         self._center_x -= delta.x() / self._zoom / _tex_width
         self._center_y -= delta.y() / self._zoom / _tex_height
+        self.update_region()
         self.update()
 
+    def get_visible_region(self,
+                           margin: float = 0.
+                           ) -> Optional[tuple[int, int, int, int]]:
+        """Return the region of the frame visible in the widget.
+
+        The region is grown on each side by a margin, as a fraction of
+        its size. None is returned when the whole frame is visible.
+        """
+        if self._texture is None or not Config.viewer.region_rendering:
+            return None
+        _tex_width = self._texture.width
+        _tex_height = self._texture.height
+        _left, _top = self.widget_to_texture_coords(0, 0)
+        _right, _bottom = self.widget_to_texture_coords(
+            self.width()*self.devicePixelRatioF(),
+            self.height()*self.devicePixelRatioF())
+        _margin_x = (_right - _left) * margin
+        _margin_y = (_bottom - _top) * margin
+        _x = max(int(np.floor(_left - _margin_x)), 0)
+        _y = max(int(np.floor(_top - _margin_y)), 0)
+        _width = min(int(np.ceil(_right + _margin_x)), _tex_width) - _x
+        _height = min(int(np.ceil(_bottom + _margin_y)), _tex_height) - _y
+        if (_x, _y, _width, _height) == (0, 0, _tex_width, _tex_height):
+            return None
+        return _x, _y, max(_width, 0), max(_height, 0)
+
+    def update_region(self):
+        """Render the frame again if the view shows unrendered pixels."""
+        if not RegionService.contains_region(self._rendered_region,
+                                             self.get_visible_region()):
+            self.update_texture()
+
     def update_texture(self):
         """Update the displayed texture."""
+        _region = self.get_visible_region(Config.viewer.region_margin)
         self.set_texture(
             SequenceGUIService.request_texture_from_sequence(
-                self._sequence_id, self._current_frame))
+                self._sequence_id, self._current_frame, _region,
+                self.get_solo_layers(), self._edited_layer))
+        self._rendered_region = _region
         self.update()
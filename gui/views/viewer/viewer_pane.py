@@ -29,8 +29,12 @@ class ViewerPane(QTabWidget):
         SequenceGUIService.open_sequence_signal.connect(self.open_sequence)
         SequenceGUIService.close_sequence_signal.connect(self.close_sequence)
         SequenceGUIService.update_sequence_signal.connect(self.update_sequence)
+        SequenceGUIService.update_selected_layers_signal.connect(
+            self.update_selected_layers)
         ModifierGUIService.update_modifiers_signal.connect(self.redraw_layer)
         ModifierGUIService.update_parameter_signal.connect(self.redraw_layer)
+        ModifierGUIService.reload_modifiers_signal.connect(
+            self.redraw_current_tab)
         SequenceGUIService.offset_current_frame_signal.connect(
             self.offset_current_frame)
         SequenceGUIService.set_current_frame_signal.connect(
@@ -60,6 +64,14 @@ class ViewerPane(QTabWidget):
         _tab = self.widget(_tab_id)
         _tab.update_sequence()
     
+    def update_selected_layers(self, sequence_id: int):
+        """Handle changing which layers are selected in a sequence."""
+        if sequence_id not in self._tabs:
+            return
+        _tab_id = self._tabs.index(sequence_id)
+        _tab = self.widget(_tab_id)
+        _tab.update_selected_layers()
+
     def redraw_layer(self, sequence_id: int, layer_id: int):
         """Redraw a layer within a sequence."""
         if sequence_id not in self._tabs:
@@ -68,6 +80,12 @@ class ViewerPane(QTabWidget):
         _tab = self.widget(_tab_id)
         _tab.redraw_layer(layer_id)
     
+    def redraw_current_tab(self, name_id_list: list[str]):
+        """Render the current frame of the current tab again."""
+        _tab = self.currentWidget()
+        if _tab is not None:
+            _tab.update_sequence()
+
     def offset_current_frame(self, sequence_id: int, offset: int):
         """Offset the current frame in the tab corresponding to a sequence."""
         if sequence_id not in self._tabs:
@@ -99,6 +99,13 @@ class ViewerTab(QFrame):
         _tool_bar.addWidget(_alpha_checkbox)
         _alpha_checkbox.setCheckState(Qt.CheckState.Checked)
 
+        # Solo checkbox, rendering only the selected layers:
+        _solo_checkbox = QCheckBox("Solo")
+        _solo_checkbox.setCursor(Qt.PointingHandCursor)
+        _solo_checkbox.setToolTip("Render only the selected layers")
+        _solo_checkbox.checkStateChanged.connect(self.toggle_solo)
+        _tool_bar.addWidget(_solo_checkbox)
+
         _tool_bar.setOrientation(Qt.Horizontal)
         return _tool_bar
     
@@ -144,6 +151,14 @@ class ViewerTab(QFrame):
         """Manage transparency checkbox toggle."""
         self._gl_viewer.toggle_checkerboard(state is Qt.CheckState.Checked)
     
+    def toggle_solo(self, state: Qt.CheckState):
+        """Manage solo checkbox toggle."""
+        self._gl_viewer.toggle_solo(state is Qt.CheckState.Checked)
+
+    def update_selected_layers(self):
+        """Handle changing which layers are selected."""
+        self._gl_viewer.update_selected_layers()
+
     def update_sequence(self):
         """Handle updates in the sequence."""
         self._gl_viewer.update_texture()
@@ -151,6 +166,7 @@ class ViewerTab(QFrame):
     def redraw_layer(self, layer_id: int):
         """Handle redrawing a layer."""
         # TODO : make this more efficient by redrawing only the needed layer
+        self._gl_viewer.set_edited_layer(layer_id)
         self._gl_viewer.update_texture()
 
     def keyPressEvent(self, event: QKeyEvent):
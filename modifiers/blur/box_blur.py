@@ -1,5 +1,7 @@
 """Apply a fast box blur."""
 
+from utils.box_filter import BoxFilter
+
 _name_id = "box_blur"
 _title = "Box blur"
 _parameters = [
@@ -27,74 +29,47 @@ _parameters = [
     }
 ]
 
-def _apply(_render_context, horizontal_radius, vertical_radius, iterations):
-    gl_context = _render_context.get_gl_context()
-    width = _render_context.get_width()
-    height = _render_context.get_height()
-
-    glsl_code = """
-    #version 430
-
-    layout (local_size_x = 64) in;
-    layout (rgba32f, binding = 0) uniform readonly image2D img_input;
-    layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
-
-    uniform int radius;
-    uniform bool horizontal;
-
-    void main() {
-        int j = int(gl_GlobalInvocationID.x);
-        ivec2 dimensions = ivec2(imageSize(img_output).xy);
-        int length = horizontal ? dimensions.x : dimensions.y;
-        if(j >= (horizontal ? dimensions.y : dimensions.x)){return;}
 
-        vec4 color = vec4(0.);
-        float kernel_size = float(2*radius + 1);
+def _padding(horizontal_radius, vertical_radius, iterations):
+    return [horizontal_radius*iterations, vertical_radius*iterations]
 
-        for(int i=0; i<=min(radius, length-1); i+=1){
-            ivec2 xy = horizontal ? ivec2(i, j) : ivec2(j, i);
-            color += imageLoad(img_input, xy);
-        }
 
-        for(int i=0; i<length; i+=1){
-            ivec2 xy = horizontal ? ivec2(i, j) : ivec2(j, i);
-            imageStore(img_output, xy, color/kernel_size);
-            if(i-radius >= 0){
-                ivec2 coords = horizontal ? ivec2(i-radius, j)
-                                          : ivec2(j, i-radius);
-                color -= imageLoad(img_input, coords);
-            }
-            if(i+radius+1 < length){
-                ivec2 coords = horizontal ? ivec2(i+radius+1, j)
-                                          : ivec2(j, i+radius+1);
-                color += imageLoad(img_input, coords);
-            }
-        }
-    }
-    """
-
-    compute_shader = gl_context.compute_shader(glsl_code)
+def _apply(_render_context, horizontal_radius, vertical_radius, iterations):
+    width = _render_context.get_width()
+    height = _render_context.get_height()
+    # Blur the region to write, grown by the padding. Pixels near the
+    # edges of the grown region are off, but not within the region.
+    x, y, region_width, region_height = _render_context.get_region()
+    padding_x, padding_y = _padding(horizontal_radius, vertical_radius,
+                                    iterations)
+    start = (max(x - padding_x, 0), max(y - padding_y, 0))
+    size = (min(x + region_width + padding_x, width) - start[0],
+            min(y + region_height + padding_y, height) - start[1])
 
     if horizontal_radius == 0 and vertical_radius == 0:
         _render_context.pass_through()
         return
 
+    # Each pass writes the prefix sums of every line, then averages
+    # each window from two of them, whatever the radius.
+    pass_list = [(radius, horizontal) for _ in range(iterations)
+                 for radius, horizontal in [(horizontal_radius, True),
+                                            (vertical_radius, False)]
+                 if radius > 0]
+    BoxFilter.run_passes(_render_context, pass_list, start, size)
+
+
+def _apply_numpy(_src, _rows, _frame, horizontal_radius, vertical_radius,
+                 iterations):
+    height = _src.shape[0]
+    # Each vertical pass reads rows up to vertical_radius away.
+    margin = iterations*vertical_radius
+    start = max(_rows.start - margin, 0)
+    stop = min(_rows.stop + margin, height)
+    band = _src[start:stop]
     for i in range(iterations):
-        
         if horizontal_radius > 0:
-            if i > 0:
-                _render_context.roll_textures()
-            compute_shader["radius"] = horizontal_radius
-            compute_shader["horizontal"] = True
-            _render_context.get_src_texture().bind_to_image(0, read=True, write=False)
-            _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
-            compute_shader.run(height//64+1, 1, 1)
-
+            band = BoxFilter.filter_array(band, horizontal_radius, 1)
         if vertical_radius > 0:
-            if horizontal_radius > 0:
-                _render_context.roll_textures()
-            compute_shader["radius"] = vertical_radius
-            compute_shader["horizontal"] = False
-            _render_context.get_src_texture().bind_to_image(0, read=True, write=False)
-            _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
-            compute_shader.run(width//64+1, 1, 1)
\ No newline at end of file
+            band = BoxFilter.filter_array(band, vertical_radius, 0)
+    return band[_rows.start - start:_rows.stop - start].copy()
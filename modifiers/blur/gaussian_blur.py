@@ -0,0 +1,381 @@
+"""Apply a Gaussian blur, choosing the algorithm from sigma."""
+
+import math
+
+import numpy as np
+
+from utils.box_filter import BoxFilter
+
+_name_id = "gaussian_blur"
+_title = "Gaussian blur"
+_parameters = [
+    {
+        "name_id": "sigma",
+        "title": "Sigma",
+        "data_type": "number",
+        "default_value": 2,
+        "min_value": 0
+    }
+]
+
+# Small blurs convolve a kernel, medium ones run three box passes, and
+# large ones blur a downsampled image before scaling it back up. The
+# downsampled image is blurred with a sigma of up to twice the largest
+# one of the kernel path. Passes treat pixels outside the layer as 0,
+# so near its edges, within the padding, the algorithms darken by
+# different amounts and only agree with each other inside.
+KERNEL_SIGMA_MAX = 4
+BOX_SIGMA_MAX = 16
+KERNEL_RADIUS_MAX = 3*2*KERNEL_SIGMA_MAX
+BOX_COUNT = 3
+
+
+def _kernel_radius(sigma):
+    return math.ceil(3*sigma)
+
+
+def _box_radii(sigma):
+    # Box widths whose successive passes match the variance of sigma.
+    ideal_width = math.sqrt(12*sigma*sigma/BOX_COUNT + 1)
+    lower_width = math.floor(ideal_width)
+    if lower_width % 2 == 0:
+        lower_width -= 1
+    lower_count = round((12*sigma*sigma - BOX_COUNT*lower_width**2
+                         - 4*BOX_COUNT*lower_width - 3*BOX_COUNT)
+                        / (-4*lower_width - 4))
+    return [(lower_width - 1)//2 if i < lower_count else (lower_width + 1)//2
+            for i in range(BOX_COUNT)]
+
+
+def _pyramid_plan(sigma):
+    # Downsampling by a factor, then scaling back up bilinearly, blurs
+    # with a variance of about factor**2/4, which the kernel completes.
+    levels = max(1, math.floor(math.log2(sigma/KERNEL_SIGMA_MAX)))
+    factor = 2**levels
+    low_sigma = math.sqrt(max(sigma*sigma - factor*factor/4, 0))/factor
+    return levels, factor, low_sigma
+
+
+def _padding(sigma):
+    if sigma <= KERNEL_SIGMA_MAX:
+        reach = _kernel_radius(sigma)
+    elif sigma <= BOX_SIGMA_MAX:
+        reach = sum(_box_radii(sigma))
+    else:
+        levels, factor, low_sigma = _pyramid_plan(sigma)
+        reach = (_kernel_radius(low_sigma) + 2)*factor
+    return [reach, reach]
+
+
+_kernel_glsl = """
+#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+
+uniform int radius;
+uniform float weights[RADIUS_MAX + 1];
+uniform ivec2 region_start;
+uniform ivec2 region_size;
+
+// Pixels of the workgroup along the pass, plus the kernel on each side.
+shared vec4 tile[16][16 + 2*RADIUS_MAX];
+
+ivec2 coords(int along, int across){
+    return HORIZONTAL ? ivec2(along, across) : ivec2(across, along);
+}
+
+// Convolve a line with a symmetric kernel, read from shared memory.
+void main() {
+    ivec2 local = ivec2(gl_LocalInvocationID.xy);
+    ivec2 group = ivec2(gl_WorkGroupID.xy)*16;
+    // Adjacent invocations read adjacent pixels in both directions.
+    int a = HORIZONTAL ? local.x : local.y;
+    int c = HORIZONTAL ? local.y : local.x;
+    int group_along = HORIZONTAL ? group.x : group.y;
+    int across = (HORIZONTAL ? group.y : group.x) + c;
+    int length = HORIZONTAL ? region_size.x : region_size.y;
+    int line_count = HORIZONTAL ? region_size.y : region_size.x;
+
+    for(int i=a; i<16 + 2*radius; i+=16){
+        int along = group_along - radius + i;
+        tile[c][i] = along >= 0 && along < length && across < line_count
+            ? imageLoad(img_input, region_start + coords(along, across))
+            : vec4(0.);
+    }
+    barrier();
+
+    int along = group_along + a;
+    if(along >= length || across >= line_count){return;}
+    vec4 color = tile[c][a + radius]*weights[0];
+    for(int k=1; k<=radius; k+=1){
+        color += (tile[c][a + radius - k] + tile[c][a + radius + k])
+                 *weights[k];
+    }
+    imageStore(img_output, region_start + coords(along, across), color);
+}
+"""
+
+
+def _kernel_code(horizontal):
+    definitions = (f"#define HORIZONTAL {str(horizontal).lower()}\n"
+                   f"#define RADIUS_MAX {KERNEL_RADIUS_MAX}\n")
+    return _kernel_glsl.replace("#version 430\n",
+                                "#version 430\n" + definitions, 1)
+
+
+def _kernel_weights(sigma):
+    radius = _kernel_radius(sigma)
+    weights = np.exp(-.5*(np.arange(radius + 1)/sigma)**2)
+    weights /= weights[0] + 2*weights[1:].sum()
+    padded_weights = np.zeros(KERNEL_RADIUS_MAX + 1, dtype=np.float32)
+    padded_weights[:radius + 1] = weights
+    return padded_weights
+
+
+_downsample_glsl = """
+#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+
+uniform ivec2 input_start;
+uniform ivec2 input_size;
+uniform ivec2 output_size;
+
+// Average blocks of 2x2 pixels, outside pixels counting as 0.
+void main() {
+    ivec2 xy = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(xy, output_size))){return;}
+    vec4 color = vec4(0.);
+    for(int i=0; i<4; i+=1){
+        ivec2 coords = 2*xy + ivec2(i%2, i/2);
+        if(all(lessThan(coords, input_size))){
+            color += imageLoad(img_input, input_start + coords);
+        }
+    }
+    imageStore(img_output, xy, color/4.);
+}
+"""
+
+_upsample_glsl = """
+#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+
+uniform int factor;
+uniform ivec2 input_size;
+uniform ivec2 region_start;
+uniform ivec2 region_size;
+
+vec4 load(ivec2 coords){
+    if(any(lessThan(coords, ivec2(0)))
+       || any(greaterThanEqual(coords, input_size))){
+        return vec4(0.);
+    }
+    return imageLoad(img_input, coords);
+}
+
+// Scale the downsampled image back up with bilinear filtering.
+void main() {
+    ivec2 xy = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(xy, region_size))){return;}
+    vec2 position = (vec2(xy) + .5)/float(factor) - .5;
+    ivec2 corner = ivec2(floor(position));
+    vec2 t = position - vec2(corner);
+    vec4 color = mix(mix(load(corner), load(corner + ivec2(1, 0)), t.x),
+                     mix(load(corner + ivec2(0, 1)),
+                         load(corner + ivec2(1, 1)), t.x),
+                     t.y);
+    imageStore(img_output, region_start + xy, color);
+}
+"""
+
+
+def _groups(size):
+    return (size[0] + 15)//16, (size[1] + 15)//16, 1
+
+
+def _apply(_render_context, sigma):
+    width = _render_context.get_width()
+    height = _render_context.get_height()
+    # Blur the region to write, grown by the padding. Pixels near the
+    # edges of the grown region are off, but not within the region.
+    x, y, region_width, region_height = _render_context.get_region()
+    padding_x, padding_y = _padding(sigma)
+    start = (max(x - padding_x, 0), max(y - padding_y, 0))
+    size = (min(x + region_width + padding_x, width) - start[0],
+            min(y + region_height + padding_y, height) - start[1])
+
+    if _kernel_radius(sigma) == 0:
+        _render_context.pass_through()
+        return
+    if sigma <= KERNEL_SIGMA_MAX:
+        _run_kernel(_render_context, sigma, start, size)
+    elif sigma <= BOX_SIGMA_MAX:
+        _run_boxes(_render_context, sigma, start, size)
+    else:
+        _run_pyramid(_render_context, sigma, start, size)
+
+
+def _kernel_pass(_render_context, sigma, horizontal, start, size,
+                 src_texture, dest_texture):
+    shader = _render_context.compute_shader_once(_kernel_code(horizontal))
+    shader["radius"] = _kernel_radius(sigma)
+    shader["weights"].write(_kernel_weights(sigma).tobytes())
+    shader["region_start"] = start
+    shader["region_size"] = size
+    src_texture.bind_to_image(0, read=True, write=False)
+    dest_texture.bind_to_image(1, read=False, write=True)
+    shader.run(*_groups(size))
+    _render_context.get_gl_context().memory_barrier()
+
+
+def _run_kernel(_render_context, sigma, start, size):
+    for horizontal, (src_texture, dest_texture) in zip(
+            (True, False), _render_context.ping_pong(2)):
+        _kernel_pass(_render_context, sigma, horizontal, start, size,
+                     src_texture, dest_texture)
+
+
+def _run_boxes(_render_context, sigma, start, size):
+    # Each box pass writes the prefix sums of every line, then
+    # averages each window from two of them, whatever the radius.
+    pass_list = [(radius, horizontal) for radius in _box_radii(sigma)
+                 for horizontal in (True, False) if radius > 0]
+    BoxFilter.run_passes(_render_context, pass_list, start, size)
+
+
+def _run_pyramid(_render_context, sigma, start, size):
+    levels, factor, low_sigma = _pyramid_plan(sigma)
+    # Align the downsampled pixels on the layer rather than on the
+    # region, so that the result doesn't depend on the region.
+    end = (min(-(-(start[0] + size[0])//factor)*factor,
+               _render_context.get_width()),
+           min(-(-(start[1] + size[1])//factor)*factor,
+               _render_context.get_height()))
+    start = (start[0]//factor*factor, start[1]//factor*factor)
+    size = (end[0] - start[0], end[1] - start[1])
+    gl_context = _render_context.get_gl_context()
+    downsample_shader = _render_context.compute_shader_once(
+        _downsample_glsl)
+    level_size = size
+    level_texture = _render_context.get_src_texture()
+    level_start = start
+    # Scratch textures are sized from the layer rather than from the
+    # region, so that the same ones are reused whatever the region.
+    texture_size = (_render_context.get_width(),
+                    _render_context.get_height())
+    for level in range(levels):
+        input_size = level_size
+        level_size = ((level_size[0] + 1)//2, (level_size[1] + 1)//2)
+        texture_size = ((texture_size[0] + 1)//2, (texture_size[1] + 1)//2)
+        texture = _render_context.get_scratch_textures(1, texture_size)[0]
+        downsample_shader["input_start"] = level_start
+        downsample_shader["input_size"] = input_size
+        downsample_shader["output_size"] = level_size
+        level_texture.bind_to_image(0, read=True, write=False)
+        texture.bind_to_image(1, read=False, write=True)
+        downsample_shader.run(*_groups(level_size))
+        gl_context.memory_barrier()
+        level_texture = texture
+        level_start = (0, 0)
+
+    if _kernel_radius(low_sigma) > 0:
+        blurred_texture = _render_context.get_scratch_textures(
+            1, texture_size)[0]
+        _kernel_pass(_render_context, low_sigma, True, (0, 0), level_size,
+                     level_texture, blurred_texture)
+        _kernel_pass(_render_context, low_sigma, False, (0, 0), level_size,
+                     blurred_texture, level_texture)
+
+    upsample_shader = _render_context.compute_shader_once(_upsample_glsl)
+    upsample_shader["factor"] = factor
+    upsample_shader["input_size"] = level_size
+    upsample_shader["region_start"] = start
+    upsample_shader["region_size"] = size
+    level_texture.bind_to_image(0, read=True, write=False)
+    _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
+    upsample_shader.run(*_groups(size))
+    gl_context.memory_barrier()
+
+
+def _kernel_filter(image, sigma, axis):
+    # Sum shifted copies of the image, treating outside pixels as 0.
+    radius = _kernel_radius(sigma)
+    weights = _kernel_weights(sigma)
+    length = image.shape[axis]
+    padding = [(0, 0)]*image.ndim
+    padding[axis] = (radius, radius)
+    padded = np.pad(image, padding)
+    result = image*weights[0]
+    for k in range(1, radius + 1):
+        lower = np.arange(radius - k, radius - k + length)
+        upper = np.arange(radius + k, radius + k + length)
+        result += (np.take(padded, lower, axis=axis)
+                   + np.take(padded, upper, axis=axis))*weights[k]
+    return result
+
+
+def _downsample_filter(image):
+    # Average blocks of 2x2 pixels, treating outside pixels as 0.
+    padded = np.pad(image, [(0, image.shape[0] % 2), (0, image.shape[1] % 2),
+                            (0, 0)])
+    return (padded[0::2, 0::2] + padded[0::2, 1::2]
+            + padded[1::2, 0::2] + padded[1::2, 1::2])/4
+
+
+def _upsample_filter(image, factor, length, axis):
+    # Scale an axis back up linearly, treating outside pixels as 0.
+    position = (np.arange(length) + .5)/factor - .5
+    corner = np.floor(position).astype(int)
+    shape = [1]*image.ndim
+    shape[axis] = length
+    t = (position - corner).astype(np.float32).reshape(shape)
+    padding = [(0, 0)]*image.ndim
+    padding[axis] = (1, 1)
+    padded = np.pad(image, padding)
+    return (np.take(padded, corner + 1, axis=axis)*(1 - t)
+            + np.take(padded, corner + 2, axis=axis)*t)
+
+
+def _pyramid_filter(image, sigma):
+    levels, factor, low_sigma = _pyramid_plan(sigma)
+    low = image
+    for level in range(levels):
+        low = _downsample_filter(low)
+    if _kernel_radius(low_sigma) > 0:
+        low = _kernel_filter(_kernel_filter(low, low_sigma, 1),
+                             low_sigma, 0)
+    low = _upsample_filter(low, factor, image.shape[1], 1)
+    return _upsample_filter(low, factor, image.shape[0], 0)
+
+
+def _apply_numpy(_src, _rows, _frame, sigma):
+    # Every sigma runs the same algorithm as on the GPU, so that both
+    # also match near the edges of the layer.
+    height = _src.shape[0]
+    if _kernel_radius(sigma) == 0:
+        return _src[_rows].copy()
+    margin = _padding(sigma)[1]
+    start = max(_rows.start - margin, 0)
+    stop = min(_rows.stop + margin, height)
+    if sigma > BOX_SIGMA_MAX:
+        # Align the downsampled pixels on the layer, as on the GPU.
+        factor = _pyramid_plan(sigma)[1]
+        start = start//factor*factor
+        stop = min(-(-stop//factor)*factor, height)
+    band = _src[start:stop]
+    if sigma <= KERNEL_SIGMA_MAX:
+        band = _kernel_filter(_kernel_filter(band, sigma, 1), sigma, 0)
+    elif sigma <= BOX_SIGMA_MAX:
+        for radius in _box_radii(sigma):
+            band = BoxFilter.filter_array(
+                BoxFilter.filter_array(band, radius, 1), radius, 0)
+    else:
+        band = _pyramid_filter(band, sigma)
+    return band[_rows.start - start:_rows.stop - start].astype(np.float32)
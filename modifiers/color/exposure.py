@@ -1,7 +1,10 @@
 """Adjust the exposure and gamma."""
 
+import numpy as np
+
 _name_id = "exposure"
 _title = "Exposure"
+_flags = ["straight_alpha"]
 _parameters = [
     {
         "name_id": "exposure",
@@ -25,42 +28,25 @@ _parameters = [
     }
 ]
 
-def _apply(_render_context, exposure, offset, gamma):
-    gl_context = _render_context.get_gl_context()
-    width = _render_context.get_width()
-    height = _render_context.get_height()
-
-    glsl_code = """
-    #version 430
-
-    layout (local_size_x = 16, local_size_y = 16) in;
-    layout (rgba32f, binding = 0) uniform readonly image2D img_input;
-    layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
-
-    uniform float exposure;
-    uniform float offset;
-    uniform float gamma;
+_pointwise = """
+uniform float exposure;
+uniform float offset;
+uniform float gamma;
 
-    void main() {
-        ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
-        ivec2 dimensions = imageSize(img_output).xy;
-        if(any(greaterThanEqual(coords, dimensions))){return;}
-        vec4 color = imageLoad(img_input, coords);
-
-        if(gamma > 0.){
-            color.rgb = pow(exposure*color.rgb + offset, vec3(1./gamma));
-            color.rgb = max(color.rgb, 0.);
-        }
-
-        imageStore(img_output, coords, color);
+vec4 pointwise(vec4 color, ivec2 coords) {
+    if(gamma > 0.){
+        color.rgb = pow(exposure*color.rgb + offset, vec3(1./gamma));
+        color.rgb = max(color.rgb, 0.);
     }
-    """
-
-    compute_shader = gl_context.compute_shader(glsl_code)
-    compute_shader["exposure"] = exposure
-    compute_shader["offset"] = offset
-    compute_shader["gamma"] = gamma
-
-    _render_context.get_src_texture().bind_to_image(0, read=True, write=False)
-    _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
-    compute_shader.run(width//16+1, height//16+1, 1)
+    return color;
+}
+"""
+
+
+def _apply_numpy(_src, _rows, _frame, exposure, offset, gamma):
+    color = _src[_rows].copy()
+    if gamma > 0.:
+        # Negative bases are clamped, as GPUs do with the NaN of pow.
+        color[..., :3] = np.power(
+            np.maximum(exposure*color[..., :3] + offset, 0.), 1./gamma)
+    return color
@@ -1,5 +1,8 @@
+import numpy as np
+
 _name_id = "black_hole"
 _title = "Black hole"
+_flags = ["expensive", "straight_alpha"]
 _parameters = [
     {
         "name_id": "tilt",
@@ -24,172 +27,487 @@ _parameters = [
         "title": "Outer radius",
         "data_type": "number",
         "default_value": 15
+    },
+    {
+        "name_id": "step_size",
+        "title": "Step size",
+        "data_type": "number",
+        "default_value": .1,
+        "min_value": .001
+    },
+    {
+        "name_id": "max_steps",
+        "title": "Max steps",
+        "data_type": "integer",
+        "default_value": 500,
+        "min_value": 1
+    },
+    {
+        "name_id": "adaptive",
+        "title": "Adaptive steps",
+        "data_type": "boolean",
+        "default_value": True
     }
 ]
 
-def _apply(_render_context, tilt, spin, disc_min, disc_max):
-    gl_context = _render_context.get_gl_context()
-    width = _render_context.get_width()
-    height = _render_context.get_height()
+# Light rays bend around the black hole, so any source pixel can be read.
+_padding = "unbounded"
 
-    glsl_code = """
-    #version 430
+# Where each ray lands only depends on the pixel, the camera and the
+# black hole, never on the disc image. It is traced once into a table
+# for each combination of them, and the tables of the last few ones
+# are kept, so that animating the disc, or looping an animated tilt
+# or spin, only looks up the table.
+LUT_CAPACITY = 8
+LUT_HIT = 1.
+LUT_CAPTURED = -1.
 
-    layout (local_size_x = 16, local_size_y = 16) in;
-    layout (rgba32f, binding = 0) uniform readonly image2D img_input;
-    layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+_trace_glsl = """
+#version 430
 
-    uniform float tilt;
-    uniform float a;
-    uniform float disc_min;
-    uniform float disc_max;
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform writeonly image2D img_lut;
 
-    #define PI 3.1415926538
+uniform float tilt;
+uniform float a;
+uniform float disc_min;
+uniform float disc_max;
+uniform float step_size;
+uniform int max_steps;
+uniform bool adaptive;
 
-    float camR = 30.;     // camera distance
-    float zoom = 1.5;     // camera zoom
+#define PI 3.1415926538
 
-    float eps = .01;      // hamiltonian gradient step
-    float dtau = .1;      // affine step
-    int maxSteps = 500;   // maximum steps
+float camR = 30.;     // camera distance
+float zoom = 1.5;     // camera zoom
 
-    mat4 diag(vec4 vec){
-        return mat4(vec.x,0,0,0,
-                    0,vec.y,0,0,
-                    0,0,vec.z,0,
-                    0,0,0,vec.w);
-    }
+mat4 diag(vec4 vec){
+    return mat4(vec.x,0,0,0,
+                0,vec.y,0,0,
+                0,0,vec.z,0,
+                0,0,0,vec.w);
+}
 
-    float rFromCoords(vec4 pos){
-        vec3 p = pos.yzw;
-        float rho2 = dot(p,p)-a*a;
-        float r2 = .5*(rho2+sqrt(rho2*rho2+4.*a*a*p.z*p.z));
-        return sqrt(r2);
-    }
+float rFromCoords(vec4 pos){
+    vec3 p = pos.yzw;
+    float rho2 = dot(p,p)-a*a;
+    float r2 = .5*(rho2+sqrt(rho2*rho2+4.*a*a*p.z*p.z));
+    return sqrt(r2);
+}
 
-    mat4 metric(vec4 pos){
-        float r = rFromCoords(pos);
-        vec4 k = vec4(-1.,(r*pos.y-a*pos.z)/(r*r+a*a),(r*pos.z+a*pos.y)/(r*r+a*a),pos.a/r);
-        float f = 2.*r/(r*r+a*a*pos.a*pos.a/r/r);
-        return f*mat4(k.x*k,k.y*k,k.z*k,k.w*k)+diag(vec4(-1,1,1,1));
-    }
+mat4 metric(vec4 pos){
+    float r = rFromCoords(pos);
+    vec4 k = vec4(-1.,(r*pos.y-a*pos.z)/(r*r+a*a),(r*pos.z+a*pos.y)/(r*r+a*a),pos.a/r);
+    float f = 2.*r/(r*r+a*a*pos.a*pos.a/r/r);
+    return f*mat4(k.x*k,k.y*k,k.z*k,k.w*k)+diag(vec4(-1,1,1,1));
+}
 
-    float hamiltonian(vec4 x, vec4 p){
-        return .5*dot(inverse(metric(x))*p,p);
-    }
+// The metric is the Minkowski one plus f*k*k, with k null, so its
+// inverse is the Minkowski one minus f*k*k with k raised, and the
+// Hamiltonian .5*(-p.x*p.x+dot(p.yzw,p.yzw)-f*l*l) with l = k.p.
+vec4 velocity(vec4 x, vec4 p){
+    vec3 q = x.yzw;
+    float r = rFromCoords(x);
+    float s = r*r+a*a;
+    float f = 2.*r*r*r/(r*r*r*r+a*a*q.z*q.z);
+    vec3 k = vec3((r*q.x-a*q.y)/s,(r*q.y+a*q.x)/s,q.z/r);
+    float l = p.x+dot(k,p.yzw);
+    return vec4(-p.x-f*l,p.yzw-f*l*k);
+}
 
-    vec4 hamiltonianGradient(vec4 x, vec4 p){
-        return (vec4(hamiltonian(x+vec4(eps,0,0,0),p),
-                    hamiltonian(x+vec4(0,eps,0,0),p),
-                    hamiltonian(x+vec4(0,0,eps,0),p),
-                    hamiltonian(x+vec4(0,0,0,eps),p))-hamiltonian(x,p))/eps;
-    }
+vec4 hamiltonianGradient(vec4 x, vec4 p){
+    vec3 q = x.yzw;
+    float r = rFromCoords(x);
+    float r2 = r*r;
+    float s = r2+a*a;
+    float n = r2*r2+a*a*q.z*q.z;
+    float f = 2.*r2*r/n;
+    // r is implicitly defined by r^4-(|q|^2-a^2)*r^2-a^2*z^2 = 0.
+    vec3 dr = vec3(q.x*r,q.y*r,q.z*s/r)/(2.*r2-dot(q,q)+a*a);
+    vec3 df = (6.*r2*n-8.*r2*r2*r2)/(n*n)*dr
+              +vec3(0.,0.,-4.*r2*r*a*a*q.z/(n*n));
+    vec3 k = vec3((r*q.x-a*q.y)/s,(r*q.y+a*q.x)/s,q.z/r);
+    vec3 dkdr = vec3((q.x*s-2.*r*(r*q.x-a*q.y))/(s*s),
+                     (q.y*s-2.*r*(r*q.y+a*q.x))/(s*s),
+                     -q.z/r2);
+    float l = p.x+dot(k,p.yzw);
+    vec3 dl = dot(dkdr,p.yzw)*dr
+              +vec3((r*p.y+a*p.z)/s,(r*p.z-a*p.y)/s,p.w/r);
+    return vec4(0.,-.5*l*l*df-f*l*dl);
+}
 
-    void transportStep(inout vec4 x, inout vec4 p){
-        float r = rFromCoords(x);
-        float stepsize = dtau;
-        p -= stepsize*hamiltonianGradient(x,p);
-        x += stepsize*inverse(metric(x))*p;
+// Fixed steps keep the original semi-implicit Euler scheme. Adaptive
+// steps grow with r, from step_size at r = 2, and use Runge-Kutta 4
+// so that the longer steps far from the hole stay accurate.
+void transportStep(inout vec4 x, inout vec4 p){
+    if(!adaptive){
+        p -= step_size*hamiltonianGradient(x,p);
+        x += step_size*velocity(x,p);
+        return;
     }
+    float h = step_size*.5*rFromCoords(x);
+    vec4 x1 = velocity(x,p);
+    vec4 p1 = -hamiltonianGradient(x,p);
+    vec4 x2 = velocity(x+.5*h*x1,p+.5*h*p1);
+    vec4 p2 = -hamiltonianGradient(x+.5*h*x1,p+.5*h*p1);
+    vec4 x3 = velocity(x+.5*h*x2,p+.5*h*p2);
+    vec4 p3 = -hamiltonianGradient(x+.5*h*x2,p+.5*h*p2);
+    vec4 x4 = velocity(x+h*x3,p+h*p3);
+    vec4 p4 = -hamiltonianGradient(x+h*x3,p+h*p3);
+    x += h/6.*(x1+2.*x2+2.*x3+x4);
+    p += h/6.*(p1+2.*p2+2.*p3+p4);
+}
 
-    bool stopCondition(vec4 pos){
-        float r = rFromCoords(pos);
-        return r < 1.+sqrt(1.-a*a) || r > max(2.*camR,30.);
-    }
+bool stopCondition(vec4 pos){
+    float r = rFromCoords(pos);
+    return r < 1.+sqrt(1.-a*a) || r > max(2.*camR,30.);
+}
 
-    vec4 unit(vec4 vec, mat4 g){
-        float norm2 = dot(g*vec,vec);
-        if(norm2 != 0.){
-            return vec/sqrt(abs(norm2));
-        }else{
-            return vec;
-        }
+vec4 unit(vec4 vec, mat4 g){
+    float norm2 = dot(g*vec,vec);
+    if(norm2 != 0.){
+        return vec/sqrt(abs(norm2));
+    }else{
+        return vec;
     }
+}
 
-    mat4 tetrad(vec4 x, vec4 time, vec4 aim, vec4 vert){
-        mat4 g = metric(x);
-        vec4 E0 = unit(time, g);
-        vec4 E1 = unit(aim+dot(g*aim,E0)*E0, g);
-        vec4 E3 = unit(vert-dot(g*vert,E1)*E1+dot(g*vert,E0)*E0, g);
-        vec4 E2 = unit(inverse(g)*vec4(dot(E0.yzw,cross(E1.yzw,E3.yzw)),
-                                    -dot(E0.zwx,cross(E1.zwx,E3.zwx)),
-                                    dot(E0.wxy,cross(E1.wxy,E3.wxy)),
-                                    -dot(E0.xyz,cross(E1.xyz,E3.xyz))), g);
-        mat4 tetrad;
-        tetrad[0] = E0;
-        tetrad[1] = E1;
-        tetrad[2] = E2;
-        tetrad[3] = E3;
-        return tetrad;
-    }
+mat4 tetrad(vec4 x, vec4 time, vec4 aim, vec4 vert){
+    mat4 g = metric(x);
+    vec4 E0 = unit(time, g);
+    vec4 E1 = unit(aim+dot(g*aim,E0)*E0, g);
+    vec4 E3 = unit(vert-dot(g*vert,E1)*E1+dot(g*vert,E0)*E0, g);
+    vec4 E2 = unit(inverse(g)*vec4(dot(E0.yzw,cross(E1.yzw,E3.yzw)),
+                                -dot(E0.zwx,cross(E1.zwx,E3.zwx)),
+                                dot(E0.wxy,cross(E1.wxy,E3.wxy)),
+                                -dot(E0.xyz,cross(E1.xyz,E3.xyz))), g);
+    mat4 tetrad;
+    tetrad[0] = E0;
+    tetrad[1] = E1;
+    tetrad[2] = E2;
+    tetrad[3] = E3;
+    return tetrad;
+}
 
-    void main()
-    {
-        ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
-        ivec2 dimensions = imageSize(img_output).xy;
-        if(any(greaterThanEqual(coords, dimensions))){return;}
-        vec2 uv = (2.*vec2(coords)-vec2(dimensions))/float(dimensions.x);
-
-        float x = sqrt(camR*camR+a*a)*cos(tilt);
-        float z = camR*sin(tilt);
-        vec4 camPos = vec4(0.,x,0.,z);
-
-        vec4 time = vec4(1.,0.,0.,0.);
-        vec4 aim = vec4(0.,x,0.,z);
-        vec4 vert = vec4(0.,-x*z,0.,x*x)*sign(cos(tilt));
-        mat4 axes = tetrad(camPos, time, aim, vert);
-        
-        vec4 pos = camPos;
-        vec3 dir = normalize(vec3(-zoom,uv));
-        vec4 dir4D = -axes[0]+dir.x*axes[1]+dir.y*axes[2]+dir.z*axes[3];
-        
-        bool captured = false;
-        bool hitDisc = false;
-        vec4 intersectPos;
-        vec2 discUV;
-        float blueshift;
+void main()
+{
+    ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+    ivec2 dimensions = imageSize(img_lut).xy;
+    if(any(greaterThanEqual(coords, dimensions))){return;}
+    vec2 uv = (2.*vec2(coords)-vec2(dimensions))/float(dimensions.x);
+
+    float x = sqrt(camR*camR+a*a)*cos(tilt);
+    float z = camR*sin(tilt);
+    vec4 camPos = vec4(0.,x,0.,z);
+
+    vec4 time = vec4(1.,0.,0.,0.);
+    vec4 aim = vec4(0.,x,0.,z);
+    vec4 vert = vec4(0.,-x*z,0.,x*x)*sign(cos(tilt));
+    mat4 axes = tetrad(camPos, time, aim, vert);
+    
+    vec4 pos = camPos;
+    vec3 dir = normalize(vec3(-zoom,uv));
+    vec4 dir4D = -axes[0]+dir.x*axes[1]+dir.y*axes[2]+dir.z*axes[3];
+    
+    bool captured = false;
+    bool hitDisc = false;
+    vec4 intersectPos;
+    vec2 discUV;
+    float blueshift;
  
-        vec4 p = metric(pos)*dir4D;
-        for(int i=0; i<maxSteps; i++){
-            vec4 lastpos = pos;
-            transportStep(pos, p);
-            if(pos.a*lastpos.a < 0.){
-
-                intersectPos = (pos*abs(lastpos.a)+lastpos*abs(pos.a))/abs(lastpos.a-pos.a);
-                float r = rFromCoords(intersectPos);
-                if(r > disc_min && r < disc_max){
-                    hitDisc = true;
-                    discUV = (intersectPos.yz/disc_max+1.)*.5;
-                    vec4 discVel = vec4(r+a/sqrt(r),vec3(-intersectPos.z,intersectPos.y,0.)*sign(a)/sqrt(r))/sqrt(r*r-3.*r+2.*a*sqrt(r));
-                    blueshift = 1./dot(p,discVel);
-                    break;
-                }
-            }
+    vec4 p = metric(pos)*dir4D;
+    for(int i=0; i<max_steps; i++){
+        vec4 lastpos = pos;
+        transportStep(pos, p);
+        if(pos.a*lastpos.a < 0.){
 
-            if(stopCondition(pos)){
-                float r = rFromCoords(pos);
-                captured = r < 1.+sqrt(1.-a*a);
+            intersectPos = (pos*abs(lastpos.a)+lastpos*abs(pos.a))/abs(lastpos.a-pos.a);
+            float r = rFromCoords(intersectPos);
+            if(r > disc_min && r < disc_max){
+                hitDisc = true;
+                discUV = (intersectPos.yz/disc_max+1.)*.5;
+                vec4 discVel = vec4(r+a/sqrt(r),vec3(-intersectPos.z,intersectPos.y,0.)*sign(a)/sqrt(r))/sqrt(r*r-3.*r+2.*a*sqrt(r));
+                blueshift = 1./dot(p,discVel);
                 break;
             }
         }
 
-        dir4D = inverse(metric(pos))*p;
-        vec3 cubeVec = vec3(-dir4D.y,dir4D.a,-dir4D.z);
-        vec4 color = vec4(0);
-        if(hitDisc){
-            ivec2 discXY = ivec2(discUV*vec2(imageSize(img_input)));
-            color = imageLoad(img_input, discXY)*pow(blueshift,3.);
+        if(stopCondition(pos)){
+            float r = rFromCoords(pos);
+            captured = r < 1.+sqrt(1.-a*a);
+            break;
         }
-        imageStore(img_output, ivec2(coords), color);
     }
-    """
 
-    compute_shader = gl_context.compute_shader(glsl_code)
-    compute_shader["tilt"] = tilt
-    compute_shader["a"] = spin
-    compute_shader["disc_min"] = disc_min
-    compute_shader["disc_max"] = disc_max
+    // Disc coordinates, intensity factor and whether the disc was hit.
+    vec4 entry = vec4(0);
+    if(hitDisc){
+        entry = vec4(discUV, pow(blueshift,3.), HIT);
+    }else if(captured){
+        entry.w = CAPTURED;
+    }
+    imageStore(img_lut, coords, entry);
+}
+"""
+
+_lookup_glsl = """
+#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+layout (rgba32f, binding = 2) uniform readonly image2D img_lut;
+
+uniform ivec2 region_start;
+uniform ivec2 region_size;
+
+void main() {
+    ivec2 xy = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(xy, region_size))){return;}
+    ivec2 coords = region_start + xy;
+    vec4 entry = imageLoad(img_lut, coords);
+    vec4 color = vec4(0);
+    // Tables traced at a reduced rate interpolate between equal states.
+    if(entry.w > .5*HIT){
+        ivec2 discXY = ivec2(entry.xy*vec2(imageSize(img_input)));
+        color = imageLoad(img_input, discXY)*entry.z;
+    }
+    imageStore(img_output, coords, color);
+}
+"""
+
+
+def _lut_code(glsl_code):
+    definitions = (f"#define HIT {LUT_HIT:.1f}\n"
+                   f"#define CAPTURED {LUT_CAPTURED:.1f}\n")
+    return glsl_code.replace("#version 430\n",
+                             "#version 430\n" + definitions, 1)
+
+
+def _trace_lut(_render_context, lut_texture, tilt, spin, disc_min, disc_max,
+               step_size, max_steps, adaptive):
+    trace_shader = _render_context.compute_shader_once(
+        _lut_code(_trace_glsl), reduced_rate=True)
+    trace_shader["tilt"] = tilt
+    trace_shader["a"] = spin
+    trace_shader["disc_min"] = disc_min
+    trace_shader["disc_max"] = disc_max
+    trace_shader["step_size"] = step_size
+    trace_shader["max_steps"] = max_steps
+    trace_shader["adaptive"] = adaptive
+    # Rays are only traced near the edges of the disc and the horizon.
+    lut_texture.bind_to_image(0, read=True, write=True)
+    _render_context.run_reduced_rate(
+        trace_shader, lut_texture,
+        region=(0, 0, lut_texture.width, lut_texture.height))
+    _render_context.get_gl_context().memory_barrier()
+
+
+def _apply(_render_context, tilt, spin, disc_min, disc_max, step_size,
+           max_steps, adaptive):
+    src_texture = _render_context.get_src_texture()
+    dest_texture = _render_context.get_dest_texture()
+    ray_parameters = (tilt, spin, disc_min, disc_max, step_size, max_steps,
+                      adaptive)
+    lut_texture = _render_context.cached_texture(
+        (ray_parameters, _render_context.get_reduced_rate()),
+        lambda texture: _trace_lut(_render_context, texture,
+                                   *ray_parameters),
+        LUT_CAPACITY)
+    lookup_shader = _render_context.compute_shader_once(
+        _lut_code(_lookup_glsl))
+    x, y, width, height = _render_context.get_region()
+    lookup_shader["region_start"] = (x, y)
+    lookup_shader["region_size"] = (width, height)
+    src_texture.bind_to_image(0, read=True, write=False)
+    dest_texture.bind_to_image(1, read=False, write=True)
+    lut_texture.bind_to_image(2, read=True, write=False)
+    lookup_shader.run((width + 15)//16, (height + 15)//16, 1)
+
+
+CAMERA_DISTANCE = 30.
+CAMERA_ZOOM = 1.5
+MINKOWSKI = np.diag([-1., 1., 1., 1.])
+
+
+def _r_from_coords(pos, a):
+    p = pos[..., 1:]
+    rho2 = np.sum(p*p, axis=-1) - a*a
+    r2 = .5*(rho2 + np.sqrt(rho2*rho2 + 4.*a*a*p[..., 2]*p[..., 2]))
+    return np.sqrt(r2)
+
+
+def _metric(pos, a):
+    r = _r_from_coords(pos, a)
+    x, y, z = pos[..., 1], pos[..., 2], pos[..., 3]
+    k = np.stack([-np.ones_like(r),
+                  (r*x - a*y)/(r*r + a*a),
+                  (r*y + a*x)/(r*r + a*a),
+                  z/r], axis=-1)
+    f = 2.*r/(r*r + a*a*z*z/r/r)
+    return f[..., None, None]*k[..., :, None]*k[..., None, :] + MINKOWSKI
+
+
+def _kerr_schild(pos, a):
+    # The metric is the Minkowski one plus f*k*k, k being null.
+    r = _r_from_coords(pos, a)
+    x, y, z = pos[:, 1], pos[:, 2], pos[:, 3]
+    s = r*r + a*a
+    f = 2.*r**3/(r**4 + a*a*z*z)
+    k = np.stack([(r*x - a*y)/s, (r*y + a*x)/s, z/r], axis=-1)
+    return r, f, k
+
+
+def _velocity(pos, p, a):
+    # The inverse metric is the Minkowski one minus f*k*k, k raised.
+    r, f, k = _kerr_schild(pos, a)
+    fl = f*(p[:, 0] + np.sum(k*p[:, 1:], axis=-1))
+    return np.concatenate([(-p[:, 0] - fl)[:, None],
+                           p[:, 1:] - fl[:, None]*k], axis=-1)
+
+
+def _hamiltonian_gradient(pos, p, a):
+    r, f, k = _kerr_schild(pos, a)
+    q = pos[:, 1:]
+    r2 = r*r
+    s = r2 + a*a
+    n = r2*r2 + a*a*q[:, 2]*q[:, 2]
+    dr = (np.stack([q[:, 0]*r, q[:, 1]*r, q[:, 2]*s/r], axis=-1)
+          / (2.*r2 - np.sum(q*q, axis=-1) + a*a)[:, None])
+    df = ((6.*r2*n - 8.*r2**3)/(n*n))[:, None]*dr
+    df[:, 2] -= 4.*r2*r*a*a*q[:, 2]/(n*n)
+    dkdr = np.stack([(q[:, 0]*s - 2.*r*(r*q[:, 0] - a*q[:, 1]))/(s*s),
+                     (q[:, 1]*s - 2.*r*(r*q[:, 1] + a*q[:, 0]))/(s*s),
+                     -q[:, 2]/r2], axis=-1)
+    l = p[:, 0] + np.sum(k*p[:, 1:], axis=-1)
+    dl = (np.sum(dkdr*p[:, 1:], axis=-1)[:, None]*dr
+          + np.stack([(r*p[:, 1] + a*p[:, 2])/s, (r*p[:, 2] - a*p[:, 1])/s,
+                      p[:, 3]/r], axis=-1))
+    gradient = np.zeros_like(pos)
+    gradient[:, 1:] = -.5*(l*l)[:, None]*df - (f*l)[:, None]*dl
+    return gradient
+
+
+def _transport_step(pos, p, a, step_size, adaptive):
+    if not adaptive:
+        p = p - step_size*_hamiltonian_gradient(pos, p, a)
+        return pos + step_size*_velocity(pos, p, a), p
+    h = (step_size*.5*_r_from_coords(pos, a))[:, None]
+    x1 = _velocity(pos, p, a)
+    p1 = -_hamiltonian_gradient(pos, p, a)
+    x2 = _velocity(pos + .5*h*x1, p + .5*h*p1, a)
+    p2 = -_hamiltonian_gradient(pos + .5*h*x1, p + .5*h*p1, a)
+    x3 = _velocity(pos + .5*h*x2, p + .5*h*p2, a)
+    p3 = -_hamiltonian_gradient(pos + .5*h*x2, p + .5*h*p2, a)
+    x4 = _velocity(pos + h*x3, p + h*p3, a)
+    p4 = -_hamiltonian_gradient(pos + h*x3, p + h*p3, a)
+    return (pos + h/6.*(x1 + 2.*x2 + 2.*x3 + x4),
+            p + h/6.*(p1 + 2.*p2 + 2.*p3 + p4))
+
+
+def _unit(vec, g):
+    norm2 = np.dot(g @ vec, vec)
+    if norm2 != 0.:
+        return vec/np.sqrt(abs(norm2))
+    return vec
+
+
+def _tetrad(x, time, aim, vert, a):
+    g = _metric(x, a)
+    e0 = _unit(time, g)
+    e1 = _unit(aim + np.dot(g @ aim, e0)*e0, g)
+    e3 = _unit(vert - np.dot(g @ vert, e1)*e1 + np.dot(g @ vert, e0)*e0, g)
+    dual = np.array([
+        np.dot(e0[[1, 2, 3]], np.cross(e1[[1, 2, 3]], e3[[1, 2, 3]])),
+        -np.dot(e0[[2, 3, 0]], np.cross(e1[[2, 3, 0]], e3[[2, 3, 0]])),
+        np.dot(e0[[3, 0, 1]], np.cross(e1[[3, 0, 1]], e3[[3, 0, 1]])),
+        -np.dot(e0[[0, 1, 2]], np.cross(e1[[0, 1, 2]], e3[[0, 1, 2]]))])
+    e2 = _unit(np.linalg.solve(g, dual), g)
+    return e0, e1, e2, e3
+
+
+def _trace_rays(uv, tilt, spin, disc_min, disc_max, step_size, max_steps,
+                adaptive):
+    # Rays are traced in float64, and only while they are in flight.
+    # The number of steps each ray took is returned for benchmarks.
+    a = spin
+    cam_x = np.sqrt(CAMERA_DISTANCE**2 + a*a)*np.cos(tilt)
+    cam_z = CAMERA_DISTANCE*np.sin(tilt)
+    cam_pos = np.array([0., cam_x, 0., cam_z])
+    time = np.array([1., 0., 0., 0.])
+    vert = np.array([0., -cam_x*cam_z, 0., cam_x*cam_x])*np.sign(np.cos(tilt))
+    e0, e1, e2, e3 = _tetrad(cam_pos, time, cam_pos, vert, a)
+
+    direction = np.concatenate(
+        [np.full((len(uv), 1), -CAMERA_ZOOM), uv], axis=-1)
+    direction /= np.linalg.norm(direction, axis=-1, keepdims=True)
+    dir4d = (-e0 + direction[:, :1]*e1 + direction[:, 1:2]*e2
+             + direction[:, 2:]*e3)
+    pos = np.tile(cam_pos, (len(uv), 1))
+    p = dir4d @ _metric(cam_pos, a)
+
+    horizon = 1. + np.sqrt(1. - a*a)
+    escape = max(2.*CAMERA_DISTANCE, 30.)
+    disc_uv = np.zeros((len(uv), 2))
+    blueshift = np.zeros(len(uv))
+    hit_disc = np.zeros(len(uv), dtype=bool)
+    steps = np.zeros(len(uv), dtype=np.int64)
+    active = np.arange(len(uv))
+    for i in range(max_steps):
+        if len(active) == 0:
+            break
+        last_pos = pos[active]
+        ray_pos, ray_p = _transport_step(last_pos, p[active], a, step_size,
+                                         adaptive)
+        steps[active] += 1
+        pos[active] = ray_pos
+        p[active] = ray_p
+
+        crossing = ray_pos[:, 3]*last_pos[:, 3] < 0.
+        on_disc = np.zeros(len(active), dtype=bool)
+        if np.any(crossing):
+            after = ray_pos[crossing]
+            before = last_pos[crossing]
+            intersect_pos = ((after*np.abs(before[:, 3:])
+                              + before*np.abs(after[:, 3:]))
+                             / np.abs(before[:, 3:] - after[:, 3:]))
+            r = _r_from_coords(intersect_pos, a)
+            hit = (r > disc_min) & (r < disc_max)
+            on_disc[np.flatnonzero(crossing)[hit]] = True
+            hit_index = active[on_disc]
+            intersect_pos = intersect_pos[hit]
+            r = r[hit]
+            disc_uv[hit_index] = (intersect_pos[:, 1:3]/disc_max + 1.)*.5
+            disc_velocity = np.concatenate(
+                [(r + a/np.sqrt(r))[:, None],
+                 np.stack([-intersect_pos[:, 2], intersect_pos[:, 1],
+                           np.zeros_like(r)], axis=-1)
+                 * np.sign(a)/np.sqrt(r)[:, None]], axis=-1)
+            disc_velocity /= np.sqrt(r*r - 3.*r + 2.*a*np.sqrt(r))[:, None]
+            blueshift[hit_index] = 1./np.sum(ray_p[on_disc]*disc_velocity,
+                                             axis=-1)
+            hit_disc[hit_index] = True
+
+        r = _r_from_coords(ray_pos, a)
+        stopped = (r < horizon) | (r > escape)
+        active = active[~(on_disc | stopped)]
+    return disc_uv, blueshift, hit_disc, steps
+
+
+def _apply_numpy(_src, _rows, _frame, tilt, spin, disc_min, disc_max,
+                 step_size, max_steps, adaptive):
+    height, width = _src.shape[:2]
+    y, x = np.mgrid[_rows, 0:width].astype(np.float64)
+    uv = np.stack([(2.*x - width)/width, (2.*y - height)/width], axis=-1)
+    uv = uv.reshape(-1, 2)
+    disc_uv, blueshift, hit_disc, steps = _trace_rays(
+        uv, tilt, spin, disc_min, disc_max, step_size, max_steps, adaptive)
 
-    _render_context.get_src_texture().bind_to_image(0, read=True, write=False)
-    _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
-    compute_shader.run(width//16+1, height//16+1, 1)
+    color = np.zeros((len(uv), 4), dtype=np.float32)
+    src_height, src_width = _src.shape[:2]
+    disc_xy = (disc_uv*[src_width, src_height]).astype(np.int64)
+    inside = (hit_disc & np.all(disc_xy >= 0, axis=-1)
+              & (disc_xy[:, 0] < src_width) & (disc_xy[:, 1] < src_height))
+    color[inside] = (_src[disc_xy[inside, 1], disc_xy[inside, 0]]
+                     * blueshift[inside, None]**3)
+    return color.reshape(x.shape + (4,))
@@ -5,9 +5,11 @@ This modifier takes two colors, a central position, and
 cell dimensions, and generates a checkerboard pattern.
 """
 
+import numpy as np
+
 _name_id = "checkerboard"
 _title = "Checkerboard"
-_flags = ["writeonly"]
+_flags = ["writeonly", "straight_alpha"]
 _parameters = [
     {
         "name_id": "color_a",
@@ -43,54 +45,66 @@ _parameters = [
 
 # TODO : add rotation
 
-def _apply(_render_context, color_a, color_b, cell_size, center, antialiasing):
-    gl_context = _render_context.get_gl_context()
-    width = _render_context.get_width()
-    height = _render_context.get_height()
-
-    glsl_code = """
-    #version 430
+_glsl = """
+#version 430
 
-    layout (local_size_x = 16, local_size_y = 16) in;
-    layout (rgba32f, binding = 0) uniform writeonly image2D img_output;
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
 
-    uniform vec4 color_a;
-    uniform vec4 color_b;
-    uniform vec2 center;
-    uniform vec2 cell_size;
-    uniform bool antialiasing;
+uniform vec4 color_a;
+uniform vec4 color_b;
+uniform vec2 center;
+uniform vec2 cell_size;
+uniform bool antialiasing;
 
-    void main() {
-        ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
-        ivec2 dimensions = imageSize(img_output).xy;
-        if(any(greaterThanEqual(coords, dimensions))){return;}
+void main() {
+    ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
+    ivec2 dimensions = imageSize(img_output).xy;
+    if(any(greaterThanEqual(coords, dimensions))){return;}
 
-        vec2 xy = vec2(coords) + .5 - center * vec2(dimensions);
-        float checker = .5;
+    vec2 xy = vec2(coords) + .5 - center * vec2(dimensions);
+    float checker = .5;
 
-        if(cell_size.x != 0. && cell_size.y != 0.){
-            if(!antialiasing){
-                vec2 q = 2.*fract(xy/2./cell_size);
-                checker = float(q.x < 1. ^^ q.y < 1.);
-            }else{
-                vec2 q1 = abs(fract((xy*.5 + .25)/cell_size) - .5);
-                vec2 q2 = abs(fract((xy*.5 - .25)/cell_size) - .5);
-                vec2 q = 2.*cell_size*(q1 - q2);
-                checker = clamp(.5*(1. - q.x*q.y), 0., 1.);
-            }
+    if(cell_size.x != 0. && cell_size.y != 0.){
+        if(!antialiasing){
+            vec2 q = 2.*fract(xy/2./cell_size);
+            checker = float(q.x < 1. ^^ q.y < 1.);
+        }else{
+            vec2 q1 = abs(fract((xy*.5 + .25)/cell_size) - .5);
+            vec2 q2 = abs(fract((xy*.5 - .25)/cell_size) - .5);
+            vec2 q = 2.*cell_size*(q1 - q2);
+            checker = clamp(.5*(1. - q.x*q.y), 0., 1.);
         }
-
-        vec4 color = mix(color_a, color_b, checker);
-        imageStore(img_output, coords, color);
     }
-    """
 
-    compute_shader = gl_context.compute_shader(glsl_code)
-    compute_shader["color_a"] = color_a
-    compute_shader["color_b"] = color_b
-    compute_shader["cell_size"] = cell_size
-    compute_shader["center"] = center
-    compute_shader["antialiasing"] = antialiasing
+    vec4 color = mix(color_a, color_b, checker);
+    imageStore(img_output, coords, color);
+}
+"""
+
+
+def _apply_numpy(_src, _rows, _frame, color_a, color_b, cell_size, center,
+                 antialiasing):
+    height, width = _src.shape[:2]
+    cell_size = np.asarray(cell_size, dtype=np.float32)
+    y, x = np.mgrid[_rows, 0:width].astype(np.float32)
+    x += .5 - center[0]*width
+    y += .5 - center[1]*height
+    checker = np.full(x.shape, .5, dtype=np.float32)
+
+    if cell_size[0] != 0 and cell_size[1] != 0:
+        if not antialiasing:
+            qx = 2.*np.mod(x/2./cell_size[0], 1.)
+            qy = 2.*np.mod(y/2./cell_size[1], 1.)
+            checker = ((qx < 1.) ^ (qy < 1.)).astype(np.float32)
+        else:
+            q = []
+            for xy, size in [(x, cell_size[0]), (y, cell_size[1])]:
+                q1 = np.abs(np.mod((xy*.5 + .25)/size, 1.) - .5)
+                q2 = np.abs(np.mod((xy*.5 - .25)/size, 1.) - .5)
+                q.append(2.*size*(q1 - q2))
+            checker = np.clip(.5*(1. - q[0]*q[1]), 0., 1.)
 
-    _render_context.get_dest_texture().bind_to_image(0, read=False, write=True)
-    compute_shader.run(width//16+1, height//16+1, 1)
+    color_a = np.asarray(color_a, dtype=np.float32)
+    color_b = np.asarray(color_b, dtype=np.float32)
+    return color_a + (color_b - color_a)*checker[..., None]
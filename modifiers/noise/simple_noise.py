@@ -5,8 +5,11 @@ This modifier adds a certain amount
 of per pixel random simple noise.
 """
 
+import numpy as np
+
 _name_id = "simple_noise"
 _title = "Simple noise"
+_flags = ["straight_alpha"]
 _parameters = [
     {
         "name_id": "amount",
@@ -60,130 +63,180 @@ _parameters = [
     }
 ]
 
-def _apply(_render_context, amount, chromaticity, space, distribution,
-           clamping, animated, seed):
-    gl_context = _render_context.get_gl_context()
-    width = _render_context.get_width()
-    height = _render_context.get_height()
-
-    glsl_code = """
-    #version 430
-
-    layout (local_size_x = 16, local_size_y = 16) in;
-    layout (rgba32f, binding = 0) uniform readonly image2D img_input;
-    layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
-
-    uniform int space;
-    uniform float amount;
-    uniform float chromaticity;
-    uniform float frame;
-    uniform int distribution;
-    uniform bool animated;
-    uniform int seed;
-    uniform bool clamping;
-
-    vec3 srgb_to_linear(vec3 srgb){
-        bvec3 cutoff = lessThan(srgb, vec3(.04045));
-        vec3 higher = pow((srgb + .055)/1.055, vec3(2.4));
-        vec3 lower = srgb / 12.92;
-        return mix(higher, lower, cutoff);
-    }
+_pointwise = """
+uniform int space;
+uniform float amount;
+uniform float chromaticity;
+uniform float frame;
+uniform int distribution;
+uniform bool animated;
+uniform int seed;
+uniform bool clamping;
+
+vec3 srgb_to_linear(vec3 srgb){
+    bvec3 cutoff = lessThan(srgb, vec3(.04045));
+    vec3 higher = pow((srgb + .055)/1.055, vec3(2.4));
+    vec3 lower = srgb / 12.92;
+    return mix(higher, lower, cutoff);
+}
+
+vec3 linear_to_srgb(vec3 linear){
+    bvec3 cutoff = lessThan(linear, vec3(.0031308));
+    vec3 higher = 1.055*pow(linear, vec3(1./2.4)) - .055;
+    vec3 lower = linear * 12.92;
+    return mix(higher, lower, cutoff);
+}
+
+uint hash3(uint x, uint y, uint z){
+    x += x >> 11;
+    x ^= x << 7;
+    x += y;
+    x ^= x << 3;
+    x += z ^ (x >> 14);
+    x ^= x << 6;
+    x += x >> 15;
+    x ^= x << 5;
+    x += x >> 12;
+    x ^= x << 9;
+    return x;
+}
+
+float random3(vec3 f){
+    uint mantissaMask = 0x007FFFFFu;
+    uint one = 0x3F800000u;
+    uvec3 u = floatBitsToUint(f);
+    uint h = hash3(u.x, u.y, u.z);
+    return fract(uintBitsToFloat((h & mantissaMask) | one) - 1.);
+}
+
+vec3 random_vec3(vec3 f){
+    return vec3(random3(f),
+                random3(f*2.4+11.),
+                random3(f*.76+17.));
+}
+
+vec3 inverf(vec3 x){
+    vec3 w = .99999*x;
+    vec3 u = log(1.-w*w);
+    vec3 z = 4.54728408834 + .5*u;
+    return sign(x)*sqrt(sqrt(z*z-u*7.14285714286) - z);
+}
+
+vec3 erf(vec3 x){
+    vec3 x2 = x*x;
+    return sign(x)*sqrt(1.-exp(-x2*(9.09456817668+x2)/(x2+7.14285714286)));
+}
+
+vec4 pointwise(vec4 color, ivec2 coords) {
+    if(amount > 0.){
+        vec3 uvw = vec3(vec2(coords), animated ? float(frame) : 0.);
+        uvw.z += float(seed);
+
+        vec3 chroma_noise = random_vec3(uvw);
+        vec3 luma_noise = vec3(random3(uvw*13.2+5.4));
+        chroma_noise = sqrt(2.)*inverf(2.*chroma_noise - 1.);
+        luma_noise = sqrt(2.)*inverf(2.*luma_noise - 1.);
+        vec3 noise = mix(luma_noise, chroma_noise, chromaticity);
+        noise /= sqrt(1.-2.*chromaticity*(1.-chromaticity));
+
+        if(distribution == 0){
+            noise = erf(noise/sqrt(2.)) * sqrt(3.);
+        }
 
-    vec3 linear_to_srgb(vec3 linear){
-        bvec3 cutoff = lessThan(linear, vec3(.0031308));
-        vec3 higher = 1.055*pow(linear, vec3(1./2.4)) - .055;
-        vec3 lower = linear * 12.92;
-        return mix(higher, lower, cutoff);
+        if(space == 1){
+            color.rgb = linear_to_srgb(color.rgb);
+            color.rgb += noise * amount * .5;
+            color.rgb = srgb_to_linear(color.rgb);
+        }else{
+            color.rgb += noise * amount * .5;
+        }
     }
 
-    uint hash3(uint x, uint y, uint z){
-        x += x >> 11;
-        x ^= x << 7;
-        x += y;
-        x ^= x << 3;
-        x += z ^ (x >> 14);
-        x ^= x << 6;
-        x += x >> 15;
-        x ^= x << 5;
-        x += x >> 12;
-        x ^= x << 9;
-        return x;
-    }
+    color.rgb = max(color.rgb, 0.);
+    if(clamping){color.rgb = min(color.rgb, 1.);}
+    return color;
+}
+"""
 
-    float random3(vec3 f){
-        uint mantissaMask = 0x007FFFFFu;
-        uint one = 0x3F800000u;
-        uvec3 u = floatBitsToUint(f);
-        uint h = hash3(u.x, u.y, u.z);
-        return fract(uintBitsToFloat((h & mantissaMask) | one) - 1.);
-    }
 
-    vec3 random_vec3(vec3 f){
-        return vec3(random3(f),
-                    random3(f*2.4+11.),
-                    random3(f*.76+17.));
-    }
+def _srgb_to_linear(srgb):
+    higher = np.power(np.maximum((srgb + .055)/1.055, 0.), 2.4)
+    return np.where(srgb < .04045, srgb/12.92, higher)
 
-    vec3 inverf(vec3 x){
-        vec3 w = .99999*x;
-        vec3 u = log(1.-w*w);
-        vec3 z = 4.54728408834 + .5*u;
-        return sign(x)*sqrt(sqrt(z*z-u*7.14285714286) - z);
-    }
 
-    vec3 erf(vec3 x){
-        vec3 x2 = x*x;
-        return sign(x)*sqrt(1.-exp(-x2*(9.09456817668+x2)/(x2+7.14285714286)));
-    }
+def _linear_to_srgb(linear):
+    higher = 1.055*np.power(np.maximum(linear, 0.), 1./2.4) - .055
+    return np.where(linear < .0031308, linear*12.92, higher)
 
-    void main() {
-        ivec2 coords = ivec2(gl_GlobalInvocationID.xy);
-        ivec2 dimensions = imageSize(img_output).xy;
-        if(any(greaterThanEqual(coords, dimensions))){return;}
-
-        vec4 color = imageLoad(img_input, coords);
-        if(amount > 0.){
-            vec3 uvw = vec3(vec2(coords), animated ? float(frame) : 0.);
-            uvw.z += float(seed);
-
-            vec3 chroma_noise = random_vec3(uvw);
-            vec3 luma_noise = vec3(random3(uvw*13.2+5.4));
-            chroma_noise = sqrt(2.)*inverf(2.*chroma_noise - 1.);
-            luma_noise = sqrt(2.)*inverf(2.*luma_noise - 1.);
-            vec3 noise = mix(luma_noise, chroma_noise, chromaticity);
-            noise /= sqrt(1.-2.*chromaticity*(1.-chromaticity));
-
-            if(distribution == 0){
-                noise = erf(noise/sqrt(2.)) * sqrt(3.);
-            }
-
-            if(space == 1){
-                color.rgb = linear_to_srgb(color.rgb);
-                color.rgb += noise * amount * .5;
-                color.rgb = srgb_to_linear(color.rgb);
-            }else{
-                color.rgb += noise * amount * .5;
-            }
-        }
 
-        color.rgb = max(color.rgb, 0.);
-        if(clamping){color.rgb = min(color.rgb, 1.);}
-        imageStore(img_output, coords, color);
-    }
-    """
-
-    compute_shader = gl_context.compute_shader(glsl_code)
-    compute_shader["amount"] = amount
-    compute_shader["chromaticity"] = chromaticity
-    compute_shader["space"] = space
-    compute_shader["distribution"] = distribution
-    compute_shader["animated"] = animated
-    compute_shader["seed"] = seed
-    compute_shader["clamping"] = clamping
-
-    _sequence_context = _render_context.get_sequence_context()
-    compute_shader["frame"] = float(_sequence_context.get_current_frame())
-
-    _render_context.get_src_texture().bind_to_image(0, read=True, write=False)
-    _render_context.get_dest_texture().bind_to_image(1, read=False, write=True)
-    compute_shader.run(width//16+1, height//16+1, 1)
+def _hash3(x, y, z):
+    # Same arithmetic as the shader, wrapping around on uint32.
+    x = x + (x >> 11)
+    x ^= x << 7
+    x += y
+    x ^= x << 3
+    x += z ^ (x >> 14)
+    x ^= x << 6
+    x += x >> 15
+    x ^= x << 5
+    x += x >> 12
+    x ^= x << 9
+    return x
+
+
+def _random3(f):
+    u = np.ascontiguousarray(f, dtype=np.float32).view(np.uint32)
+    h = _hash3(u[..., 0], u[..., 1], u[..., 2])
+    h = (h & np.uint32(0x007FFFFF)) | np.uint32(0x3F800000)
+    return np.mod(h.view(np.float32) - np.float32(1.), np.float32(1.))
+
+
+def _random_vec3(f):
+    return np.stack([_random3(f),
+                     _random3(f*np.float32(2.4) + np.float32(11.)),
+                     _random3(f*np.float32(.76) + np.float32(17.))], axis=-1)
+
+
+def _inverf(x):
+    w = .99999*x
+    u = np.log(1. - w*w)
+    z = 4.54728408834 + .5*u
+    return np.sign(x)*np.sqrt(np.sqrt(z*z - u*7.14285714286) - z)
+
+
+def _erf(x):
+    x2 = x*x
+    return np.sign(x)*np.sqrt(
+        1. - np.exp(-x2*(9.09456817668 + x2)/(x2 + 7.14285714286)))
+
+
+def _apply_numpy(_src, _rows, _frame, amount, chromaticity, space,
+                 distribution, clamping, animated, seed):
+    color = _src[_rows].copy()
+    width = _src.shape[1]
+    if amount > 0.:
+        y, x = np.mgrid[_rows, 0:width].astype(np.float32)
+        z = np.full(x.shape, float(_frame) if animated else 0.,
+                    dtype=np.float32) + np.float32(seed)
+        uvw = np.stack([x, y, z], axis=-1)
+
+        chroma_noise = _random_vec3(uvw)
+        luma_noise = _random3(uvw*np.float32(13.2) + np.float32(5.4))
+        chroma_noise = np.sqrt(2.)*_inverf(2.*chroma_noise - 1.)
+        luma_noise = np.sqrt(2.)*_inverf(2.*luma_noise - 1.)[..., None]
+        noise = luma_noise + (chroma_noise - luma_noise)*chromaticity
+        noise /= np.sqrt(1. - 2.*chromaticity*(1. - chromaticity))
+
+        if distribution == 0:
+            noise = _erf(noise/np.sqrt(2.))*np.sqrt(3.)
+
+        if space == 1:
+            rgb = _linear_to_srgb(color[..., :3]) + noise*amount*.5
+            color[..., :3] = _srgb_to_linear(rgb)
+        else:
+            color[..., :3] += noise*amount*.5
+
+    color[..., :3] = np.maximum(color[..., :3], 0.)
+    if clamping:
+        color[..., :3] = np.minimum(color[..., :3], 1.)
+    return color
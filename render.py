@@ -0,0 +1,44 @@
+"""
+Render the sequences of a project without the app.
+
+Frames are exported as a PNG sequence, with the backend configured in
+config.cfg, so that render nodes without a GPU can use the CPU one.
+
+Usage: python render.py <project file> <output prefix> [sequence id]
+"""
+
+import sys
+from configparser import ConfigParser
+
+from utils.config import Config
+from utils.image import save_image
+from core.services.animation_table_service import AnimationTableService
+from core.services.cpu_render_service import CPURenderService
+from core.services.modifier_service import ModifierService
+from core.services.project_service import ProjectService
+from core.services.render_service import RenderService
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    _config = ConfigParser()
+    _config.read("config.cfg")
+    Config.load(_config)
+    ModifierService.load_modifiers_from_directory()
+    _project = ProjectService.load_project(sys.argv[1])
+    _sequence_dict = _project.get_sequence_dict()
+    if len(sys.argv) > 3:
+        _sequence_dict = {int(sys.argv[3]): _sequence_dict[int(sys.argv[3])]}
+    print(f"Rendering with the {RenderService.get_backend().name} backend")
+    for _sequence_id, _sequence in _sequence_dict.items():
+        AnimationTableService.bake_sequence(_sequence)
+        for _frame in range(_sequence.get_duration()):
+            _output = RenderService.read_sequence_frame(_sequence, _frame,
+                                                        export=True)
+            save_image(_output,
+                       f"{sys.argv[2]}_{_sequence_id}_{_frame:04d}.png")
+            print(f"Sequence {_sequence_id}: frame {_frame + 1}"
+                  f"/{_sequence.get_duration()}")
+    CPURenderService.shutdown()
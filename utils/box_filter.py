@@ -0,0 +1,200 @@
+"""
+Utilitary functions for box filters.
+
+The BoxFilter class averages every window of pixels along the lines of
+an image, in two compute passes whatever the radius: the first writes
+the prefix sums of every line, and the second averages each window from
+the difference of two of them. Pixels outside the image count as 0, as
+in the numpy path, which takes the difference of a cumulative sum.
+"""
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from core.entities.render_context import RenderContext
+
+
+# Lines per workgroup of the scan pass, invocations per line, and
+# consecutive pixels summed by each invocation, by direction. Vertical
+# passes scan several neighbouring columns at once, so that adjacent
+# invocations read adjacent pixels.
+SCAN_LAYOUTS = {True: (1, 64, 8), False: (8, 32, 4)}
+
+SCAN_GLSL = """
+#version 430
+
+layout (local_size_x = LOCAL_X, local_size_y = LOCAL_Y) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+
+uniform ivec2 region_start;
+uniform ivec2 region_size;
+
+shared vec4 chunk[LINES][THREADS*ITEMS];
+shared vec4 totals[LINES][THREADS];
+
+ivec2 coords(int line, int i){
+    return region_start + (HORIZONTAL ? ivec2(i, line) : ivec2(line, i));
+}
+
+// Write the prefix sums of lines, several lines per workgroup.
+void main() {
+    ivec2 local = ivec2(gl_LocalInvocationID.xy);
+    int l = HORIZONTAL ? local.y : local.x;
+    int k = HORIZONTAL ? local.x : local.y;
+    int line = int(gl_WorkGroupID.x)*LINES + l;
+    int line_count = HORIZONTAL ? region_size.y : region_size.x;
+    int length = HORIZONTAL ? region_size.x : region_size.y;
+    bool valid = line < line_count;
+    vec4 carry = vec4(0.);
+
+    for(int start=0; start<length; start+=THREADS*ITEMS){
+        for(int item=0; item<ITEMS; item+=1){
+            int i = start + item*THREADS + k;
+            chunk[l][item*THREADS + k] = valid && i < length
+                ? imageLoad(img_input, coords(line, i)) : vec4(0.);
+        }
+        barrier();
+        // Sum consecutive pixels, then scan the totals of the line.
+        for(int item=1; item<ITEMS; item+=1){
+            chunk[l][k*ITEMS + item] += chunk[l][k*ITEMS + item - 1];
+        }
+        totals[l][k] = chunk[l][k*ITEMS + ITEMS - 1];
+        barrier();
+        for(int offset=1; offset<THREADS; offset*=2){
+            vec4 previous = k >= offset ? totals[l][k - offset] : vec4(0.);
+            barrier();
+            totals[l][k] += previous;
+            barrier();
+        }
+        vec4 offset = carry + (k > 0 ? totals[l][k - 1] : vec4(0.));
+        for(int item=0; item<ITEMS; item+=1){
+            chunk[l][k*ITEMS + item] += offset;
+        }
+        barrier();
+        for(int item=0; item<ITEMS; item+=1){
+            int i = start + item*THREADS + k;
+            if(valid && i < length){
+                imageStore(img_output, coords(line, i),
+                           chunk[l][item*THREADS + k]);
+            }
+        }
+        carry += totals[l][THREADS - 1];
+        barrier();
+    }
+}
+"""
+
+DIFFERENCE_GLSL = """
+#version 430
+
+layout (local_size_x = 16, local_size_y = 16) in;
+layout (rgba32f, binding = 0) uniform readonly image2D img_input;
+layout (rgba32f, binding = 1) uniform writeonly image2D img_output;
+
+uniform int radius;
+uniform bool horizontal;
+uniform ivec2 region_start;
+uniform ivec2 region_size;
+
+// Average a window from the difference of two prefix sums.
+void main() {
+    ivec2 xy = ivec2(gl_GlobalInvocationID.xy);
+    if(any(greaterThanEqual(xy, region_size))){return;}
+    ivec2 direction = horizontal ? ivec2(1, 0) : ivec2(0, 1);
+    int i = horizontal ? xy.x : xy.y;
+    int length = horizontal ? region_size.x : region_size.y;
+
+    int upper = min(i + radius, length - 1);
+    vec4 color = imageLoad(img_input,
+                           region_start + xy + (upper - i)*direction);
+    int lower = i - radius - 1;
+    if(lower >= 0){
+        color -= imageLoad(img_input,
+                           region_start + xy + (lower - i)*direction);
+    }
+    imageStore(img_output, region_start + xy,
+               color/float(2*radius + 1));
+}
+"""
+
+
+class BoxFilter:
+    """Utilitary functions for box filters."""
+
+    @staticmethod
+    def scan_code(horizontal: bool) -> str:
+        """Return the code of the scan pass along a direction."""
+        _lines, _threads, _items = SCAN_LAYOUTS[horizontal]
+        _local_size = ((_threads, _lines) if horizontal
+                       else (_lines, _threads))
+        _definitions = (f"#define HORIZONTAL {str(horizontal).lower()}\n"
+                        f"#define LINES {_lines}\n"
+                        f"#define THREADS {_threads}\n"
+                        f"#define ITEMS {_items}\n"
+                        f"#define LOCAL_X {_local_size[0]}\n"
+                        f"#define LOCAL_Y {_local_size[1]}\n")
+        return SCAN_GLSL.replace("#version 430\n",
+                                 "#version 430\n" + _definitions, 1)
+
+    @staticmethod
+    def run_passes(render_context: 'RenderContext',
+                   pass_list: list[tuple[int, bool]],
+                   start: tuple[int, int],
+                   size: tuple[int, int]):
+        """Run box passes from the src texture to the dest texture.
+
+        Each pass of the list is a radius and whether it runs
+        horizontally, and averages the pixels of the region starting
+        at start, of the given size, with pixels outside it counting
+        as 0.
+        """
+        _scan_shaders = {_horizontal: render_context.compute_shader_once(
+                             BoxFilter.scan_code(_horizontal))
+                         for _horizontal in (True, False)}
+        _difference_shader = render_context.compute_shader_once(
+            DIFFERENCE_GLSL)
+        _gl_context = render_context.get_gl_context()
+        _texture_pairs = render_context.ping_pong(2*len(pass_list))
+        for _index, (_radius, _horizontal) in enumerate(pass_list):
+            _scan_shader = _scan_shaders[_horizontal]
+            _scan_shader["region_start"] = start
+            _scan_shader["region_size"] = size
+            _src_texture, _dest_texture = _texture_pairs[2*_index]
+            _src_texture.bind_to_image(0, read=True, write=False)
+            _dest_texture.bind_to_image(1, read=False, write=True)
+            _lines = SCAN_LAYOUTS[_horizontal][0]
+            _line_count = size[1] if _horizontal else size[0]
+            _scan_shader.run((_line_count + _lines - 1)//_lines, 1, 1)
+            _gl_context.memory_barrier()
+
+            _difference_shader["radius"] = _radius
+            _difference_shader["horizontal"] = _horizontal
+            _difference_shader["region_start"] = start
+            _difference_shader["region_size"] = size
+            _src_texture, _dest_texture = _texture_pairs[2*_index + 1]
+            _src_texture.bind_to_image(0, read=True, write=False)
+            _dest_texture.bind_to_image(1, read=False, write=True)
+            _difference_shader.run((size[0] + 15)//16,
+                                   (size[1] + 15)//16, 1)
+            _gl_context.memory_barrier()
+
+    @staticmethod
+    def filter_array(image: np.ndarray, radius: int, axis: int) -> np.ndarray:
+        """Average every window of an array along an axis.
+
+        Sliding sums are taken from a cumulative sum, treating outside
+        pixels as 0.
+        """
+        _length = image.shape[axis]
+        _padding = [(0, 0)]*image.ndim
+        _padding[axis] = (radius + 1, radius)
+        _sums = np.cumsum(np.pad(image, _padding), axis=axis,
+                          dtype=np.float64)
+        _upper = np.take(_sums,
+                         np.arange(2*radius + 1, 2*radius + 1 + _length),
+                         axis=axis)
+        _lower = np.take(_sums, np.arange(_length), axis=axis)
+        return ((_upper - _lower)/(2*radius + 1)).astype(np.float32)
@@ -20,6 +20,8 @@ class Config():
         cls.store(config, "app", "version_major", int)
         cls.store(config, "app", "version_minor", int)
         cls.store(config, "app", "modifiers_directory", str)
+        cls.store(config, "app", "modifier_manifest", str)
+        cls.store(config, "app", "modifier_reload_interval", int)
 
         cls.store(config, "window", "min_width", int)
         cls.store(config, "window", "min_height", int)
@@ -38,6 +40,8 @@ class Config():
         cls.store(config, "viewer", "fit_padding", float)
         cls.store(config, "viewer", "zoom_around_cursor", bool)
         cls.store(config, "viewer", "zoom_sensitivity", float)
+        cls.store(config, "viewer", "region_rendering", bool)
+        cls.store(config, "viewer", "region_margin", float)
         
         cls.store(config, "sequence", "default_title", str)
         cls.store(config, "sequence", "default_width", int)
@@ -68,7 +72,18 @@ class Config():
 
         cls.store(config, "input", "padding", str)
 
+        cls.store(config, "render", "anti_aliasing", str)
         cls.store(config, "render", "anti_aliasing_samples", int)
+        cls.store(config, "render", "export_anti_aliasing", str)
+        cls.store(config, "render", "supersampling_factor", int)
+        cls.store(config, "render", "blend_compositing", bool)
+        cls.store(config, "render", "pointwise_fusion", bool)
+        cls.store(config, "render", "memory_budget_mb", int)
+        cls.store(config, "render", "backend", str)
+        cls.store(config, "render", "cpu_processes", int)
+        cls.store(config, "render", "gpu_profiling", bool)
+        cls.store(config, "render", "reduced_rate", int)
+        cls.store(config, "render", "reduced_rate_threshold", float)
     
     @classmethod
     def store(cls,
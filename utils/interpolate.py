@@ -90,3 +90,42 @@ class Interpolate:
                     _T = -(_b+2*np.sqrt(_d)*np.cos(
                         4*np.pi / 3 + np.arccos(_f/2/_d**(3/2))/3))/_a
         return Interpolate.cubic_bezier(y0, y1, y2, y3, _T)
+
+    @staticmethod
+    def solve_bezier_2d_handles(t1: np.ndarray,
+                                t2: np.ndarray,
+                                t: np.ndarray) -> np.ndarray:
+        """Solve the bezier parameters of many 2D-handle interpolations.
+
+        Returns, for each interpolation factor t with handles at t1
+        and t2, the parameter cubic_bezier_2d_handles passes to
+        cubic_bezier, so that arrays of factors are solved at once.
+        """
+        _t = np.clip(t, 0, 1)
+        _t1 = np.clip(t1, 0, 1)
+        _t2 = np.clip(t2, 0, 1)
+        _a = 1 + 3*(_t1-_t2)
+        _b = _t2 - 2*_t1
+
+        # Every case is computed, and the relevant one picked.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            _e = _t1**2+4*_b*_t/3
+            _quadratic = np.where(
+                _b == 0,
+                np.where(_t1 == 0, 0, _t/3/_t1),
+                np.where(_e >= 0, (-_t1 + np.sqrt(np.abs(_e)))/2/_b, 0))
+            _d = _b**2-_a*_t1
+            _f = 2*_b**3-3*_a*_b*_t1-_a**2*_t
+            _double = -(_b+np.cbrt(_f))/_a
+            _g = np.cbrt((_f+np.sqrt(_f**2-4*_d**3))/2)
+            _single = -(_b+_g+_d/_g)/_a
+            _angle = np.arccos(_f/2/_d**(3/2))/3
+            _triple = -(_b+2*np.sqrt(_d)*np.cos(_angle))/_a
+            for _k in (1, 2):
+                _triple = np.where(
+                    (_triple < 0) | (_triple > 1),
+                    -(_b+2*np.sqrt(_d)*np.cos(2*_k*np.pi / 3 + _angle))/_a,
+                    _triple)
+            _cubic = np.where(_d == 0, _double,
+                              np.where(_f**2 >= 4*_d**3, _single, _triple))
+            return np.where(_a == 0, _quadratic, _cubic)
@@ -0,0 +1,47 @@
+"""
+Represents a numpy array in shared memory.
+
+The SharedArray class holds a float32 numpy array whose buffer lives
+in shared memory, so that worker processes can attach to it by name
+and read or write it without copying.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """Represents a numpy array in shared memory."""
+
+    _memory: shared_memory.SharedMemory
+    _array: np.ndarray
+    _owner: bool
+
+    def __init__(self,
+                 shape: tuple[int, ...],
+                 name: str = None):
+        _byte_count = max(int(np.prod(shape)) * 4, 1)
+        self._owner = name is None
+        if self._owner:
+            self._memory = shared_memory.SharedMemory(create=True,
+                                                      size=_byte_count)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._array = np.ndarray(shape, dtype=np.float32,
+                                 buffer=self._memory.buf)
+
+    def get_name(self) -> str:
+        """Return the name other processes attach with."""
+        return self._memory.name
+
+    def get_array(self) -> np.ndarray:
+        """Return the numpy array backed by the shared memory."""
+        return self._array
+
+    def release(self):
+        """Detach from the shared memory, freeing it if owned."""
+        self._array = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()